@@ -1,16 +1,44 @@
 # Importações
+import os
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.express as px
 
+from citation_stats import CITATION_PERCENTILES
+from cube import (cube_slice, journal_topic_counts, panel_metrics, top_journals,
+                  topic_counts, year_topic_counts, yearly_counts)
+from data_store import current_data_dir, data_fingerprint
+from dataset import (build_author_index, build_citation_indexes, build_country_index, build_related_index,
+                     build_row_index, load_dataset)
+from export import EXPORT_FORMATS, available_formats, export_bytes, export_chunks
+from figure_cache import FigureCache
+
+from filters import FilterCache, filter_context
+from coauthors import COAUTHOR_MAX_AUTHORS, CoauthorCache, CoauthorGraph, spring_layout
+from geography import country_counts
+
+from leaderboard import LEADERBOARD_K, Leaderboard
+from search_index import SearchIndex
+from shared_store import attach_shared, shared_enabled
+from tracing import RerunProfile, profile_mode, span, start_trace
+from trends import DECLINE_CAGR, HOT_CAGR, MIN_TREND_YEARS, TREND_CLASSES, detect_trends
+from wordclouds import wordcloud_png
+
 
 # Configurações iniciais
 st.set_page_config(page_title="Observatório Científico UA", layout="wide", page_icon="https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcS1ZOSQg8JAJfqgtVPpSreJArI1a8cFPIFT1Q&s")
 
-# --- ESTILIZAÇÃO CSS ---
-st.markdown("""
+# Spans deste rerun (OBSERVATORIO_TRACE) e perfil pedido no sidebar (OBSERVATORIO_PROFILE)
+trace = start_trace(st.session_state.get('aba_ativa') or st.session_state.get('page', 'cover'))
+perfil = RerunProfile().start() if profile_mode() and st.session_state.pop('perfilar', False) else None
+
+try:
+    # --- ESTILIZAÇÃO CSS ---
+    st.markdown("""
     <style>
     /* Cores do Sidebar */
     div[data-baseweb="slider"] > div > div > div {
@@ -165,81 +193,187 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- CARREGAMENTO DE DADOS  ---
-@st.cache_data
-def load_data():
-    articles = pd.read_csv('Fact_Articles.csv', dtype={'Article_ID': str, 'Topic_ID': str})
-    topics = pd.read_csv('Dim_Topics.csv', dtype={'Topic_ID': str})
-    geo = pd.read_csv('Bridge_Geography.csv', dtype={'Article_ID': str})
-    authors = pd.read_csv('Dim_Authors.csv', dtype={'Author_ID': str})
-    bridge_authors = pd.read_csv('Bridge_Article_Authors.csv', dtype={'Article_ID': str, 'Author_ID': str})
-    timeline = pd.read_csv('Agg_Timeline.csv')
-    df_terms = pd.read_csv("top_terms_per_topic.csv", dtype={'Topic_ID': str})
-
-    # NOVOS FICHEIROS GERADOS
-    authors = pd.read_csv('Dim_Authors.csv', dtype={'Author_ID': str})
-    bridge_authors = pd.read_csv('Bridge_Article_Authors.csv', dtype={'Article_ID': str, 'Author_ID': str})
-    timeline = pd.read_csv('Agg_Timeline.csv')
-    df_terms = pd.read_csv("top_terms_per_topic.csv", dtype={'Topic_ID': str})
-
-    df_full = articles.merge(topics, on='Topic_ID', how='left')
-    return df_full, topics, geo, authors, bridge_authors, timeline, df_terms
-
-# Inicialização dos dados
-try:
-    df_full, df_topics, df_geo, df_authors, df_bridge_authors, df_timeline, df_terms, = load_data()
-except Exception as e:
-    st.error(f"Erro ao carregar arquivos CSV: {e}")
-    st.stop()
-
-# --- GESTÃO DE NAVEGAÇÃO ---
-if 'page' not in st.session_state:
-    st.session_state.page = 'cover'
-
-def change_page(name):
-    st.session_state.page = name
-
-# CAPA INTRODUTÓRIA
-if st.session_state.get("page", "cover") == "cover":
-
-    # Textos
-    # Textos formatados para o dicionário
-    t = {
-        "uni": "Universidade de Aveiro",
-        "title": "Observatório da Comunidade Científica",
-        "subtitle": "Plataforma de inteligência científica para monitorização de tendências e impacto da comunidade",
-        "about_t": "Sobre o Projeto",
-        "about_b": (
-            "O presente projeto de Observatório tem como objetivo fornecer uma ferramenta de "
-            "apoio à análise da produção científica da Universidade de Aveiro. A sua finalidade "
-            "principal consiste em mapear a geração e a partilha de conhecimento entre os diferentes "
-            "departamentos e áreas de investigação, recorrendo a uma análise bibliométrica baseada em "
-            "dados provenientes da base Scopus."
-            " A plataforma permite:"
-            " acompanhar a evolução das publicações científicas ao longo do tempo;"
-            " avaliar o impacto do trabalho dos investigadores através das citações;"
-            " identificar os principais meios utilizados para a divulgação dos resultados;"
-            " destacar as áreas e temas de maior relevância no contexto atual."
-        ),
-        "tech_t": "Parte técnica",
-        "tech_b": (
-            "A plataforma foi construída para analisar de forma detalhada a produção científica da UA, "
-            "usando técnicas avançadas de NLP (Processamento de Linguagem Natural) e modelos de "
-            "extração de tópicos, como a NMF (Fatorização de Matrizes Não Negativas). Com isto, "
-            "conseguimos processar milhares de resumos e títulos para identificar agrupamentos temáticos "
-            "que mostram a identidade científica da universidade."
-            "Para tornar a análise ainda mais precisa, o sistema utiliza o modelo Llama via Ollama, "
-            "que interpreta e rotula automaticamente os tópicos. A interface foi desenvolvida em Python "
-            "com Streamlit, utilizando o Plotly para transformar dados bibliométricos complexos "
-            "em insights visuais fáceis de entender."
-        ),
-        "team": "Equipa de Desenvolvimento",
-        "btn": "Explorar Dashboard ➔"
-    }     
-
-    # CSS
+    # --- CARREGAMENTO DE DADOS  ---
+    # Nº máximo de nuvens de palavras (PNG) mantidas em cache
+    WORDCLOUD_CACHE_SIZE = 64
+
+    # Nº de grupos (tópicos, revistas ou autores) na tabela de impacto do Painel 1
+    CITATION_TABLE_ROWS = 20
+
+    # Nº de versões dos dados mantidas em cache (a ativa e a anterior, durante a troca)
+    DATA_VERSIONS_CACHED = 2
+
+    # 'data_dir' é a pasta do snapshot ativo (muda quando o ingest.py publica uma versão)
+    # e 'fingerprint' muda quando os ficheiros de dados mudam: ambos forçam o recarregamento.
+    # As tabelas são partilhadas por todas as sessões sem cópia, por isso só de leitura.
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_private_data(data_dir, fingerprint):
+        return load_dataset(data_dir)
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_shared_data(data_dir, fingerprint):
+        # Tabelas mapeadas do segmento escrito pelo processo carregador (serve.py), sem cópia
+        return attach_shared(data_dir, fingerprint)
+
+    @st.cache_resource
+    def private_versions():
+        # Versões (data_dir, fingerprint) que este processo carregou em cópia privada
+        return set()
+
+    def load_data(data_dir, fingerprint):
+        # Modo multi-processo: os workers partilham o segmento; sem ele (ainda não escrito
+        # para esta versão) cada processo carrega a sua cópia e volta a tentar no rerun seguinte
+        if shared_enabled():
+            try:
+                data = load_shared_data(data_dir, fingerprint)
+            except FileNotFoundError:
+                pass
+            else:
+                privadas = private_versions()
+                if privadas:
+                    # O segmento chegou depois da cópia privada: saem a cópia e tudo o que foi
+                    # construído sobre ela (índices e caches guardam referências ao df_full privado)
+                    for loader in PER_VERSION_LOADERS:
+                        loader.clear()
+                    privadas.clear()
+                return data
+            private_versions().add((data_dir, fingerprint))
+        return load_private_data(data_dir, fingerprint)
+
+    @st.cache_data(max_entries=WORDCLOUD_CACHE_SIZE, show_spinner=False)
+    def load_wordcloud(data_dir, fingerprint, topic_id, _df_terms):
+        # PNG da nuvem de palavras de um tópico (pré-desenhado no build ou desenhado uma vez)
+        return wordcloud_png(_df_terms, topic_id, data_dir)
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_author_index(data_dir, fingerprint):
+        # Índice autores <-> artigos partilhado por todas as sessões (não é copiado a cada rerun)
+        df_full, df_topics, _, df_authors, df_bridge_authors, *_ = load_data(data_dir, fingerprint)
+        return build_author_index(df_full, df_topics, df_bridge_authors, df_authors)
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_citation_indexes(data_dir, fingerprint):
+        # Citações ordenadas por grupo e ano (índice h, percentis e impacto normalizado do Painel 1)
+        df_full, df_topics, *_ = load_data(data_dir, fingerprint)
+        return build_citation_indexes(df_full, df_topics, load_author_index(data_dir, fingerprint))
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_leaderboard(data_dir, fingerprint):
+        # Citações por par autor x artigo para o leaderboard do Painel 4
+        df_full = load_data(data_dir, fingerprint)[0]
+        return Leaderboard(load_author_index(data_dir, fingerprint), df_full['Cited by'],
+                           load_citation_indexes(data_dir, fingerprint)['Autor'])
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_search_index(data_dir, fingerprint):
+        # Índice invertido da pesquisa (títulos, revistas e autores), guardado em store/
+        df_full = load_data(data_dir, fingerprint)[0]
+        return SearchIndex.load_or_build(fingerprint, df_full, load_author_index(data_dir, fingerprint), data_dir)
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_country_index(data_dir, fingerprint):
+        # Pares (linha do artigo, país ISO) a partir da geografia normalizada
+        df_full, _, df_geo, *_ = load_data(data_dir, fingerprint)
+        return build_country_index(df_full, df_geo, data_dir)
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_row_index(data_dir, fingerprint):
+        # Limites de cada ano e linhas de cada tópico no df_full (ordenado por ano)
+        df_full, df_topics, *_ = load_data(data_dir, fingerprint)
+        return build_row_index(df_full, df_topics)
+
+    @st.cache_resource(max_entries=DATA_VERSIONS_CACHED)
+    def load_related_index(data_dir, fingerprint):
+        # Vetores documento-tópico normalizados para os artigos relacionados (None sem doc_topics.npz)
+        df_full = load_data(data_dir, fingerprint)[0]
+        return build_related_index(df_full, data_dir)
+
+    @st.cache_resource(max_entries=1)
+    def load_filter_cache(data_dir, fingerprint):
+        # Cache de filtros partilhada entre sessões; uma nova versão dos dados cria uma cache vazia
+        return FilterCache()
+
+    @st.cache_resource(max_entries=1)
+    def load_figure_cache(data_dir, fingerprint):
+        # Figuras Plotly já construídas, partilhadas entre sessões (orçamento em bytes de JSON)
+        return FigureCache()
+
+    @st.cache_resource(max_entries=1)
+    def load_coauthor_cache(data_dir, fingerprint):
+        # Redes de coautoria e layouts por filtro, partilhados entre sessões (orçamento em bytes)
+        return CoauthorCache()
+
+    # Recursos construídos a partir das tabelas de uma versão (ver load_data); a cache de
+    # figuras só guarda figuras e fica
+    PER_VERSION_LOADERS = [load_private_data, load_author_index, load_citation_indexes, load_leaderboard,
+                           load_search_index, load_country_index, load_row_index, load_related_index,
+                           load_filter_cache, load_coauthor_cache]
+
+    # Inicialização dos dados
+    try:
+        with span('load_data'):
+            # Lidos a cada rerun: um snapshot publicado pelo ingest.py entra sem reiniciar a app
+            data_dir = current_data_dir()
+            fingerprint = data_fingerprint(data_dir)
+            df_full, df_topics, df_geo, df_authors, df_bridge_authors, df_timeline, df_terms, df_cube = load_data(data_dir, fingerprint)
+            # Só o que o filtro do sidebar usa; os índices de cada painel (citações, autores,
+            # coautoria, países, pesquisa, artigos relacionados) são construídos na primeira
+            # vez que o painel é aberto, pelos load_* acima
+            row_index = load_row_index(data_dir, fingerprint)
+            filter_cache = load_filter_cache(data_dir, fingerprint)
+            figure_cache = load_figure_cache(data_dir, fingerprint)
+    except Exception as e:
+        st.error(f"Erro ao carregar os dados: {e}")
+        st.stop()
+
+    # --- GESTÃO DE NAVEGAÇÃO ---
+    if 'page' not in st.session_state:
+        st.session_state.page = 'cover'
+
+    def change_page(name):
+        st.session_state.page = name
+
+    # CAPA INTRODUTÓRIA
+    if st.session_state.get("page", "cover") == "cover":
+
+        # Textos
+        # Textos formatados para o dicionário
+        t = {
+            "uni": "Universidade de Aveiro",
+            "title": "Observatório da Comunidade Científica",
+            "subtitle": "Plataforma de inteligência científica para monitorização de tendências e impacto da comunidade",
+            "about_t": "Sobre o Projeto",
+            "about_b": (
+                "O presente projeto de Observatório tem como objetivo fornecer uma ferramenta de "
+                "apoio à análise da produção científica da Universidade de Aveiro. A sua finalidade "
+                "principal consiste em mapear a geração e a partilha de conhecimento entre os diferentes "
+                "departamentos e áreas de investigação, recorrendo a uma análise bibliométrica baseada em "
+                "dados provenientes da base Scopus."
+                " A plataforma permite:"
+                " acompanhar a evolução das publicações científicas ao longo do tempo;"
+                " avaliar o impacto do trabalho dos investigadores através das citações;"
+                " identificar os principais meios utilizados para a divulgação dos resultados;"
+                " destacar as áreas e temas de maior relevância no contexto atual."
+            ),
+            "tech_t": "Parte técnica",
+            "tech_b": (
+                "A plataforma foi construída para analisar de forma detalhada a produção científica da UA, "
+                "usando técnicas avançadas de NLP (Processamento de Linguagem Natural) e modelos de "
+                "extração de tópicos, como a NMF (Fatorização de Matrizes Não Negativas). Com isto, "
+                "conseguimos processar milhares de resumos e títulos para identificar agrupamentos temáticos "
+                "que mostram a identidade científica da universidade."
+                "Para tornar a análise ainda mais precisa, o sistema utiliza o modelo Llama via Ollama, "
+                "que interpreta e rotula automaticamente os tópicos. A interface foi desenvolvida em Python "
+                "com Streamlit, utilizando o Plotly para transformar dados bibliométricos complexos "
+                "em insights visuais fáceis de entender."
+            ),
+            "team": "Equipa de Desenvolvimento",
+            "btn": "Explorar Dashboard ➔"
+        }     
+
+        # CSS
       
-    st.markdown("""                                
+        st.markdown("""                                
     <style>
 
     .header {
@@ -336,8 +470,8 @@ if st.session_state.get("page", "cover") == "cover":
     </style>
     """, unsafe_allow_html=True)
            
-    # HEADER
-    st.markdown(f"""
+        # HEADER
+        st.markdown(f"""
     <div class="header">
         <img src="https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcS1ZOSQg8JAJfqgtVPpSreJArI1a8cFPIFT1Q&s" class="ua-logo">
         <div class="ua-name">{t['uni']}</div>
@@ -347,20 +481,20 @@ if st.session_state.get("page", "cover") == "cover":
     """, unsafe_allow_html=True)
 
    
-    # CARDS
+        # CARDS
     
-    col1, col2 = st.columns(2)
+        col1, col2 = st.columns(2)
 
-    with col1:
-        st.markdown(f"""
+        with col1:
+            st.markdown(f"""
         <div class="info-card">
             <h3> {t['about_t']}</h3>
             <p>{t['about_b']}</p>
         </div>
         """, unsafe_allow_html=True)
 
-    with col2:
-        st.markdown(f"""
+        with col2:
+            st.markdown(f"""
         <div class="info-card">
             <h3> {t['tech_t']}</h3>
             <p>{t['tech_b']}</p>
@@ -368,9 +502,9 @@ if st.session_state.get("page", "cover") == "cover":
         """, unsafe_allow_html=True)
 
   
-    # TEAM / GITHUB
+        # TEAM / GITHUB
     
-    st.markdown(f"""
+        st.markdown(f"""
     <div class="team">
         <h4>{t['team']}</h4>
         <div class="gh-container">
@@ -381,186 +515,273 @@ if st.session_state.get("page", "cover") == "cover":
     """, unsafe_allow_html=True)
 
     
-    # BOTÃO
-    _, col_btn, _ = st.columns([1, 1, 1])
-    with col_btn:
-        if st.button(t["btn"], use_container_width=True):
-            st.session_state.page = "dashboard"
-            st.rerun()
-
-# DASHBOARD 
-else:
-# --- SIDEBAR INTERATIVO ---
-    st.sidebar.image("data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAMwAAADACAMAAAB/Pny7AAAAkFBMVEX///9RtQBIsgCEyG3Y7cx1w1JbuSWz3Z77+/v4+Pjy8vLq6urv7+/l8uCbmpvOzs6joqM7rgDk5ORXuBLGxsbZ2dmUk5Sp2JDz+u+urq67u7vF5bK2tbapqKn5/fbBwMGIh4i84qnK57yY0HuOzG5pvULh8tdhujR8x0+NyXK+37JJrxh+xGSKzGd7xV1wwT+JIouDAAAGkElEQVR4nO2ai3LbKBRAsdYPEApgDCQoYDlxbbfdtvv/f7cX5IfseNq4cWJl5p6ZdKQrrHIEXAE2IQiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIMiNmC+/3A/nt67FlZiPi9nqx/rW1bgO8/FgUBSr4a3rcRWSDOhsPmXb3A0fjs5bmcH062nBde/1hsvRanTUpbYyg+nTUcH5crX68Xjs3TOeR6lLje46ob3MpltwPpkWRTFe9tjmcZPrXXzr1HEnMyg63Yp+/7dIoVl/bdY/im297w8vlr3M9PlQcjhuSxbjpzP36QWT2VZmMHva2xxkHvcF15tdweLn3dlb3ZyH5a6K8MT3SeBu380mu9D856Hg6vn8zW7N+te+jp0kcL9vhP/IaQjY9LSfDUedShY/26G93hxC26Z5nB6KDcaT39zxhhzJgM3zw/zuadUJzZbr+Xx9Py4+nQyMm9VoMx4chTaj0WZ2FPokMq8DZT4AlEGZDwBlfiNjvaW//x+pDbo9YrLmJxfLxpT9kTFO/kGGGWG3Na+VPrnIY+iRDP2DShfWxFOZ6nYyTFsGFbCcaE1t3UCn4ZZxm+rDLFSUm5AaikvKjSW2qWWVisD1Sta2krEt02Qn3TS69ElGy1qyj5bhMdXGCsMaFZUSzhLprHQ11MQsLGmcUk6VEDTOmXwmLDVCEw1xFeHj1DgBHzSM5AMlQEYKAZdPh9N7y1TB8yxDmwUISBEYyJDo4OlGRbTz8JRdhBLOVFY06cxXIFMGZQmVLmoLAVLCfbSCe7HgQmmTEBfx8ra5lozTucNnGQN/WklSR+hU0ESldTU0o1OpU6YEoHkKQAKAhqXtfbRUNrd1YEGlbirF6Xj6OBnRkdGiTnVhXihALKx1qaJ2sXCxoTTLmKwFMpXxwjnPTZZhPlRh+7E/pcX3kVEnMunZBkWpj9ImqHRtMraNcrGUXRmthNG83rVMSgBB5Y/py9Pa22R8lnHHMpTAm0Q0lNQi1aeSJLdMZXjKxkLLXTdLvcukV01Zey7z28eqwGqXeie3HzxmWOMks/6FDFcuVUhDJmPaOZJbRi8UZ9qrJAMfNCUPDhpEmKo0wvPKCwuXIQFoFTXTQvy9THHMoeLn4vuXpo7OxSAalmV49CCTunoUvh3EzuXUvEhPXTo4heefZgBVhJMYoubeCRGji9zCE3BeQSaDI+FUdbHLTqbYTB4PPC131S6KX0+d+HbD8DADYNZWlJek4vAcKYcsq9MDLbcdnlmp82l+yiWMBIiXHHSphisMPgVFLIU3bD7ipKpoKm8vT2Udmfvj78nW/7Xh2fFXNOvZiUy/2Muc7B8/5P3L4uQbjGG7/fnZZKARYIh8Py39SWXIenL/Yhf208qcLX1WhpWvz6LVG2b4f+QaMta/esLOXXPxJOX1XEVGmdfKVLW8tIYX8FYZythWBo5oN5xnyLQ9SYc5kCMUIjRHrtxKb5ThtVBSRpDRtVK7nQpiA6yvJK18nk/WHtYuXkTojJWXaUNDwqRBwnKu+YsV2LvJcC9qE5SQjHtljNpuUGiopgwwsfFpiiZdA39B1rAygBkmzKG98hL+NY3wV7V5kwyseWWeCUuWN1p4rHOykqmJqPLgANe9qErwIWlSVokkEzlMQlMmgGnmNXvam2SqkLdXrJI8eMu59qJ90rTk2ohAmFOEwLoZpDiHWX6TZYQkrJ3xV7AW649M7iY6StBIqLxQJqWB8RBAhkTH9EKmnY18teFZBtZvTe6R2xv0QqY8tIyvq5Si2k4Dw6UkpQpp4WbNoswLmpy7djK0bZm37fldV4bm/csSxkzZ+LRiNPntWUZYzVArPBwKGOykHSFU13onkyIMyrz+DfUOMoPTbKYaW8MynuoIC35YLKamgXVnbWV0qSfVLu3b0MZBBFZsOZslmTKVMep9stloeNflsLp56ETX96eLMx5gcMgADWK9UnG7aV6FdBwULPQtrD5TCCIKBjuPhlqfty4gkasXG+dXkRkU0y7jp21DzZ+/Hl04WTaTNMt8ebQ9PkpU9MUUk14wP30dd1/ObWgU02XbNpPizOXe/kKDTGYva5tsJsnmeXpWta+/nTn6vUm3wsX39Xo4Pnutr2szkn5vdt5mOpudbZdBj39vRuZPm+Is0+nZ8PhbXztZYv787Z8LmPTZBUEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBDnL/7ENiOGg1fy5AAAAAElFTkSuQmCC", width=200)
-    st.sidebar.markdown("<h1 style='color: #007A53;'>Painel de Controle</h1>", unsafe_allow_html=True)    
+        # BOTÃO
+        _, col_btn, _ = st.columns([1, 1, 1])
+        with col_btn:
+            if st.button(t["btn"], use_container_width=True):
+                st.session_state.page = "dashboard"
+                st.rerun()
+
+    # DASHBOARD 
+    else:
+    # --- SIDEBAR INTERATIVO ---
+        st.sidebar.image("data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAMwAAADACAMAAAB/Pny7AAAAkFBMVEX///9RtQBIsgCEyG3Y7cx1w1JbuSWz3Z77+/v4+Pjy8vLq6urv7+/l8uCbmpvOzs6joqM7rgDk5ORXuBLGxsbZ2dmUk5Sp2JDz+u+urq67u7vF5bK2tbapqKn5/fbBwMGIh4i84qnK57yY0HuOzG5pvULh8tdhujR8x0+NyXK+37JJrxh+xGSKzGd7xV1wwT+JIouDAAAGkElEQVR4nO2ai3LbKBRAsdYPEApgDCQoYDlxbbfdtvv/f7cX5IfseNq4cWJl5p6ZdKQrrHIEXAE2IQiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIAiCIMiNmC+/3A/nt67FlZiPi9nqx/rW1bgO8/FgUBSr4a3rcRWSDOhsPmXb3A0fjs5bmcH062nBde/1hsvRanTUpbYyg+nTUcH5crX68Xjs3TOeR6lLje46ob3MpltwPpkWRTFe9tjmcZPrXXzr1HEnMyg63Yp+/7dIoVl/bdY/im297w8vlr3M9PlQcjhuSxbjpzP36QWT2VZmMHva2xxkHvcF15tdweLn3dlb3ZyH5a6K8MT3SeBu380mu9D856Hg6vn8zW7N+te+jp0kcL9vhP/IaQjY9LSfDUedShY/26G93hxC26Z5nB6KDcaT39zxhhzJgM3zw/zuadUJzZbr+Xx9Py4+nQyMm9VoMx4chTaj0WZ2FPokMq8DZT4AlEGZDwBlfiNjvaW//x+pDbo9YrLmJxfLxpT9kTFO/kGGGWG3Na+VPrnIY+iRDP2DShfWxFOZ6nYyTFsGFbCcaE1t3UCn4ZZxm+rDLFSUm5AaikvKjSW2qWWVisD1Sta2krEt02Qn3TS69ElGy1qyj5bhMdXGCsMaFZUSzhLprHQ11MQsLGmcUk6VEDTOmXwmLDVCEw1xFeHj1DgBHzSM5AMlQEYKAZdPh9N7y1TB8yxDmwUISBEYyJDo4OlGRbTz8JRdhBLOVFY06cxXIFMGZQmVLmoLAVLCfbSCe7HgQmmTEBfx8ra5lozTucNnGQN/WklSR+hU0ESldTU0o1OpU6YEoHkKQAKAhqXtfbRUNrd1YEGlbirF6Xj6OBnRkdGiTnVhXihALKx1qaJ2sXCxoTTLmKwFMpXxwjnPTZZhPlRh+7E/pcX3kVEnMunZBkWpj9ImqHRtMraNcrGUXRmthNG83rVMSgBB5Y/py9Pa22R8lnHHMpTAm0Q0lNQi1aeSJLdMZXjKxkLLXTdLvcukV01Zey7z28eqwGqXeie3HzxmWOMks/6FDFcuVUhDJmPaOZJbRi8UZ9qrJAMfNCUPDhpEmKo0wvPKCwuXIQFoFTXTQvy9THHMoeLn4vuXpo7OxSAalmV49CCTunoUvh3EzuXUvEhPXTo4heefZgBVhJMYoubeCRGji9zCE3BeQSaDI+FUdbHLTqbYTB4PPC131S6KX0+d+HbD8DADYNZWlJek4vAcKYcsq9MDLbcdnlmp82l+yiWMBIiXHHSphisMPgVFLIU3bD7ipKpoKm8vT2Udmfvj78nW/7Xh2fFXNOvZiUy/2Muc7B8/5P3L4uQbjGG7/fnZZKARYIh8Py39SWXIenL/Yhf208qcLX1WhpWvz6LVG2b4f+QaMta/esLOXXPxJOX1XEVGmdfKVLW8tIYX8FYZythWBo5oN5xnyLQ9SYc5kCMUIjRHrtxKb5ThtVBSRpDRtVK7nQpiA6yvJK18nk/WHtYuXkTojJWXaUNDwqRBwnKu+YsV2LvJcC9qE5SQjHtljNpuUGiopgwwsfFpiiZdA39B1rAygBkmzKG98hL+NY3wV7V5kwyseWWeCUuWN1p4rHOykqmJqPLgANe9qErwIWlSVokkEzlMQlMmgGnmNXvam2SqkLdXrJI8eMu59qJ90rTk2ohAmFOEwLoZpDiHWX6TZYQkrJ3xV7AW649M7iY6StBIqLxQJqWB8RBAhkTH9EKmnY18teFZBtZvTe6R2xv0QqY8tIyvq5Si2k4Dw6UkpQpp4WbNoswLmpy7djK0bZm37fldV4bm/csSxkzZ+LRiNPntWUZYzVArPBwKGOykHSFU13onkyIMyrz+DfUOMoPTbKYaW8MynuoIC35YLKamgXVnbWV0qSfVLu3b0MZBBFZsOZslmTKVMep9stloeNflsLp56ETX96eLMx5gcMgADWK9UnG7aV6FdBwULPQtrD5TCCIKBjuPhlqfty4gkasXG+dXkRkU0y7jp21DzZ+/Hl04WTaTNMt8ebQ9PkpU9MUUk14wP30dd1/ObWgU02XbNpPizOXe/kKDTGYva5tsJsnmeXpWta+/nTn6vUm3wsX39Xo4Pnutr2szkn5vdt5mOpudbZdBj39vRuZPm+Is0+nZ8PhbXztZYv787Z8LmPTZBUEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBEEQBDnL/7ENiOGg1fy5AAAAAElFTkSuQmCC", width=200)
+        st.sidebar.markdown("<h1 style='color: #007A53;'>Painel de Controle</h1>", unsafe_allow_html=True)    
           
-    # Filtro de Tópicos (Influencia o Nuvem e o Card)
-    topicos_lista = ["Todos"] + sorted(df_topics['Topic_Label'].unique().tolist())
-    topico_selecionado = st.sidebar.selectbox("Focar em um Tópico Específico:", topicos_lista)
-    anos = sorted(df_full['Year'].unique())
-    ano_range = st.sidebar.select_slider("Período:", options=anos, value=(min(anos), max(anos)))
-    df_filtered = df_full[(df_full['Year'] >= ano_range[0]) & (df_full['Year'] <= ano_range[1])]
-    if topico_selecionado != "Todos":
-        df_filtered = df_filtered[df_filtered['Topic_Label'] == topico_selecionado]
-    
-    if st.sidebar.button("<-   Voltar para Capa"):
-        change_page('cover')
-        st.rerun()
-    # --- CORPO DO DASHBOARD ---
-    st.markdown("<h1 style='text-align: center; color: #007A53;'>Observatório da Comunidade Científica</h1>", unsafe_allow_html=True)    
-
-    # Layout em abas conforme o roteiro
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "DESEMPENHO", "PANORAMA (NLP)", "TÓPICOS EM ALTA", "REDES E COLABORAÇÃO", "PESQUISAR"
-    ])
-
-# PAINEL 1: Monitorização de Desempenho (Bibliometria)
-    with tab1:
-        with st.container(border=True):
-            st.markdown("<h2 style='text-align: center; color: #004b93;'>"
-                "Painel 1: Métricas de Produtividade e Impacto"
-                "</h2>", unsafe_allow_html=True)
-
-        # Espaçamento vertical
-        st.markdown("<br>", unsafe_allow_html=True)
-
-        # Métricas com espaçamento refinado
-        m1, m2, m3, m4 = st.columns(4, gap="large")
-
-        for m, label, value in [
-            (m1, "Publicações", len(df_filtered)),
-            (m2, "Nº Citações", int(df_filtered['Cited by'].sum())),
-            (m3, "Citação/Artigo", round(df_filtered['Cited by'].mean(), 2)),
-            (m4, "Tópicos Ativos", df_filtered['Topic_ID'].nunique())]:
-            with m:
-                st.metric(label, value)
-
-        st.markdown("<hr>", unsafe_allow_html=True)
-        col_a, col_b = st.columns(2)
-
-        with col_a:
-            # Evolução Temporal
-            evolucao = df_filtered.groupby('Year').size().reset_index(name='Artigos')
-            fig_evol = px.bar(
-                evolucao,
-                x='Year',
-                y='Artigos',
-                color_discrete_sequence=["#0059B3"]
-            )
-            fig_evol.update_layout(
-                title=dict(
-                    text="Produção Anual de artigos",  
-                    x=0.5,                              # centraliza título
-                    xanchor='center',                  
-                    font=dict(color="#717172")
-                ),
-                xaxis_title=None, 
-                yaxis_title="Volume de Artigos",
-                height=400,           # mesma altura para alinhamento
-                margin=dict(t=50, l=20, r=20, b=20)  # título alinhado no topo
-            )
-            st.plotly_chart(fig_evol, use_container_width=True)
-
-        with col_b:             
-            # Top Journals
-            top_journals = df_filtered['Source title'].value_counts().head(10).reset_index()
-            top_journals_sorted = top_journals.sort_values(by='count', ascending=False)
-
-            fig_jour = px.bar(
-                top_journals_sorted,
-                x='count',
-                y='Source title',
-                orientation='h',
-                color_discrete_sequence=["#66C9F7"],
-                category_orders={"Source title": top_journals_sorted['Source title'].tolist()}
+        # Filtro de Tópicos (Influencia o Nuvem e o Card)
+        topicos_lista = ["Todos"] + sorted(df_topics['Topic_Label'].unique().tolist())
+        topico_selecionado = st.sidebar.selectbox("Focar em um Tópico Específico:", topicos_lista)
+        anos = sorted(df_full['Year'].unique())
+        ano_range = st.sidebar.select_slider("Período:", options=anos, value=(min(anos), max(anos)))
+        # Contexto de filtro (artigos filtrados, máscara e fatia do cubo) passado a cada painel
+        # (memorizado por período/tópico e partilhado entre sessões)
+        with span('filter'):
+            ctx = filter_context(filter_cache, df_full, row_index, df_topics, df_cube, ano_range, topico_selecionado)
+        topic_labels = df_topics.set_index('Topic_ID')['Topic_Label']
+
+        def com_rotulos(df, pos):
+            # Troca o Topic_ID pelo Topic_Label na coluna 'pos'
+            df.insert(pos, 'Topic_Label', df.pop('Topic_ID').map(topic_labels))
+            return df
+
+        def mostrar_figura(fig, **kwargs):
+            # st.plotly_chart com o tempo de serialização/envio ao browser no seu próprio span
+            with span('browser:plotly_chart'):
+                return st.plotly_chart(fig, **kwargs)
+
+        def mostrar_tabela(df, **kwargs):
+            with span('browser:dataframe'):
+                return st.dataframe(df, **kwargs)
+
+        def artigos_relacionados(linha):
+            # Artigos mais próximos do da linha 'linha' do df_full nos vetores documento-tópico do NMF
+            related_index = load_related_index(data_dir, fingerprint)
+            if related_index is None:
+                st.caption("Artigos relacionados indisponíveis: falta a matriz documento-tópico "
+                           "(python topic_pipeline.py fit).")
+                return
+            with span('related'):
+                rows, scores = related_index.similar(linha)
+            st.markdown(f"<p style='font-size: 1.1em; color: #004b93; font-weight: bold; margin: 10px 0 0 0;'>"
+                        f"Artigos relacionados com: {df_full['Title'].iloc[linha]}</p>", unsafe_allow_html=True)
+            if len(rows) == 0:
+                st.info("Este artigo não tem vetor de tópicos (ou nenhum artigo semelhante).")
+                return
+            relacionados = df_full.iloc[rows][['Title', 'Year', 'Source title', 'Topic_Label', 'Link']]
+            mostrar_tabela(
+                relacionados.assign(Semelhança=scores),
+                column_config={
+                    "Title": "Título do Artigo",
+                    "Year": st.column_config.NumberColumn("Ano", format="%d"),
+                    "Source title": "Revista",
+                    "Topic_Label": "Tópico (IA)",
+                    "Link": st.column_config.LinkColumn("Link Scopus/DOI", display_text="Ler Artigo"),
+                    "Semelhança": st.column_config.ProgressColumn("Semelhança", min_value=0.0, max_value=1.0,
+                                                                  format="%.2f"),
+                },
+                use_container_width=True,
+                hide_index=True
             )
-            fig_jour.update_layout(
-                title=dict(
-                    text="Principais Canais de Publicação",  
-                    x=0.5,                              # centraliza título
-                    xanchor='center',                  
-                    font=dict(color='#717172')
-                ),
-                xaxis_title=None, 
-                yaxis_title=None,
-                height=400,           # mesma altura
-                margin=dict(t=50, l=20, r=20, b=20)  # títulos alinhados
+
+        def tendencias(ctx):
+            # Tendência de cada tópico no período escolhido (trends.py); não depende do filtro de tópico
+            return ctx.memo('trends', lambda c: detect_trends(year_topic_counts(cube_slice(df_cube, c.ano_range)),
+                                                              df_topics['Topic_ID'], c.ano_range),
+                            topic_scoped=False)
+    
+        if st.sidebar.button("<-   Voltar para Capa"):
+            change_page('cover')
+            st.rerun()
+        # --- CORPO DO DASHBOARD ---
+        st.markdown("<h1 style='text-align: center; color: #007A53;'>Observatório da Comunidade Científica</h1>", unsafe_allow_html=True)    
+
+    # PAINEL 1: Monitorização de Desempenho (Bibliometria)
+        def painel_desempenho(ctx):
+            with st.container(border=True):
+                st.markdown("<h2 style='text-align: center; color: #004b93;'>"
+                    "Painel 1: Métricas de Produtividade e Impacto"
+                    "</h2>", unsafe_allow_html=True)
+
+            # Espaçamento vertical
+            st.markdown("<br>", unsafe_allow_html=True)
+
+            # Métricas com espaçamento refinado
+            m1, m2, m3, m4 = st.columns(4, gap="large")
+
+            n_publicacoes, n_citacoes, media_citacoes, n_topicos = ctx.memo('metrics', lambda c: panel_metrics(c.cube))
+            for m, label, value in [
+                (m1, "Publicações", n_publicacoes),
+                (m2, "Nº Citações", n_citacoes),
+                (m3, "Citação/Artigo", media_citacoes),
+                (m4, "Tópicos Ativos", n_topicos)]:
+                with m:
+                    st.metric(label, value)
+
+            # Distribuição das citações do conjunto filtrado (índice de citações por ano, ver citation_stats.py)
+            citation_indexes = load_citation_indexes(data_dir, fingerprint)
+            if ctx.n_rows > 0:
+                impacto = ctx.memo('citation_all', lambda c: citation_indexes['Todos'].stats(c.article_mask)).iloc[0]
+                m5, m6, m7, m8 = st.columns(4, gap="large")
+                for m, label, value, ajuda in [
+                    (m5, "Índice h", int(impacto['Índice h']), None),
+                    (m6, "Mediana de Citações", round(impacto['Mediana'], 1), None),
+                    (m7, "P90 / P99", f"{impacto['P90']:.0f} / {impacto['P99']:.0f}",
+                     "90% (99%) dos artigos têm no máximo este nº de citações"),
+                    (m8, "Impacto Normalizado", round(impacto['Impacto normalizado'], 2),
+                     "Citações face à média da mesma grande área e ano (1 = média)")]:
+                    with m:
+                        st.metric(label, value, help=ajuda)
+
+            st.markdown("<hr>", unsafe_allow_html=True)
+            col_a, col_b = st.columns(2)
+
+            with col_a:
+                # Evolução Temporal
+                evolucao = ctx.memo('evolucao', lambda c: yearly_counts(c.cube))
+                def fig_evol_build(evolucao):
+                    fig_evol = px.bar(
+                        evolucao,
+                        x='Year',
+                        y='Artigos',
+                        color_discrete_sequence=["#0059B3"]
+                    )
+                    fig_evol.update_layout(
+                        title=dict(
+                            text="Produção Anual de artigos",  
+                            x=0.5,                              # centraliza título
+                            xanchor='center',                  
+                            font=dict(color="#717172")
+                        ),
+                        xaxis_title=None, 
+                        yaxis_title="Volume de Artigos",
+                        height=400,           # mesma altura para alinhamento
+                        margin=dict(t=50, l=20, r=20, b=20)  # título alinhado no topo
+                    )
+                    return fig_evol
+
+                fig_evol = figure_cache.get('fig_evol', fig_evol_build, evolucao)
+                mostrar_figura(fig_evol, use_container_width=True)
+
+            with col_b:             
+                # Top Journals
+                top_journals_sorted = ctx.memo('top_journals', lambda c: top_journals(c.cube, 10))
+
+                def fig_jour_build(top_journals_sorted):
+                    fig_jour = px.bar(
+                        top_journals_sorted,
+                        x='count',
+                        y='Source title',
+                        orientation='h',
+                        color_discrete_sequence=["#66C9F7"],
+                        category_orders={"Source title": top_journals_sorted['Source title'].tolist()}
+                    )
+                    fig_jour.update_layout(
+                        title=dict(
+                            text="Principais Canais de Publicação",  
+                            x=0.5,                              # centraliza título
+                            xanchor='center',                  
+                            font=dict(color='#717172')
+                        ),
+                        xaxis_title=None, 
+                        yaxis_title=None,
+                        height=400,           # mesma altura
+                        margin=dict(t=50, l=20, r=20, b=20)  # títulos alinhados
+                    )
+                    return fig_jour
+
+                fig_jour = figure_cache.get('fig_jour', fig_jour_build, top_journals_sorted)
+                mostrar_figura(fig_jour, use_container_width=True)
+
+            # Impacto de citações por tópico, revista ou autor(a), para o mesmo filtro
+            st.markdown("<h4 style='color: #004b93;'>Impacto de Citações por Grupo</h4>", unsafe_allow_html=True)
+            grupos = {"Tópico": 'Tópico', "Revista": 'Revista', "Autor(a)": 'Autor'}
+            grupo = grupos[st.radio("Agrupar por", list(grupos), horizontal=True, key="impacto_grupo")]
+            tabela_impacto = ctx.memo(f'citation_{grupo}', lambda c: citation_indexes[grupo].stats(c.article_mask)
+                                      .sort_values(['Índice h', 'Citações'], ascending=False, kind='stable')
+                                      .head(CITATION_TABLE_ROWS))
+            st.caption(f"Os {CITATION_TABLE_ROWS} com maior índice h no período e tópico selecionados. "
+                       "Impacto normalizado: citações face à média da mesma grande área e ano (1 = média).")
+            mostrar_tabela(
+                tabela_impacto,
+                column_config={
+                    "Nome": grupo if grupo != 'Autor' else "Investigador(a)",
+                    "Média": st.column_config.NumberColumn("Média", format="%.2f"),
+                    **{col: st.column_config.NumberColumn(col, format="%.1f") for col in CITATION_PERCENTILES.values()},
+                    "Índice h": st.column_config.NumberColumn("h", format="%d"),
+                    "Impacto normalizado": st.column_config.NumberColumn("Impacto Norm.", format="%.2f"),
+                },
+                use_container_width=True,
+                hide_index=True,
             )
-            st.plotly_chart(fig_jour, use_container_width=True)
 
-# --- PAINEL 2: PANORAMA (NLP) ---
-    with tab2:
-        with st.container(border=True):
-            st.markdown(f"<h2 style='text-align: center; color: #004b93;'>Painel 2: Análise de Conteúdo</h2>", unsafe_allow_html=True)
+    # --- PAINEL 2: PANORAMA (NLP) ---
+        def painel_panorama(ctx):
+            with st.container(border=True):
+                st.markdown(f"<h2 style='text-align: center; color: #004b93;'>Painel 2: Análise de Conteúdo</h2>", unsafe_allow_html=True)
                     
-        # 2. GRÁFICO DE BARRAS GLOBAL (Ignora o filtro de tópico para possibilitar comparação)
-        df_year_only = df_full[(df_full['Year'] >= ano_range[0]) & (df_full['Year'] <= ano_range[1])]
+            # 2. GRÁFICO DE BARRAS GLOBAL (Ignora o filtro de tópico para possibilitar comparação)
+            # Calculamos as contagens globais para o gráfico de barras (fatia do cubo só por anos)
+            topic_counts_global = ctx.memo('topic_counts_global',
+                                           lambda c: com_rotulos(topic_counts(cube_slice(df_cube, c.ano_range)), 0),
+                                           topic_scoped=False)
         
-        # Calculamos as contagens globais para o gráfico de barras
-        topic_counts_global = df_year_only['Topic_Label'].value_counts().reset_index()
-        topic_counts_global.columns = ['Topic_Label', 'Quantidade']
-        
-        fig_bar = px.bar(
-            topic_counts_global, 
-            x='Quantidade', 
-            y='Topic_Label', 
-            orientation='h', 
-            color='Quantidade', 
-            color_continuous_scale='Blues',
-            labels= {'Quantidade': 'Nº de artigos'}
-        )
-        fig_bar.update_layout(yaxis=None, xaxis=None, title=dict(
-                    text="Artigos por Área Científica (Tópicos gerados)",  
-                    x=0.5,                              
-                    xanchor='center',                  
-                    font=dict(color='#717172')), height=400)
-        st.plotly_chart(fig_bar, use_container_width=True)
-
-        st.divider()
-
-        # 3. LÓGICA DE SELEÇÃO PARA DETALHAMENTO (Nuvem e Card)
-        # Se 'Todos' estiver no sidebar, detalhamos o tópico com maior volume no período
-        if topico_selecionado == "Todos":
-            display_topic = topic_counts_global['Topic_Label'].iloc[0] 
-        else:
-            display_topic = topico_selecionado
-
-        # Busca informações na tabela Dim_Topics para o tópico a ser exibido
-        topic_info = df_topics[df_topics['Topic_Label'] == display_topic].iloc[0]
-
-        # 4. COLUNAS: NUVEM (Esquerda) e CARD IA (Direita)
-        col_left, col_right = st.columns([1.2, 1])
-
-        with col_left:
-            st.markdown(f"<p style='font-size: 1.2em; color: #717172; font-weight: bold; margin-bottom: 0;'>Identidade Semântica: {display_topic}</p>", unsafe_allow_html=True)
-            
-            # Recuperar ID do tópico e filtrar termos
-            t_id = df_topics[df_topics['Topic_Label'] == display_topic]['Topic_ID'].values[0]
-            t_terms = df_terms[df_terms['Topic_ID'] == t_id]
-            
-            if not t_terms.empty:
-                from wordcloud import WordCloud
-                import matplotlib.pyplot as plt
-
-                weights_dict = dict(zip(t_terms['term'], t_terms['weight']))
-                wordcloud = WordCloud(
-                    width=1000, height=600, 
-                    background_color='white',
-                    colormap='Blues', 
-                    max_words=50
-                ).generate_from_frequencies(weights_dict)
-                
-                fig, ax = plt.subplots(figsize=(12, 7))
-                ax.imshow(wordcloud, interpolation='bilinear')
-                ax.axis('off')
-                plt.tight_layout(pad=0)
-                st.pyplot(fig)
+            def fig_bar_build(topic_counts_global):
+                fig_bar = px.bar(
+                    topic_counts_global, 
+                    x='Quantidade', 
+                    y='Topic_Label', 
+                    orientation='h', 
+                    color='Quantidade', 
+                    color_continuous_scale='Blues',
+                    labels= {'Quantidade': 'Nº de artigos'}
+                )
+                fig_bar.update_layout(yaxis=None, xaxis=None, title=dict(
+                            text="Artigos por Área Científica (Tópicos gerados)",  
+                            x=0.5,                              
+                            xanchor='center',                  
+                            font=dict(color='#717172')), height=400)
+                return fig_bar
+
+            fig_bar = figure_cache.get('fig_bar', fig_bar_build, topic_counts_global)
+            mostrar_figura(fig_bar, use_container_width=True)
+
+            st.divider()
+
+            # 3. LÓGICA DE SELEÇÃO PARA DETALHAMENTO (Nuvem e Card)
+            # Se 'Todos' estiver no sidebar, detalhamos o tópico com maior volume no período
+            if ctx.topico == "Todos":
+                display_topic = topic_counts_global['Topic_Label'].iloc[0] 
+            else:
+                display_topic = ctx.topico
+
+            # Busca informações na tabela Dim_Topics para o tópico a ser exibido
+            topic_info = df_topics[df_topics['Topic_Label'] == display_topic].iloc[0]
+            # Tendência calculada para o período escolhido (e não o Trend_Status fixo do Dim_Topics)
+            relatorio = tendencias(ctx)
+            if relatorio.table.empty:
+                tendencia = "Período curto"
             else:
-                st.warning("Não foram encontrados termos para este tópico.")
+                tendencia = relatorio.table.loc[relatorio.table['Topic_ID'] == topic_info['Topic_ID'], 'Tendência'].iloc[0]
 
-        with col_right:
-            st.markdown(f"<p style='font-size: 1.2em; color: #717172; font-weight: bold; margin-bottom: 0;'> Resumo do Tópico</p>", unsafe_allow_html=True)
-            st.markdown(f"""
+            # 4. COLUNAS: NUVEM (Esquerda) e CARD IA (Direita)
+            col_left, col_right = st.columns([1.2, 1])
+
+            with col_left:
+                st.markdown(f"<p style='font-size: 1.2em; color: #717172; font-weight: bold; margin-bottom: 0;'>Identidade Semântica: {display_topic}</p>", unsafe_allow_html=True)
+            
+                # Recuperar ID do tópico e a nuvem já desenhada (PNG em cache)
+                t_id = df_topics[df_topics['Topic_Label'] == display_topic]['Topic_ID'].values[0]
+                with span('wordcloud'):
+                    wordcloud_bytes = load_wordcloud(data_dir, fingerprint, t_id, df_terms)
+
+                    if wordcloud_bytes is not None:
+                        st.image(wordcloud_bytes, width="stretch")
+                    else:
+                        st.warning("Não foram encontrados termos para este tópico.")
+
+            with col_right:
+                st.markdown(f"<p style='font-size: 1.2em; color: #717172; font-weight: bold; margin-bottom: 0;'> Resumo do Tópico</p>", unsafe_allow_html=True)
+                st.markdown(f"""
                 <div style="background-color: #F0F2F6; color: white; padding: 25px; border-radius: 15px; 
                             border-left: 8px solid #004b93; min-height: 380px; box-shadow: 5px 5px 15px rgba(0,0,0,0.3);">
                     <h2 style="color: #004b93; margin-top: 0; font-size: 1.6em;">{display_topic}</h2>
@@ -573,103 +794,105 @@ else:
                     </p>
                     <div style="margin-top: 20px;">
                         <span style="background: #004b93; padding: 6px 12px; border-radius: 4px; font-size: 0.8em; font-weight: bold;">
-                            TENDÊNCIA: {topic_info['Trend_Status']}
+                            TENDÊNCIA: {tendencia.upper()} ({ctx.ano_range[0]}–{ctx.ano_range[1]})
                         </span>
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
-        st.divider()
+            st.divider()
 
-        # --- BLOCO: DISPERÇÃO REVISTAS x TÓPICOS ---
+            # --- BLOCO: DISPERÇÃO REVISTAS x TÓPICOS ---
         
-        # 1. Título
-        st.markdown("<h4 style='color: #004b93; margin-bottom: 5px;'>Relação Revistas x Tópicos (Top 10)</h4>", unsafe_allow_html=True)
+            # 1. Título
+            st.markdown("<h4 style='color: #004b93; margin-bottom: 5px;'>Relação Revistas x Tópicos (Top 10)</h4>", unsafe_allow_html=True)
         
-        # 2. Instrução (Posicionada logo abaixo do título, conforme pedido)
-        st.markdown("<p style='color: #666; font-size: 0.95rem; margin-top: 0;'>Clique em uma bolha azul abaixo para listar os artigos correspondentes.</p>", unsafe_allow_html=True)
-
-        # --- Preparar os dados ---
-        # Top 10 revistas
-        top_10_journals = df_filtered['Source title'].value_counts().head(10).index.tolist()
-
-        abreviacoes_revistas = {}
-        for journal in top_10_journals:
-            words = journal.split()
-            # Abrevia para até 3 palavras principais
-            if len(words) <= 3:
-                abreviacoes_revistas[journal] = " ".join(words)
-            else:
-                abreviacoes_revistas[journal] = " ".join(words[:2]) + "…"
+            # 2. Instrução (Posicionada logo abaixo do título, conforme pedido)
+            st.markdown("<p style='color: #666; font-size: 0.95rem; margin-top: 0;'>Clique em uma bolha azul abaixo para listar os artigos correspondentes.</p>", unsafe_allow_html=True)
+
+            # --- Preparar os dados ---
+            # Top 10 revistas
+            top_10_journals = ctx.memo('top_journals', lambda c: top_journals(c.cube, 10))['Source title'].tolist()
+
+            abreviacoes_revistas = {}
+            for journal in top_10_journals:
+                words = journal.split()
+                # Abrevia para até 3 palavras principais
+                if len(words) <= 3:
+                    abreviacoes_revistas[journal] = " ".join(words)
+                else:
+                    abreviacoes_revistas[journal] = " ".join(words[:2]) + "…"
         
-        df_top_journals = df_filtered[df_filtered['Source title'].isin(top_10_journals)]
-
-        # Contagem de artigos por Revista x Tópico
-        df_dist = df_top_journals.groupby(['Source title', 'Topic_Label']).size().reset_index(name='Artigos')
-
-        # Top 10 tópicos
-        top_10_topics = df_dist.groupby('Topic_Label')['Artigos'].sum().sort_values(ascending=False).head(10).index.tolist()
-        df_dist_top = df_dist[df_dist['Topic_Label'].isin(top_10_topics)].reset_index(drop=True)
-
-        # Abreviar nomes das revistas
-        df_dist_top['Revista_Abrev'] = df_dist_top['Source title'].map(lambda x: abreviacoes_revistas.get(x, x))
-
-        # Legendar Topicos
-        legenda_topicos = {topic: f"T{i+1}" for i, topic in enumerate(top_10_topics)}
-        df_dist_top['Topico_Legenda'] = df_dist_top['Topic_Label'].map(legenda_topicos)
-
-        # --- Criar gráfico de dispersão ---
-        fig_scatter = px.scatter(
-            df_dist_top,
-            x='Topico_Legenda',
-            y='Revista_Abrev',  
-            size='Artigos',
-            color_discrete_sequence=['#004b93'],  
-            custom_data=['Source title', 'Topic_Label', 'Artigos'], # Dados para recuperar no clique
-            size_max=40
-        )
-
-        # Ajustes visuais
-        fig_scatter.update_layout(
-            xaxis_title=None,
-            yaxis_title=None,
-            plot_bgcolor='rgba(0,0,0,0)',
-            height=650, # Ajustei levemente a altura
-            margin=dict(l=80, r=50, t=30, b=100), # Reduzi margem superior (t)
-            font=dict(size=12),
-            clickmode='event+select'
-        )
+            # Contagem de artigos por Revista x Tópico
+            df_dist = ctx.memo('df_dist', lambda c: com_rotulos(journal_topic_counts(c.cube, top_10_journals), 1))
+
+            # Top 10 tópicos
+            top_10_topics = df_dist.groupby('Topic_Label')['Artigos'].sum().sort_values(ascending=False).head(10).index.tolist()
+            df_dist_top = df_dist[df_dist['Topic_Label'].isin(top_10_topics)].reset_index(drop=True)
+
+            # Abreviar nomes das revistas
+            df_dist_top['Revista_Abrev'] = df_dist_top['Source title'].map(lambda x: abreviacoes_revistas.get(x, x))
+
+            # Legendar Topicos
+            legenda_topicos = {topic: f"T{i+1}" for i, topic in enumerate(top_10_topics)}
+            df_dist_top['Topico_Legenda'] = df_dist_top['Topic_Label'].map(legenda_topicos)
+
+            # --- Criar gráfico de dispersão ---
+            def fig_scatter_build(df_dist_top):
+                fig_scatter = px.scatter(
+                    df_dist_top,
+                    x='Topico_Legenda',
+                    y='Revista_Abrev',  
+                    size='Artigos',
+                    color_discrete_sequence=['#004b93'],  
+                    custom_data=['Source title', 'Topic_Label', 'Artigos'], # Dados para recuperar no clique
+                    size_max=40
+                )
+
+                # Ajustes visuais
+                fig_scatter.update_layout(
+                    xaxis_title=None,
+                    yaxis_title=None,
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    height=650, # Ajustei levemente a altura
+                    margin=dict(l=80, r=50, t=30, b=100), # Reduzi margem superior (t)
+                    font=dict(size=12),
+                    clickmode='event+select'
+                )
         
-        fig_scatter.update_traces(
-            hovertemplate=
-            "REVISTA: %{customdata[0]}<br>" +
-            "TÓPICO: %{customdata[1]}<br>" +
-            "Nº ARTIGOS: %{customdata[2]}<extra></extra>"
-        )
-
-        fig_scatter.update_yaxes(categoryorder='total ascending')
-
-        # --- EXIBIÇÃO COM EVENTO DE SELEÇÃO ---
-        event = st.plotly_chart(
-            fig_scatter, 
-            use_container_width=True, 
-            on_select="rerun", 
-            selection_mode="points"
-        )
-
-        # --- LÓGICA DO CLIQUE ---
-        if event and len(event["selection"]["points"]) > 0:
-            try:
-                # Pegamos o índice do ponto clicado
-                point_index = event["selection"]["points"][0]["point_index"]
+                fig_scatter.update_traces(
+                    hovertemplate=
+                    "REVISTA: %{customdata[0]}<br>" +
+                    "TÓPICO: %{customdata[1]}<br>" +
+                    "Nº ARTIGOS: %{customdata[2]}<extra></extra>"
+                )
+
+                fig_scatter.update_yaxes(categoryorder='total ascending')
+                return fig_scatter
+
+            fig_scatter = figure_cache.get('fig_scatter', fig_scatter_build, df_dist_top)
+
+            # --- EXIBIÇÃO COM EVENTO DE SELEÇÃO ---
+            event = mostrar_figura(
+                fig_scatter, 
+                use_container_width=True, 
+                on_select="rerun", 
+                selection_mode="points"
+            )
+
+            # --- LÓGICA DO CLIQUE ---
+            if event and len(event["selection"]["points"]) > 0:
+                try:
+                    # Pegamos o índice do ponto clicado
+                    point_index = event["selection"]["points"][0]["point_index"]
                 
-                # Recuperamos a linha correspondente
-                selected_row = df_dist_top.iloc[point_index]
+                    # Recuperamos a linha correspondente
+                    selected_row = df_dist_top.iloc[point_index]
                 
-                sel_revista = selected_row['Source title']
-                sel_topico = selected_row['Topic_Label']
-                sel_qtd = selected_row['Artigos']
+                    sel_revista = selected_row['Source title']
+                    sel_topico = selected_row['Topic_Label']
+                    sel_qtd = selected_row['Artigos']
 
-                st.markdown(f"""
+                    st.markdown(f"""
                 <div style="background-color: #e8f4f8; padding: 15px; border-radius: 10px; border: 1px solid #b3d7ff; margin-bottom: 15px; margin-top: 10px;">
                     <h5 style="margin: 0; color: #004b93;">🔎 Detalhes da Seleção</h5>
                     <p style="margin: 5px 0 0 0; color: #333;">
@@ -678,321 +901,501 @@ else:
                 </div>
                 """, unsafe_allow_html=True)
 
-                # Filtramos o dataframe
-                artigos_detalhe = df_filtered[
-                    (df_filtered['Source title'] == sel_revista) & 
-                    (df_filtered['Topic_Label'] == sel_topico)
-                ][['Title', 'Year', 'Cited by', 'Link']]
-
-                # Tabela interativa
-                st.dataframe(
-                    artigos_detalhe,
-                    column_config={
-                        "Link": st.column_config.LinkColumn("Link Scopus/DOI", display_text="Ler Artigo"),
-                        "Title": "Título do Artigo",
-                        "Cited by": "Citações"
-                    },
-                    use_container_width=True,
-                    hide_index=True
-                )
-            except Exception as e:
-                st.error(f"Erro ao recuperar detalhes: {e}")
-
-# --- PAINEL 3: TENDÊNCIAS E CICLO DE VIDA ---
-    with tab3:
-        with st.container(border=True):
-            st.markdown(f"<h2 style='text-align: center; color: #004b93;'>Painel 3: Ciclo de Vida e Maturidade dos Tópicos</h2>", unsafe_allow_html=True)
+                    # Filtramos o dataframe
+                    artigos_detalhe = ctx.df[
+                        (ctx.df['Source title'] == sel_revista) & 
+                        (ctx.df['Topic_Label'] == sel_topico)
+                    ][['Title', 'Year', 'Cited by', 'Link']]
+
+                    # Tabela interativa: um artigo selecionado mostra os relacionados
+                    detalhe = mostrar_tabela(
+                        artigos_detalhe,
+                        column_config={
+                            "Link": st.column_config.LinkColumn("Link Scopus/DOI", display_text="Ler Artigo"),
+                            "Title": "Título do Artigo",
+                            "Cited by": "Citações"
+                        },
+                        use_container_width=True,
+                        hide_index=True,
+                        on_select="rerun",
+                        selection_mode="single-row",
+                        key="tabela_detalhe"
+                    )
+                    if len(detalhe.selection.rows) > 0:
+                        # O índice do ctx.df é a posição da linha no df_full
+                        artigos_relacionados(artigos_detalhe.index[detalhe.selection.rows[0]])
+                except Exception as e:
+                    st.error(f"Erro ao recuperar detalhes: {e}")
+
+    # --- PAINEL 3: TENDÊNCIAS E CICLO DE VIDA ---
+        def painel_tendencias(ctx):
+            with st.container(border=True):
+                st.markdown(f"<h2 style='text-align: center; color: #004b93;'>Painel 3: Ciclo de Vida e Maturidade dos Tópicos</h2>", unsafe_allow_html=True)
             
-            if df_filtered.empty:
-                st.warning("Ajuste os filtros laterais para visualizar a evolução temporal.")
-            else:
-                # 1. Agregação de dados por Ano e Tópico
-                trend_data = df_filtered.groupby(['Year', 'Topic_Label']).size().reset_index(name='Volume')
+                if ctx.n_rows == 0:
+                    st.warning("Ajuste os filtros laterais para visualizar a evolução temporal.")
+                else:
+                    # 1. Agregação de dados por Ano e Tópico
+                    trend_data = ctx.memo('trend_data', lambda c: com_rotulos(year_topic_counts(c.cube), 1))
                 
-                # 2. Gráfico de Barras Horizontais Empilhadas (Stacked Bar Chart)
-                # O eixo Y mostra os tópicos e o X a quantidade. A cor diferencia os anos.
-                fig_trend = px.bar(
-                    trend_data, 
-                    x="Volume", 
-                    y="Topic_Label", 
-                    color="Year", 
-                    orientation='h',
-                    color_continuous_scale='Blues', # Tons de azul conforme solicitado
-                    title="Distribuição Histórica da Produção por Tópico",
-                    labels={'Volume': 'Quantidade de Artigos', 'Topic_Label': 'Área Científica', 'Year': 'Ano'}
-                )
+                    # 2. Gráfico de Barras Horizontais Empilhadas (Stacked Bar Chart)
+                    # O eixo Y mostra os tópicos e o X a quantidade. A cor diferencia os anos.
+                    def fig_trend_build(trend_data):
+                        fig_trend = px.bar(
+                            trend_data, 
+                            x="Volume", 
+                            y="Topic_Label", 
+                            color="Year", 
+                            orientation='h',
+                            color_continuous_scale='Blues', # Tons de azul conforme solicitado
+                            title="Distribuição Histórica da Produção por Tópico",
+                            labels={'Volume': 'Quantidade de Artigos', 'Topic_Label': 'Área Científica', 'Year': 'Ano'}
+                        )
 
-                # 3. Aplicação do Princípio de Pouca Tinta (Minimalismo Visual)
-                fig_trend.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)', 
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    xaxis=dict(
-                        showgrid=True, 
-                        gridcolor='#f0f0f0', 
-                        title_font=dict(size=12, color='#4F5B63')
-                    ),
-                    yaxis=dict(
-                        showgrid=False, 
-                        categoryorder='total ascending', # Ordena do maior para o menor volume
-                        title_font=dict(size=12, color='#4F5B63')
-                    ),
-                    height=600,
-                    margin=dict(l=0, r=0, t=50, b=0),
-                    coloraxis_colorbar=dict(
-                        title="Ano", 
-                        thickness=15,
-                        len=0.5
-                    )
-                )
+                        # 3. Aplicação do Princípio de Pouca Tinta (Minimalismo Visual)
+                        fig_trend.update_layout(
+                            plot_bgcolor='rgba(0,0,0,0)', 
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            xaxis=dict(
+                                showgrid=True, 
+                                gridcolor='#f0f0f0', 
+                                title_font=dict(size=12, color='#4F5B63')
+                            ),
+                            yaxis=dict(
+                                showgrid=False, 
+                                categoryorder='total ascending', # Ordena do maior para o menor volume
+                                title_font=dict(size=12, color='#4F5B63')
+                            ),
+                            height=600,
+                            margin=dict(l=0, r=0, t=50, b=0),
+                            coloraxis_colorbar=dict(
+                                title="Ano", 
+                                thickness=15,
+                                len=0.5
+                            )
+                        )
+                        return fig_trend
 
-                st.plotly_chart(fig_trend, use_container_width=True)
+                    fig_trend = figure_cache.get('fig_trend', fig_trend_build, trend_data)
 
-            st.divider()
+                    mostrar_figura(fig_trend, use_container_width=True)
 
-            # 9. Classificação de "Hot Topics" (Tabela com Indicadores)
-            st.markdown("#### Classificação de Relevância Estratégica")
-            
-            # Colunas para organizar a lista de status
-            c_hot, c_stable = st.columns(2)
-            
-            with c_hot:
-                st.markdown("<p style='color: #004b93; font-weight: bold;'> ÁREAS EM ALTA (HOT)</p>", unsafe_allow_html=True)
-                # Filtragem dos tópicos Hot na dimensão
-                hot_list = df_topics[df_topics['Trend_Status'].str.contains('Hot', na=False)]['Topic_Label'].tolist()
-                for t in hot_list:
-                    st.markdown(f"- {t}")
-            
-            with c_stable:
-                st.markdown("<p style='color: #4F5B63; font-weight: bold;'> ÁREAS CONSOLIDADAS (STABLE)</p>", unsafe_allow_html=True)
-                # Filtragem dos tópicos Estáveis
-                stable_list = df_topics[df_topics['Trend_Status'].str.contains('Stable', na=False)]['Topic_Label'].tolist()
-                for t in stable_list:
-                    st.markdown(f"- {t}")
-
-            st.caption("Nota: A segmentação por cores no gráfico acima permite validar visualmente o status de tendência de cada área.")
-
-# --- PAINEL 4: REDES E COLABORAÇÃO ---
-    with tab4:
-        with st.container(border=True):
-            st.markdown(f"<h2 style='text-align: center; color: #004b93;'>Painel 4: Dimensão Geográfica e Colaboração Internacional</h2>", unsafe_allow_html=True)
-
-        if df_filtered.empty:
-            st.warning("Ajuste os filtros na barra lateral para carregar os dados.")
-        else:
-            # ==========================================
-            # PARTE 1: MAPA (LÓGICA ORIGINAL)
-            # ==========================================
-            
-            # 1. Processamento de Países
-            article_ids = df_filtered['Article_ID'].unique()
-            geo_filtered = df_geo[df_geo['Article_ID'].isin(article_ids)].copy()
-
-            # Lista estrita de países válidos
-            paises_validos = ['Brazil', 'Portugal', 'Spain', 'Germany', 'United States', 
-                            'France', 'Italy', 'United Kingdom', 'China', 'Argentina', 
-                            'Chile', 'Colombia', 'Mexico', 'Angola', 'Mozambique']
-
-            map_fix = {'Brasil': 'Brazil', 'Espanha': 'Spain', 'Alemanha': 'Germany', 'Estados Unidos': 'United States'}
-            
-            # Aplica a correção e o filtro estrito
-            geo_filtered['Country_Region'] = geo_filtered['Country_Region'].replace(map_fix)
-            geo_filtered = geo_filtered[geo_filtered['Country_Region'].isin(paises_validos)]
+                st.divider()
 
-            col_map, col_ranking = st.columns([2, 1])
+                # 9. Classificação dos tópicos pela tendência no período escolhido (trends.py)
+                st.markdown("#### Classificação de Relevância Estratégica")
+                relatorio = tendencias(ctx)
 
-            with col_map:
-                if geo_filtered.empty:
-                    st.info("Sem dados geográficos válidos para estes filtros.")
+                if relatorio.table.empty:
+                    st.info(f"São precisos pelo menos {MIN_TREND_YEARS} anos completos no período para classificar "
+                            "as tendências.")
                 else:
-                    geo_counts = geo_filtered['Country_Region'].value_counts().reset_index()
-                    geo_counts.columns = ['Local', 'Frequência']
-
-                    st.markdown("<h4 style='color: #004b93;'>Distribuição Global de Parcerias</h4>", unsafe_allow_html=True)
-                    
-                    # Scatter Geo Original
-                    fig_map = px.scatter_geo(
-                        geo_counts,
-                        locations="Local",
-                        locationmode="country names",
-                        size="Frequência",
-                        hover_name="Local",
-                        color_discrete_sequence=["#004b93"],
-                        projection="natural earth",
-                        size_max=30
+                    tabela_tendencias = com_rotulos(relatorio.table.copy(), 0)
+
+                    # Colunas para organizar a lista de status
+                    cores = {'Emergente': '#007A53', 'Em alta': '#004b93', 'Estável': '#4F5B63', 'Em declínio': '#B03A2E'}
+                    for coluna, classe in zip(st.columns(len(TREND_CLASSES)), TREND_CLASSES):
+                        with coluna:
+                            st.markdown(f"<p style='color: {cores[classe]}; font-weight: bold;'> {classe.upper()}</p>",
+                                        unsafe_allow_html=True)
+                            for t in tabela_tendencias.loc[tabela_tendencias['Tendência'] == classe, 'Topic_Label']:
+                                st.markdown(f"- {t}")
+
+                    mostrar_tabela(
+                        tabela_tendencias.sort_values('Declive', ascending=False),
+                        column_config={
+                            "Topic_Label": "Área Científica",
+                            "Declive": st.column_config.NumberColumn("Declive (%/ano)", format="%.1f"),
+                            "CAGR": st.column_config.NumberColumn("CAGR (%)", format="%.1f"),
+                            "Aceleração": st.column_config.NumberColumn("Aceleração (z)", format="%.2f"),
+                            "Δ Quota": st.column_config.NumberColumn("Δ Quota (p.p.)", format="%.2f"),
+                        },
+                        use_container_width=True,
+                        hide_index=True,
                     )
-                    fig_map.update_layout(
-                        margin=dict(l=0, r=0, t=30, b=0),
-                        height=450
-                    )
-                    st.plotly_chart(fig_map, use_container_width=True)
-
-            with col_ranking:
-                st.markdown(f"<h4 style='color: #717172;'>Ranking de Países</h4>", unsafe_allow_html=True)
-                if not geo_filtered.empty:
-                    top_paises = geo_counts.sort_values('Frequência', ascending=False).head(10).sort_values('Frequência', ascending=True)
-                    
-                    fig_bar = px.bar(
-                        top_paises,
-                        x='Frequência',
-                        y='Local',
-                        orientation='h',
-                        color_discrete_sequence=["#004b93"]
-                    )
-                    fig_bar.update_layout(
-                        yaxis=None,
-                        xaxis=None,
-                        margin=dict(l=0, r=0, t=10, b=0)
-                    )
-                    st.plotly_chart(fig_bar, use_container_width=True)
-
-            st.divider()
-
-            # ==========================================
-            # PARTE 2: AUTORES POR ÁREA + INTERATIVIDADE
-            # ==========================================
-            st.markdown(f"<h3 style='color: #004b93;'>Liderança Científica por Grande Área</h3>", unsafe_allow_html=True)
-            st.caption("Selecione um autor na tabela para ver os seus artigos detalhados.")
 
-            # Preparação dos dados de Autores
-            df_auth_articles = df_filtered[['Article_ID', 'Topic_Label']].merge(df_bridge_authors, on='Article_ID')
-            df_auth_full = df_auth_articles.merge(df_authors, on='Author_ID')
+                    excluidos = ""
+                    if relatorio.excluded_years:
+                        excluidos = f" Anos incompletos excluídos: {', '.join(map(str, relatorio.excluded_years))}."
+                    st.caption(f"Calculado sobre {relatorio.years[0]}–{relatorio.years[-1]}.{excluidos} "
+                               "Emergente: aceleração acima dos outros tópicos (z ≥ 1) e quota a subir; "
+                               f"em alta: CAGR ≥ {HOT_CAGR:.0%} e quota a subir; "
+                               f"em declínio: CAGR ≤ {DECLINE_CAGR:.0%} e quota a descer.")
+
+    # --- PAINEL 4: REDES E COLABORAÇÃO ---
+        def painel_redes(ctx):
+            with st.container(border=True):
+                st.markdown(f"<h2 style='text-align: center; color: #004b93;'>Painel 4: Dimensão Geográfica e Colaboração Internacional</h2>", unsafe_allow_html=True)
+
+            if ctx.n_rows == 0:
+                st.warning("Ajuste os filtros na barra lateral para carregar os dados.")
+            else:
+                # ==========================================
+                # PARTE 1: MAPA
+                # ==========================================
             
-            # Contagem e Tópico Principal
-            auth_counts = df_auth_full.groupby(['Author_Name', 'Topic_Label']).size().reset_index(name='Qtd')
-            auth_main_topic = auth_counts.sort_values('Qtd', ascending=False).drop_duplicates('Author_Name')
-
-            # Classificação de Áreas
-            def classificar_macro_area(topico):
-                topico = str(topico).lower()
-                eng_keywords = ['material', 'engineer', 'tech', 'comput', 'mechanic', 'electric', 'civil', 'nano', 'robot', 'data']
-                soc_keywords = ['educa', 'social', 'teach', 'econom', 'manage', 'art', 'histor', 'psycholog', 'lang']
-                
-                if any(k in topico for k in eng_keywords): return "Engenharias & Tec."
-                elif any(k in topico for k in soc_keywords): return "Sociais & Humanas"
-                else: return "Ciências Exatas & Nat."
+                # 1. Contagem de países: tabela artigo x país já normalizada (ISO-3166)
+                country_rows, country_pos, df_countries = load_country_index(data_dir, fingerprint)
+                geo_counts = ctx.memo('geo_counts', lambda c: country_counts(country_rows, country_pos, c.article_mask, df_countries))
 
-            auth_main_topic['Macro_Area'] = auth_main_topic['Topic_Label'].apply(classificar_macro_area)
+                col_map, col_ranking = st.columns([2, 1])
 
-            # Colunas para as tabelas interativas
-            c_eng, c_cienc, c_soc = st.columns(3)
-            selected_author_name = None
-
-            # Função para renderizar tabela (Sem emojis)
-            def render_interactive_table(coluna, titulo, filtro_area, key_suffix):
-                with coluna:
-                    # Header simplificado sem ícone
-                    st.markdown(f"<div style='background-color:#F0F7FF; padding:10px; border-radius:10px; text-align:center; border: 1px solid #D1E9FF; margin-bottom: 10px;'><h5 style='margin:0; color:#004b93;'>{titulo}</h5></div>", unsafe_allow_html=True)
+                with col_map:
+                    if geo_counts.empty:
+                        st.info("Sem dados geográficos válidos para estes filtros.")
+                    else:
+                        st.markdown("<h4 style='color: #004b93;'>Distribuição Global de Parcerias</h4>", unsafe_allow_html=True)
                     
-                    df_show = auth_main_topic[auth_main_topic['Macro_Area'] == filtro_area].sort_values('Qtd', ascending=False).head(5)
+                        # Scatter Geo Original
+                        def fig_map_build(geo_counts):
+                            fig_map = px.scatter_geo(
+                                geo_counts,
+                                locations="ISO_A3",
+                                locationmode="ISO-3",
+                                size="Frequência",
+                                hover_name="Local",
+                                color_discrete_sequence=["#004b93"],
+                                projection="natural earth",
+                                size_max=30
+                            )
+                            fig_map.update_layout(
+                                margin=dict(l=0, r=0, t=30, b=0),
+                                height=450
+                            )
+                            return fig_map
+
+                        fig_map = figure_cache.get('fig_map', fig_map_build, geo_counts)
+                        mostrar_figura(fig_map, use_container_width=True)
+
+                with col_ranking:
+                    st.markdown(f"<h4 style='color: #717172;'>Ranking de Países</h4>", unsafe_allow_html=True)
+                    if not geo_counts.empty:
+                        top_paises = geo_counts.sort_values('Frequência', ascending=False).head(10).sort_values('Frequência', ascending=True)
                     
-                    if not df_show.empty:
-                        event = st.dataframe(
-                            df_show[['Author_Name', 'Qtd', 'Topic_Label']],
-                            column_config={
-                                "Author_Name": "Investigador(a)",
-                                "Qtd": st.column_config.NumberColumn("Arts.", format="%d"),
-                                "Topic_Label": "Foco Principal"
-                            },
-                            use_container_width=True,
-                            hide_index=True,
-                            on_select="rerun",
-                            selection_mode="single-row",
-                            key=f"table_{key_suffix}"
-                        )
-                        if len(event.selection.rows) > 0:
-                            return df_show.iloc[event.selection.rows[0]]['Author_Name']
-                    else:
-                        st.info("Sem dados.")
-                return None
-
-            # Renderiza as tabelas (sem passar o argumento icone)
-            sel_eng = render_interactive_table(c_eng, "Engenharias", "Engenharias & Tec.", "eng")
-            sel_cienc = render_interactive_table(c_cienc, "Ciências", "Ciências Exatas & Nat.", "sci")
-            sel_soc = render_interactive_table(c_soc, "Sociais / Hum.", "Sociais & Humanas", "soc")
-
-            # Verifica seleção
-            if sel_eng: selected_author_name = sel_eng
-            elif sel_cienc: selected_author_name = sel_cienc
-            elif sel_soc: selected_author_name = sel_soc
-
-            # ==========================================
-            # PARTE 3: DETALHE DO AUTOR
-            # ==========================================
-            if selected_author_name:
+                        def fig_ranking_build(top_paises):
+                            fig_bar = px.bar(
+                                top_paises,
+                                x='Frequência',
+                                y='Local',
+                                orientation='h',
+                                color_discrete_sequence=["#004b93"]
+                            )
+                            fig_bar.update_layout(
+                                yaxis=None,
+                                xaxis=None,
+                                margin=dict(l=0, r=0, t=10, b=0)
+                            )
+                            return fig_bar
+
+                        fig_bar = figure_cache.get('fig_ranking', fig_ranking_build, top_paises)
+                        mostrar_figura(fig_bar, use_container_width=True)
+
                 st.divider()
-                st.markdown(f"""
+
+                # ==========================================
+                # PARTE 2: AUTORES POR ÁREA + INTERATIVIDADE
+                # ==========================================
+                st.markdown(f"<h3 style='color: #004b93;'>Liderança Científica por Grande Área</h3>", unsafe_allow_html=True)
+                st.caption("Selecione um autor na tabela para ver os seus artigos detalhados.")
+
+                criterios = {"Artigos no tópico principal": 'topic_articles', "Citações": 'citations',
+                             "Índice h": 'h_index'}
+                criterio = st.radio("Ordenar por", list(criterios), horizontal=True, key="leaderboard_criterio")
+                metric = criterios[criterio]
+
+                # Top-k por macro-área (a macro-área é a do tópico principal de cada autor)
+                author_index = load_author_index(data_dir, fingerprint)
+                leaderboard = load_leaderboard(data_dir, fingerprint)
+                auth_top = ctx.memo(f'leaderboard_{metric}', lambda c: leaderboard.top_authors(
+                    c.article_mask, df_topics['Topic_Label'], df_topics['Macro_Area'], metric, LEADERBOARD_K))
+                area_codes = auth_top['Macro_Area'].cat.codes.to_numpy()
+                metric_col = {'topic_articles': 'Qtd', 'citations': 'Citações', 'h_index': 'Índice h'}[metric]
+
+                # Colunas para as tabelas interativas
+                c_eng, c_cienc, c_soc = st.columns(3)
+                selected_author = None
+
+                # Função para renderizar tabela (Sem emojis)
+                def render_interactive_table(coluna, titulo, filtro_area, key_suffix):
+                    with coluna:
+                        # Header simplificado sem ícone
+                        st.markdown(f"<div style='background-color:#F0F7FF; padding:10px; border-radius:10px; text-align:center; border: 1px solid #D1E9FF; margin-bottom: 10px;'><h5 style='margin:0; color:#004b93;'>{titulo}</h5></div>", unsafe_allow_html=True)
+                    
+                        # Filtro pelo código inteiro da categoria (já ordenado pelo critério)
+                        codigo = auth_top['Macro_Area'].cat.categories.get_loc(filtro_area)
+                        df_show = auth_top[area_codes == codigo]
+                    
+                        if not df_show.empty:
+                            event = mostrar_tabela(
+                                df_show[['Author_Name', metric_col, 'Topic_Label']],
+                                column_config={
+                                    "Author_Name": "Investigador(a)",
+                                    "Qtd": st.column_config.NumberColumn("Arts.", format="%d"),
+                                    "Citações": st.column_config.NumberColumn("Citações", format="%d"),
+                                    "Índice h": st.column_config.NumberColumn("h", format="%d"),
+                                    "Topic_Label": "Foco Principal"
+                                },
+                                use_container_width=True,
+                                hide_index=True,
+                                on_select="rerun",
+                                selection_mode="single-row",
+                                key=f"table_{key_suffix}"
+                            )
+                            if len(event.selection.rows) > 0:
+                                # Devolve o ID (e não só o nome) para distinguir autores homónimos
+                                return df_show.iloc[event.selection.rows[0]][['Author_ID', 'Author_Name']]
+                        else:
+                            st.info("Sem dados.")
+                    return None
+
+                # Renderiza as tabelas (sem passar o argumento icone)
+                sel_eng = render_interactive_table(c_eng, "Engenharias", "Engenharias & Tec.", "eng")
+                sel_cienc = render_interactive_table(c_cienc, "Ciências", "Ciências Exatas & Nat.", "sci")
+                sel_soc = render_interactive_table(c_soc, "Sociais / Hum.", "Sociais & Humanas", "soc")
+
+                # Verifica seleção
+                if sel_eng is not None: selected_author = sel_eng
+                elif sel_cienc is not None: selected_author = sel_cienc
+                elif sel_soc is not None: selected_author = sel_soc
+
+                # ==========================================
+                # PARTE 3: DETALHE DO AUTOR
+                # ==========================================
+                if selected_author is not None:
+                    st.divider()
+                    st.markdown(f"""
                 <div style="background-color: #e8f4f8; padding: 15px; border-radius: 10px; border-left: 5px solid #007A53;">
-                    <h4 style="margin: 0; color: #007A53;">Artigos de: {selected_author_name}</h4>
+                    <h4 style="margin: 0; color: #007A53;">Artigos de: {selected_author['Author_Name']}</h4>
                 </div>
                 <br>
                 """, unsafe_allow_html=True)
 
-                auth_id = df_authors[df_authors['Author_Name'] == selected_author_name]['Author_ID'].values[0]
-                articles_of_auth = df_bridge_authors[df_bridge_authors['Author_ID'] == auth_id]['Article_ID']
-                df_details = df_filtered[df_filtered['Article_ID'].isin(articles_of_auth)][['Title', 'Year', 'Source title', 'Cited by', 'Link']]
+                    # Lista de artigos do autor (memorizada por Author_ID) restrita aos filtros
+                    rows_of_auth = author_index.articles_of_author(selected_author['Author_ID'])
+                    rows_of_auth = rows_of_auth[ctx.article_mask[rows_of_auth]]
+                    df_details = df_full.iloc[rows_of_auth][['Title', 'Year', 'Source title', 'Cited by', 'Link']]
                 
-                st.dataframe(
-                    df_details.sort_values('Year', ascending=False),
-                    column_config={
-                        "Link": st.column_config.LinkColumn("Acesso", display_text="Abrir DOI"),
-                        "Title": "Título",
-                        "Year": st.column_config.NumberColumn("Ano", format="%d"),
-                        "Source title": "Revista",
-                        "Cited by": "Citações"
-                    },
-                    use_container_width=True,
-                    hide_index=True
-                )
+                    mostrar_tabela(
+                        df_details.sort_values('Year', ascending=False),
+                        column_config={
+                            "Link": st.column_config.LinkColumn("Acesso", display_text="Abrir DOI"),
+                            "Title": "Título",
+                            "Year": st.column_config.NumberColumn("Ano", format="%d"),
+                            "Source title": "Revista",
+                            "Cited by": "Citações"
+                        },
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
+                # ==========================================
+                # PARTE 4: REDE DE COAUTORIA
+                # ==========================================
+                st.divider()
+                st.markdown(f"<h3 style='color: #004b93;'>Rede de Coautoria</h3>", unsafe_allow_html=True)
+
+                # Matriz autores x autores (esparsa) dos artigos filtrados, partilhada por filtro
+                redes = load_coauthor_cache(data_dir, fingerprint)
+                chave_rede = (ctx.ano_range, ctx.topico)
+                rede = redes.graph(chave_rede, lambda: CoauthorGraph(author_index, ctx.article_mask))
+                if rede.n_nodes == 0:
+                    st.info("Sem coautorias para estes filtros.")
+                    return
+
+                r1, r2, r3, r4 = st.columns(4)
+                r1.metric("Autores(as)", rede.n_nodes)
+                r2.metric("Ligações", rede.n_edges)
+                r3.metric("Componentes", rede.n_components)
+                r4.metric("Maior componente", int(rede.component_sizes().max()))
+                if rede.n_excluded_articles:
+                    st.caption(f"{rede.n_excluded_articles} artigo(s) com mais de {COAUTHOR_MAX_AUTHORS} autores "
+                               "(consórcios) não entram nas ligações.")
+
+                col_rank, col_graph = st.columns([1, 2])
+                with col_rank:
+                    ordem_rede = st.radio("Ranking por", ["Coautores", "Centralidade"], horizontal=True, key="rede_ranking")
+                    ranking_rede = rede.ranking(10, 'degree' if ordem_rede == "Coautores" else 'centrality')
+                    mostrar_tabela(
+                        ranking_rede[['Author_Name', 'Coautores', 'Colaborações', 'Centralidade']],
+                        column_config={"Author_Name": "Investigador(a)"},
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
+                with col_graph:
+                    # Rede ego do autor selecionado num leaderboard; senão, os autores mais ligados.
+                    # No máximo NODE_BUDGET nós (ficam as ligações mais fortes / os nós de maior grau)
+                    ego = rede.code_of(selected_author['Author_ID']) if selected_author is not None else None
+                    if selected_author is not None and ego is None:
+                        st.info(f"Todos os artigos de {selected_author['Author_Name']} neste filtro têm mais de "
+                                f"{COAUTHOR_MAX_AUTHORS} autores e não entram na rede: mostram-se os autores mais ligados.")
+
+                    def desenho_rede():
+                        nos = rede.ego_nodes(ego) if ego is not None else rede.core_nodes()
+                        arestas_i, arestas_j, pesos = rede.subgraph(nos)
+                        return nos, arestas_i, arestas_j, spring_layout(len(nos), arestas_i, arestas_j, pesos)
+
+                    # Layout memorizado por filtro e autor (é o passo mais caro da vista)
+                    nos, arestas_i, arestas_j, pos = redes.layout(chave_rede, ego, desenho_rede)
+                    if ego is not None:
+                        st.caption(f"Rede ego de {selected_author['Author_Name']} ({len(nos) - 1} coautores mostrados)")
+                    else:
+                        st.caption(f"Os {len(nos)} autores(as) com mais coautores. Selecione um autor acima para ver a sua rede.")
+
+                    # Arestas num único traço (segmentos separados por None) e nós em WebGL
+                    ex = np.full(len(arestas_i) * 3, np.nan)
+                    ey = np.full(len(arestas_i) * 3, np.nan)
+                    ex[0::3], ex[1::3] = pos[arestas_i, 0], pos[arestas_j, 0]
+                    ey[0::3], ey[1::3] = pos[arestas_i, 1], pos[arestas_j, 1]
+                    grau = rede.degree[nos]
+                    fig_rede = go.Figure([
+                        go.Scattergl(x=ex, y=ey, mode='lines', line=dict(width=0.6, color='#B8C7D9'),
+                                     hoverinfo='skip', showlegend=False),
+                        go.Scattergl(
+                            x=pos[:, 0], y=pos[:, 1], mode='markers',
+                            marker=dict(size=6 + 14 * np.sqrt(grau / max(grau.max(), 1)),
+                                        color=['#007A53' if n == ego else '#004b93' for n in nos],
+                                        line=dict(width=0.5, color='white')),
+                            text=np.asarray(rede.author_names[nos]), customdata=np.c_[grau, rede.strength[nos]],
+                            hovertemplate="%{text}<br>Coautores: %{customdata[0]}<br>Colaborações: %{customdata[1]}<extra></extra>",
+                            showlegend=False),
+                    ])
+                    fig_rede.update_layout(
+                        height=500,
+                        margin=dict(l=0, r=0, t=10, b=0),
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        xaxis=dict(visible=False),
+                        yaxis=dict(visible=False, scaleanchor='x')
+                    )
+                    mostrar_figura(fig_rede, use_container_width=True)
 
-# --- PAINEL 5: Explorador de Dados ---
-    with tab5:
-        st.markdown(f"<h2 style='color: #004b93;'>Pesquisa Avançada de Artigos</h2>", unsafe_allow_html=True)
-        st.write("Filtre e localize artigos específicos utilizando a pesquisa textual e os metadados bibliométricos.")
+    # --- PAINEL 5: Explorador de Dados ---
+        def painel_pesquisa(ctx):
+            st.markdown(f"<h2 style='color: #004b93;'>Pesquisa Avançada de Artigos</h2>", unsafe_allow_html=True)
+            st.write("Filtre e localize artigos específicos utilizando a pesquisa textual e os metadados bibliométricos.")
                 
-        query_text = st.text_input("🔍 Pesquisar por artigo ou autores(as)", "")
+            query_text = st.text_input("🔍 Pesquisar por artigo ou autores(as)", "")
+
+            # Pesquisa no índice invertido (título, revista e autores), restrita aos filtros laterais.
+            # O autor principal (First_Author) já vem calculado no load_data.
+            explorer_rows, explorer_df = ctx.rows, ctx.df
+            if query_text:
+                explorer_rows = load_search_index(data_dir, fingerprint).search(query_text, ctx.article_mask)
+                explorer_df = df_full.iloc[explorer_rows]
 
-        # Para cada artigo, identificamos o primeiro autor na ponte (Author Principal)
-        main_auth_df = df_bridge_authors.groupby('Article_ID').first().reset_index()
-        main_auth_df = main_auth_df.merge(df_authors, on='Author_ID', how='left')
-        
-        # Cruzamento final para a tabela do explorador
-        explorer_df = df_filtered.merge(main_auth_df[['Article_ID', 'Author_Name']], on='Article_ID', how='left')
-        
-        if query_text:
-            explorer_df = explorer_df[explorer_df['Title'].str.contains(query_text, case=False, na=False)]
             
-        # Definição das colunas conforme o roteiro
-        display_map = {
-            'Title': 'Título',
-            'Year': 'Ano',
-            'Source title': 'Revista',
-            'Topic_Label': 'Tópico (IA)',
-            'Author_Name': 'Autor Principal',
-            'Cited by': 'Citações',
-            'Link': 'Link DOI'
-        }
+            # Definição das colunas conforme o roteiro
+            display_map = {
+                'Title': 'Título',
+                'Year': 'Ano',
+                'Source title': 'Revista',
+                'Topic_Label': 'Tópico (IA)',
+                'First_Author': 'Autor Principal',
+                'Cited by': 'Citações',
+                'Link': 'Link DOI'
+            }
         
-        # Seleção e renomeação
-        df_display = explorer_df[list(display_map.keys())].rename(columns=display_map)
+            # Seleção e renomeação
+            df_display = explorer_df[list(display_map.keys())].rename(columns=display_map)
         
-        # Exibição da Tabela Interativa
-        st.dataframe(
-            df_display,
-            column_config={
-                "Link DOI": st.column_config.LinkColumn("Link DOI", help="Abrir registo oficial no Scopus/DOI")
-            },
-            use_container_width=True,
-            hide_index=True
-        )
+            # Exibição da Tabela Interativa (um artigo selecionado mostra os relacionados)
+            pesquisa = mostrar_tabela(
+                df_display,
+                column_config={
+                    "Link DOI": st.column_config.LinkColumn("Link DOI", help="Abrir registo oficial no Scopus/DOI")
+                },
+                use_container_width=True,
+                hide_index=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key="tabela_pesquisa"
+            )
         
-        st.download_button(
-            label="📥 Exportar Lista Filtrada (CSV)",
-            data=df_display.to_csv(index=False).encode('utf-8'),
-            file_name='explorador_ua_cientifica.csv',
-            mime='text/csv'
-
-        )
-
-
-
+            # Exportação: o ficheiro só é gerado (por blocos) quando se carrega no botão
+            col_fmt, col_extra, col_btn = st.columns([1, 2, 1], vertical_alignment="bottom")
+            with col_fmt:
+                formato = st.selectbox("Formato", available_formats(len(df_display)), key="export_formato")
+            with col_extra:
+                com_pontes = st.checkbox("Incluir todos os autores(as) e países", key="export_pontes")
+            export_map = dict(display_map)
+            if com_pontes:
+                export_map['Authors'] = 'Autores'
+            extensao, mime = EXPORT_FORMATS[formato]
+            country_idx = load_country_index(data_dir, fingerprint) if com_pontes else None
+            with col_btn:
+                st.download_button(
+                    label=f"📥 Exportar Lista Filtrada ({formato})",
+                    data=lambda: export_bytes(export_chunks(df_full, explorer_rows, export_map,
+                                                            country_idx), formato),
+                    file_name=f'explorador_ua_cientifica.{extensao}',
+                    mime=mime,
+                    on_click="ignore"
+                )
 
+            if len(pesquisa.selection.rows) > 0:
+                # O índice do explorador é a posição da linha no df_full
+                artigos_relacionados(df_display.index[pesquisa.selection.rows[0]])
+
+        # Layout em abas conforme o roteiro: registo aba -> painel.
+        # Com on_change="rerun" a aba ativa fica no estado e só o seu painel é executado.
+        PAINEIS = {
+            "DESEMPENHO": painel_desempenho,
+            "PANORAMA (NLP)": painel_panorama,
+            "TÓPICOS EM ALTA": painel_tendencias,
+            "REDES E COLABORAÇÃO": painel_redes,
+            "PESQUISAR": painel_pesquisa,
+        }
+        abas = st.tabs(list(PAINEIS), on_change="rerun", key="aba_ativa")
+        for aba, (nome, painel) in zip(abas, PAINEIS.items()):
+            if aba.open:
+                with aba, span(f'panel:{nome}'):
+                    painel(ctx)
+
+        # Tempos de construção/serialização das figuras e contadores da cache de filtros
+        # (OBSERVATORIO_FIGURE_STATS=1)
+        if os.environ.get('OBSERVATORIO_FIGURE_STATS'):
+            stats = filter_cache.stats()
+            with st.sidebar.expander("Cache de filtros"):
+                st.caption(f"{stats['hits']} acertos / {stats['misses']} falhas · {stats['evictions']} despejos · "
+                           f"{stats['entries']} entradas · {stats['bytes'] / 1e6:.1f} / {filter_cache.max_bytes / 1e6:.0f} MB · "
+                           f"{stats['hit_rate']:.0%} de acertos")
+            stats = figure_cache.stats()
+            with st.sidebar.expander("Cache de figuras"):
+                st.caption(f"{stats['hits']} acertos / {stats['misses']} construções · "
+                           f"{stats['entries']} figuras · {stats['bytes'] / 1e6:.1f} MB")
+                st.dataframe(pd.DataFrame(stats['figures']).T.round(1), use_container_width=True)
+
+        # Perfil completo de um rerun (OBSERVATORIO_PROFILE=cprofile|pyinstrument)
+        if profile_mode():
+            if st.sidebar.button("Perfilar o próximo rerun"):
+                st.session_state.perfilar = True
+                st.rerun()
+            if perfil is not None:
+                st.session_state.perfil_resultado = perfil.stop()
+                perfil = None
+            if 'perfil_resultado' in st.session_state:
+                caminho, resumo = st.session_state.perfil_resultado
+                with st.sidebar.expander("Perfil do último rerun"):
+                    st.caption(caminho)
+                    with open(caminho, 'rb') as f:
+                        st.download_button("📥 Descarregar perfil", f.read(), file_name=os.path.basename(caminho))
+                    st.code(resumo, language=None)
+
+        # Tempos por etapa deste rerun (OBSERVATORIO_TRACE=1 ou alloc); as etapas já estão todas
+        # fechadas e são escritas no finally, no fim do rerun
+        if trace is not None:
+            tempos = pd.DataFrame(trace.spans)
+            tempos['Etapa'] = ['\u2003' * d + n for d, n in zip(tempos['depth'], tempos['name'])]
+            colunas = {'Etapa': 'Etapa', 'wall_ms': 'Parede (ms)', 'cpu_ms': 'CPU (ms)'}
+            if trace.alloc:
+                tempos['alloc_bytes'] = tempos['alloc_bytes'] / 1e6
+                colunas['alloc_bytes'] = 'Alocado (MB)'
+            with st.sidebar.expander(f"Tempos do rerun ({trace.total_ms:.0f} ms)"):
+                st.dataframe(tempos[list(colunas)].rename(columns=colunas).round(1), hide_index=True,
+                             use_container_width=True)
+finally:
+    # Spans e perfil escritos uma única vez, também quando o rerun termina por st.stop() ou st.rerun()
+    if trace is not None:
+        trace.finish()
+    if perfil is not None:
+        st.session_state.perfil_resultado = perfil.stop()
@@ -0,0 +1,66 @@
+# Índice inteiro autores <-> artigos (formato CSR)
+#
+# Os artigos são identificados pela sua posição (linha) no df_full e os autores
+# pela posição no Dim_Authors. A ponte Bridge_Article_Authors passa a dois pares
+# de arrays offsets/valores, um por direção, construídos uma vez no arranque.
+# O leaderboard (leaderboard.py) e o detalhe do autor usam bincount e fatias
+# sobre a máscara dos artigos filtrados em vez de merges de strings a cada interação.
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Nº de autores cuja lista de artigos fica memorizada (LRU)
+AUTHOR_CACHE_SIZE = 4096
+
+
+def _csr(keys, values, n_keys):
+    # Ordenação estável: mantém a ordem da ponte (ordem dos autores no artigo)
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return offsets, values[order]
+
+
+class AuthorIndex:
+    # article_topics: código do tópico (posição no Dim_Topics) de cada linha do df_full, -1 se desconhecido
+    def __init__(self, article_ids, article_topics, n_topics, bridge, authors):
+        # Arrays do próprio DataFrame (texto Arrow, sem cópia para objetos Python; ver shared_store.py)
+        self.author_ids = authors['Author_ID'].array
+        self.author_names = authors['Author_Name'].array
+        self.article_topics = np.asarray(article_topics, dtype=np.int32)
+        self.n_topics = n_topics
+        self.n_articles = len(article_ids)
+        self.n_authors = len(self.author_ids)
+        self._author_pos = pd.Index(self.author_ids)
+
+        art = pd.Index(article_ids).get_indexer(bridge['Article_ID'])
+        auth = self._author_pos.get_indexer(bridge['Author_ID'])
+        # Pares cujo artigo ou autor não existe nas tabelas principais são descartados
+        ok = (art >= 0) & (auth >= 0)
+        self.pair_article = art[ok].astype(np.int32)
+        self.pair_author = auth[ok].astype(np.int32)
+
+        self.article_ptr, self.article_authors = _csr(self.pair_article, self.pair_author, self.n_articles)
+        self.author_ptr, self.author_articles = _csr(self.pair_author, self.pair_article, self.n_authors)
+
+        # Lista de artigos por Author_ID, memorizada com despejo LRU
+        self.articles_of_author = lru_cache(maxsize=AUTHOR_CACHE_SIZE)(self._articles_of_author)
+
+    def author_code(self, author_id):
+        code = self._author_pos.get_indexer([author_id])[0]
+        return int(code) if code >= 0 else None
+
+    def articles_of(self, author_code, article_mask=None):
+        rows = self.author_articles[self.author_ptr[author_code]:self.author_ptr[author_code + 1]]
+        if article_mask is not None:
+            rows = rows[article_mask[rows]]
+        return rows
+
+    def _articles_of_author(self, author_id):
+        code = self.author_code(author_id)
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        rows = self.articles_of(code)
+        rows.flags.writeable = False  # partilhado entre sessões através da cache
+        return rows
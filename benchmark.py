@@ -0,0 +1,281 @@
+# Benchmark dos caminhos de dados do dashboard com dados sintéticos
+#
+# Gera Fact_Articles / Bridge_Article_Authors / Bridge_Geography / Dim_Authors
+# sintéticos a 1x, 10x e 100x o tamanho atual (a partir das distribuições reais),
+# e mede sem browser as computações de cada painel: load_data, filtro lateral,
+# métricas e estatísticas de citação do Painel 1, dispersão revistas x tópicos,
+# trend_data e deteção de tendências, contagem de países, leaderboard de autores,
+# pesquisa do explorador e artigos relacionados.
+#
+# Uso:
+#   python benchmark.py                                  # escalas 1, 10 e 100
+#   python benchmark.py --scales 1 10 --output bench_baseline.json
+#   python benchmark.py --scales 1 --compare bench_baseline.json
+#
+# Cada escala corre num processo à parte para que o pico de RSS seja só dela.
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, build_store, read_table
+from related import doc_topics_path, save_doc_topics
+
+# Tabelas copiadas tal como estão (não crescem com o nº de artigos)
+STATIC_CSVS = ['Dim_Topics.csv', 'Topic_Macro_Areas.csv', 'top_terms_per_topic.csv', 'Agg_Timeline.csv',
+               'Dim_Countries.csv', 'Geo_Aliases.csv', 'journals_per_topic.csv']
+
+BASE_ARTICLES = 5000
+
+
+# --- DADOS SINTÉTICOS ---
+def generate_dataset(out_dir, scale, seed=0, source_dir=DATA_DIR):
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    for name in STATIC_CSVS:
+        shutil.copy(os.path.join(source_dir, name), out_dir)
+
+    bridge = read_table('Bridge_Article_Authors', data_dir=source_dir)
+    authors = read_table('Dim_Authors', data_dir=source_dir)
+    geo = read_table('Bridge_Geography', data_dir=source_dir)
+    journals = pd.read_csv(os.path.join(source_dir, 'journals_per_topic.csv'))
+    terms = read_table('top_terms_per_topic', data_dir=source_dir)['term'].unique()
+    timeline = read_table('Agg_Timeline', data_dir=source_dir)
+
+    n_articles = BASE_ARTICLES * scale
+    n_authors = len(authors) * scale
+
+    # Artigos: tópico e ano segundo o Agg_Timeline, revista segundo journals_per_topic
+    cells = timeline.sample(n_articles, replace=True, weights='Article_Count', random_state=seed)
+    topic = cells['Topic_ID'].to_numpy()
+    source = np.empty(n_articles, dtype=object)
+    for t, group in journals.groupby('Topic_ID'):
+        idx = np.flatnonzero(topic == t)
+        p = group['n_docs'].to_numpy() / group['n_docs'].sum()
+        source[idx] = rng.choice(group['Source title'].to_numpy(), size=len(idx), p=p)
+    source[pd.isna(source)] = journals['Source title'].iloc[0]
+    words = rng.choice(terms, size=(n_articles, 10))
+    lengths = rng.integers(5, 11, n_articles)
+    articles = pd.DataFrame({
+        'Article_ID': np.arange(1, n_articles + 1),
+        'Title': [' '.join(w[:k]).capitalize() for w, k in zip(words, lengths)],
+        'Year': cells['Year'].to_numpy(),
+        'Source title': source,
+        'Cited by': np.floor(rng.lognormal(1.5, 1.2, n_articles)).astype(int),
+        'Link': [f'https://doi.org/10.0000/ua.{i}' for i in range(1, n_articles + 1)],
+        'Topic_ID': topic,
+    })
+    articles.to_csv(os.path.join(out_dir, 'Fact_Articles.csv'), index=False)
+
+    # Vetores documento-tópico (artigos relacionados): mistura esparsa com o tópico do artigo dominante
+    topic_ids = np.sort(timeline['Topic_ID'].unique())
+    weights = rng.dirichlet(np.full(len(topic_ids), 0.1), n_articles).astype(np.float32)
+    weights[np.arange(n_articles), np.searchsorted(topic_ids, topic)] += 1
+    save_doc_topics(doc_topics_path(out_dir), articles['Article_ID'], weights)
+
+    # Autores: nomes reais reamostrados, IDs novos
+    pd.DataFrame({
+        'Author_ID': (60000000000 + np.arange(n_authors)).astype(str),
+        'Author_Name': rng.choice(authors['Author_Name'].to_numpy(), n_authors),
+    }).to_csv(os.path.join(out_dir, 'Dim_Authors.csv'), index=False)
+
+    # Ponte: nº de autores por artigo com a distribuição real (cauda longa incluída)
+    # e popularidade dos autores tipo Zipf
+    per_article = rng.choice(bridge.groupby('Article_ID').size().to_numpy(), n_articles)
+    popularity = 1.0 / (np.arange(n_authors) + 10.0) ** 0.8
+    author_pick = rng.choice(n_authors, size=per_article.sum(), p=popularity / popularity.sum())
+    pairs = pd.DataFrame({
+        'Article_ID': np.repeat(articles['Article_ID'].to_numpy(), per_article),
+        'Author_ID': (60000000000 + author_pick).astype(str),
+    }).drop_duplicates()
+    pairs.to_csv(os.path.join(out_dir, 'Bridge_Article_Authors.csv'), index=False)
+
+    # Geografia: textos reais (incluindo ruído) em artigos aleatórios
+    n_geo = len(geo) * scale
+    pd.DataFrame({
+        'Article_ID': rng.integers(1, n_articles + 1, n_geo),
+        'Country_Region': rng.choice(geo['Country_Region'].astype(str).to_numpy(), n_geo),
+    }).to_csv(os.path.join(out_dir, 'Bridge_Geography.csv'), index=False)
+
+    return {'articles': n_articles, 'authors': n_authors, 'bridge_rows': len(pairs), 'geo_rows': n_geo}
+
+
+# --- MEDIÇÃO ---
+def _stats(samples):
+    ms = np.array(samples) * 1e3
+    return {'n': len(ms), 'mean_ms': round(float(ms.mean()), 3), 'p50_ms': round(float(np.percentile(ms, 50)), 3),
+            'p90_ms': round(float(np.percentile(ms, 90)), 3), 'p99_ms': round(float(np.percentile(ms, 99)), 3),
+            'max_ms': round(float(ms.max()), 3)}
+
+
+def _timed(samples, name, fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    samples.setdefault(name, []).append(time.perf_counter() - t0)
+    return result
+
+
+def run_scale(data_dir, repeat):
+    # Importações aqui: o processo filho só mede o que o dashboard carrega
+    from cube import cube_slice, journal_topic_counts, panel_metrics, top_journals, year_topic_counts, yearly_counts
+    from data_store import data_fingerprint
+    from dataset import (build_author_index, build_citation_indexes, build_country_index, build_related_index,
+                         build_row_index, load_dataset)
+    from filters import FilterCache, build_filter_context, filter_context
+    from geography import country_counts
+    from leaderboard import Leaderboard
+
+    from search_index import SearchIndex
+    from trends import detect_trends
+
+    samples = {}
+    for _ in range(max(1, min(3, repeat))):
+        data = _timed(samples, 'load_data', load_dataset, data_dir)
+    df_full, topics, geo, authors, bridge, _, _, cube = data
+
+    author_index = _timed(samples, 'build_author_index', build_author_index, df_full, topics, bridge, authors)
+    search_index = _timed(samples, 'build_search_index', SearchIndex.build, df_full, author_index)
+    citation_indexes = _timed(samples, 'build_citation_index', build_citation_indexes, df_full, topics,
+                              author_index)
+    leaderboard = Leaderboard(author_index, df_full['Cited by'], citation_indexes['Autor'])
+    search_index.save(data_fingerprint(data_dir), data_dir)
+    country_rows, country_pos, countries = _timed(samples, 'build_country_index', build_country_index,
+                                                  df_full, geo, data_dir)
+    row_index = _timed(samples, 'build_row_index', build_row_index, df_full, topics)
+    related_index = _timed(samples, 'build_related_index', build_related_index, df_full, data_dir)
+
+    # Cenários de filtro: período completo, janela de 3 anos, um tópico, tópico + 2 anos
+    years = sorted(df_full['Year'].unique())
+    labels = topics['Topic_Label'].tolist()
+    scenarios = [((years[0], years[-1]), 'Todos'),
+                 ((years[len(years) // 3], years[len(years) // 3 + 2]), 'Todos'),
+                 ((years[0], years[-1]), labels[0]),
+                 ((years[-2], years[-1]), labels[len(labels) // 2])]
+    filter_cache = FilterCache()
+    queries = ['energy', 'educ', df_full['Title'].iloc[0].split()[0], str(authors['Author_Name'].iloc[0]).split(',')[0]]
+
+    for i in range(repeat):
+        ano_range, topico = scenarios[i % len(scenarios)]
+        ctx = _timed(samples, 'sidebar_filter', build_filter_context, df_full, row_index, topics, cube,
+                     ano_range, topico)
+        # Mesmo filtro pela cache partilhada do app.py (acerto a partir da 2ª volta aos cenários)
+        _timed(samples, 'sidebar_filter_cached', filter_context, filter_cache, df_full, row_index,
+               topics, cube, ano_range, topico)
+
+        def panel1():
+            return panel_metrics(ctx.cube), yearly_counts(ctx.cube), top_journals(ctx.cube, 10)
+
+        def journal_topic_scatter():
+            return journal_topic_counts(ctx.cube, top_journals(ctx.cube, 10)['Source title'].tolist())
+
+        def explorer():
+            return df_full.iloc[search_index.search(queries[i % len(queries)], ctx.article_mask)]
+
+        _timed(samples, 'panel1_metrics', panel1)
+        for kind, name in [('Todos', 'all'), ('Tópico', 'topic'), ('Revista', 'journal'), ('Autor', 'author')]:
+            _timed(samples, f'citation_stats_{name}', citation_indexes[kind].stats, ctx.article_mask)
+        _timed(samples, 'journal_topic_scatter', journal_topic_scatter)
+        _timed(samples, 'trend_data', year_topic_counts, ctx.cube)
+        _timed(samples, 'trend_detection', lambda: detect_trends(year_topic_counts(cube_slice(cube, ano_range)),
+                                                                 topics['Topic_ID'], ano_range))
+        _timed(samples, 'geo_counts', country_counts, country_rows, country_pos, ctx.article_mask, countries)
+        _timed(samples, 'author_leaderboard', leaderboard.top_authors, ctx.article_mask, topics['Topic_Label'],
+               topics['Macro_Area'])
+        _timed(samples, 'author_leaderboard_h', leaderboard.top_authors, ctx.article_mask, topics['Topic_Label'],
+               topics['Macro_Area'], 'h_index')
+
+        _timed(samples, 'explorer_search', explorer)
+        if related_index is not None:
+            _timed(samples, 'related_articles', related_index.similar, i * 7919 % len(df_full))
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+    return {'peak_rss_mb': round(peak_rss_mb, 1), 'timings': {k: _stats(v) for k, v in samples.items()},
+            'filter_cache': filter_cache.stats()}
+
+
+# --- RELATÓRIO ---
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nComparação com {baseline_path} (commit {baseline['meta'].get('git_commit')}), p50:")
+    for scale, result in current['scales'].items():
+        old = baseline['scales'].get(scale)
+        if old is None:
+            continue
+        print(f"  escala {scale}x: RSS {old['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+        for name, stats in result['timings'].items():
+            if name in old['timings']:
+                before, after = old['timings'][name]['p50_ms'], stats['p50_ms']
+                ratio = after / before if before else float('inf')
+                print(f"    {name:<24} {before:>10.2f} -> {after:>10.2f} ms  ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos de dados do dashboard")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=20, help="repetições por computação")
+    parser.add_argument('--data-root', help="pasta para os dados sintéticos (por omissão, temporária)")
+    parser.add_argument('--no-store', action='store_true', help="mede o carregamento a partir dos CSV")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--run-scale', help=argparse.SUPPRESS)  # uso interno (processo filho)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        json.dump(run_scale(args.run_scale, args.repeat), sys.stdout)
+        return
+
+    root = args.data_root or tempfile.mkdtemp(prefix='observatorio-bench-')
+    report = {'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'git_commit': _git_commit(),
+                       'python': platform.python_version(), 'platform': platform.platform(),
+                       'repeat': args.repeat, 'store': not args.no_store},
+              'scales': {}}
+    try:
+        for scale in args.scales:
+            data_dir = os.path.join(root, f'x{scale}')
+            print(f"[{scale}x] a gerar dados sintéticos em {data_dir} ...", flush=True)
+            sizes = generate_dataset(data_dir, scale)
+            if not args.no_store:
+                build_store(data_dir)
+            print(f"[{scale}x] a medir ({sizes}) ...", flush=True)
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-scale', data_dir,
+                                  '--repeat', str(args.repeat)], capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout)
+            result['sizes'] = sizes
+            report['scales'][str(scale)] = result
+            for name, stats in result['timings'].items():
+                print(f"    {name:<24} p50 {stats['p50_ms']:>10.2f} ms   p90 {stats['p90_ms']:>10.2f} ms")
+            print(f"    pico de RSS: {result['peak_rss_mb']} MB")
+            fc = result['filter_cache']
+            print(f"    cache de filtros: {fc['hits']} acertos / {fc['misses']} falhas / "
+                  f"{fc['evictions']} despejos ({fc['hit_rate']:.0%})")
+    finally:
+        if not args.data_root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados em {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Estatísticas de citação (Painel 1) por tópico, revista e autor
+#
+# Para cada tipo de grupo, os elementos (artigos, ou pares autor x artigo no caso
+# dos autores) ficam ordenados uma vez por (grupo, ano, citações decrescentes) e
+# codificados numa única chave inteira. Os elementos de um filtro (período e
+# tópico) formam uma subsequência dessa ordem, ou seja, corridas já ordenadas por
+# grupo e ano; a ordenação estável do numpy (timsort para int64) limita-se a
+# juntar essas corridas, sem reordenar todas as linhas filtradas.
+# Com cada grupo por citações decrescentes, o índice h e os percentis saem de
+# aritmética de posições (sem ciclos por autor).
+#
+# O impacto normalizado (à maneira do MNCS) é a média, por grupo, das citações
+# de cada artigo a dividir pelas citações esperadas: a média dos artigos do
+# mesmo campo (macro-área do tópico) e ano em todo o dataset.
+import numpy as np
+import pandas as pd
+
+# Percentis mostrados -> nome da coluna
+CITATION_PERCENTILES = {50: 'Mediana', 90: 'P90', 99: 'P99'}
+
+
+def normalized_citations(cited, years, fields):
+    # Citações / média do mesmo campo e ano; campo sem citações nenhumas conta como a média (1)
+    cited = pd.Series(np.asarray(cited, dtype=np.float64))
+    expected = cited.groupby([np.asarray(fields), np.asarray(years)]).transform('mean').to_numpy()
+    out = np.ones(len(cited))
+    np.divide(cited.to_numpy(), expected, out=out, where=expected > 0)
+    return out
+
+
+def _group_starts(sorted_keys):
+    return np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+
+
+class CitationIndex:
+    # groups: código do grupo de cada elemento (-1 = sem grupo, fica de fora);
+    # articles: linha do df_full; cited / years / normalized: do artigo de cada elemento;
+    # labels: nome de cada código de grupo
+    def __init__(self, groups, articles, cited, years, normalized, labels):
+        groups = np.asarray(groups, dtype=np.int64)
+        keep = groups >= 0
+        groups, articles = groups[keep], np.asarray(articles)[keep]
+        cited = np.clip(np.asarray(cited, dtype=np.int64)[keep], 0, None)
+        years, normalized = np.asarray(years)[keep], np.asarray(normalized)[keep]
+
+        order = np.lexsort((-cited, years, groups))
+        self.labels = pd.Index(labels)
+        self.n_groups = len(self.labels)
+        self.span = int(cited.max()) + 1 if len(cited) else 1
+        self.articles = articles[order].astype(np.int32)
+        self.groups = groups[order].astype(np.int32)
+        self.normalized = normalized[order]
+        # (grupo, citações decrescentes) numa só chave crescente
+        self.keys = groups[order] * self.span + (self.span - 1 - cited[order])
+
+    def _merged(self, article_mask):
+        # Elementos do filtro com cada grupo por citações decrescentes
+        sel = article_mask[self.articles]
+        keys = np.sort(self.keys[sel], kind='stable')
+        return sel, keys // self.span, self.span - 1 - keys % self.span
+
+    @staticmethod
+    def _ranks(groups):
+        starts = _group_starts(groups) if len(groups) else np.empty(0, dtype=np.int64)
+        sizes = np.diff(np.r_[starts, len(groups)])
+        return starts, sizes, np.arange(len(groups)) - np.repeat(starts, sizes) + 1
+
+    def h_index(self, article_mask):
+        # Índice h de todos os grupos (0 sem artigos no filtro), indexado pelo código
+        _, groups, cited = self._merged(article_mask)
+        _, _, rank = self._ranks(groups)
+        return np.bincount(groups[cited >= rank], minlength=self.n_groups)
+
+    def stats(self, article_mask):
+        # Uma linha por grupo com artigos no filtro, indexada pelo código do grupo
+        sel, groups, cited = self._merged(article_mask)
+        starts, n, rank = self._ranks(groups)
+        codes = groups[starts]
+        citations = np.add.reduceat(cited, starts) if len(cited) else np.zeros(0, dtype=np.int64)
+        normalized = np.bincount(self.groups[sel], weights=self.normalized[sel], minlength=self.n_groups)
+        out = pd.DataFrame({
+            'Nome': self.labels[codes],
+            'Artigos': n,
+            'Citações': citations,
+            'Média': citations / np.maximum(n, 1),
+        }, index=pd.Index(codes, name='code'))
+        for q, col in CITATION_PERCENTILES.items():
+            # Interpolação linear (como np.percentile) sobre a ordem crescente,
+            # que no grupo ordenado por ordem decrescente é a posição n - 1 - i
+            pos = q / 100 * (n - 1)
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.ceil(pos).astype(np.int64)
+            c_lo, c_hi = cited[starts + n - 1 - lo], cited[starts + n - 1 - hi]
+            out[col] = c_lo + (c_hi - c_lo) * (pos - lo)
+        out['Índice h'] = np.bincount(groups[cited >= rank], minlength=self.n_groups)[codes]
+        out['Impacto normalizado'] = normalized[codes] / np.maximum(n, 1)
+        return out
@@ -0,0 +1,196 @@
+# Rede de coautoria (Painel 4) a partir da ponte artigos <-> autores
+#
+# Para os artigos filtrados, a matriz de incidência B (artigos x autores, esparsa)
+# dá a matriz de coautoria A = Bᵀ·B (autores x autores, CSR): A[i, j] é o nº de
+# artigos em comum. Artigos com mais de COAUTHOR_MAX_AUTHORS autores (consórcios
+# com centenas ou milhares de nomes) ficam de fora das ligações: sozinhos gerariam
+# milhões de pares sem dizer nada sobre colaboração direta.
+# Só entram na matriz os autores com artigos no filtro (códigos compactados).
+#
+# As redes e os seus layouts ficam numa cache própria (CoauthorCache), com
+# orçamento em bytes: a matriz de uma rede ocupa muito mais do que um agregado
+# da cache de filtros, que só limita o nº de entradas.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+from tracing import span
+
+COAUTHOR_MAX_AUTHORS = 100
+# Nº máximo de nós desenhados (rede ego ou subrede dos autores mais ligados)
+NODE_BUDGET = 150
+CENTRALITY_ITERATIONS = 50
+# Orçamento da cache de redes (bytes das matrizes e vetores de cada rede)
+COAUTHOR_CACHE_BYTES = 128 * 1024 * 1024
+# Layouts guardados por rede (vista geral + autores selecionados, os menos usados saem primeiro)
+LAYOUTS_PER_GRAPH = 16
+
+
+class CoauthorGraph:
+    def __init__(self, author_index, article_mask, max_authors=COAUTHOR_MAX_AUTHORS):
+        idx = author_index
+        n_per_article = np.diff(idx.article_ptr)
+        keep = article_mask[idx.pair_article] & (n_per_article[idx.pair_article] <= max_authors)
+        articles = idx.pair_article[keep]
+        authors = idx.pair_author[keep]
+        self.n_excluded_articles = int((article_mask & (n_per_article > max_authors)).sum())
+
+        # Autores ativos -> códigos 0..n-1 (posição em self.authors)
+        self.authors, author_codes = np.unique(authors, return_inverse=True)
+        _, article_codes = np.unique(articles, return_inverse=True)
+        incidence = sp.csr_matrix((np.ones(len(authors), dtype=np.int32), (article_codes, author_codes)),
+                                  shape=(article_codes.max() + 1 if len(articles) else 0, len(self.authors)))
+        adjacency = (incidence.T @ incidence).tocsr()
+        adjacency.setdiag(0)
+        adjacency.eliminate_zeros()
+        self.adjacency = adjacency
+        self.author_ids = idx.author_ids[self.authors]
+        self.author_names = idx.author_names[self.authors]
+        self._code = pd.Index(self.author_ids)
+
+        self.degree = np.diff(adjacency.indptr)                  # nº de coautores distintos
+        self.strength = np.asarray(adjacency.sum(axis=1)).ravel()  # nº de colaborações (peso)
+        self.n_components, self.component = connected_components(adjacency, directed=False)
+        self.centrality = self._eigenvector_centrality()
+
+    @property
+    def n_nodes(self):
+        return self.adjacency.shape[0]
+
+    @property
+    def n_edges(self):
+        return self.adjacency.nnz // 2
+
+    @property
+    def nbytes(self):
+        arrays = [self.adjacency.data, self.adjacency.indices, self.adjacency.indptr, self.authors,
+                  self.author_ids, self.author_names, self.degree, self.strength, self.component, self.centrality]
+        return sum(a.nbytes for a in arrays)
+
+    def _eigenvector_centrality(self):
+        # Iteração de potência sobre A + I (converge também em grafos bipartidos)
+        if self.n_nodes == 0:
+            return np.zeros(0)
+        x = np.ones(self.n_nodes) / self.n_nodes
+        for _ in range(CENTRALITY_ITERATIONS):
+            x = self.adjacency @ x + x
+            x /= np.linalg.norm(x)
+        return x / x.max()
+
+    def component_sizes(self):
+        return np.bincount(self.component)
+
+    def code_of(self, author_id):
+        code = self._code.get_indexer([author_id])[0]
+        return int(code) if code >= 0 else None
+
+    def ranking(self, k=10, by='degree'):
+        # Top-k autores por nº de coautores ('degree') ou centralidade ('centrality')
+        values = self.degree if by == 'degree' else self.centrality
+        if self.n_nodes > k:
+            top = np.argpartition(-values, k - 1)[:k]
+        else:
+            top = np.arange(self.n_nodes)
+        top = top[np.lexsort((-self.strength[top], -values[top]))]
+        sizes = self.component_sizes()
+        return pd.DataFrame({
+            'Author_ID': self.author_ids[top],
+            'Author_Name': self.author_names[top],
+            'Coautores': self.degree[top],
+            'Colaborações': self.strength[top],
+            'Centralidade': self.centrality[top].round(3),
+            'Componente': sizes[self.component[top]],
+        })
+
+    # --- SUBREDES PARA DESENHO ---
+    def ego_nodes(self, code, budget=NODE_BUDGET):
+        # Autor + coautores diretos; acima do orçamento ficam as ligações mais fortes
+        row = slice(self.adjacency.indptr[code], self.adjacency.indptr[code + 1])
+        neighbours, weights = self.adjacency.indices[row], self.adjacency.data[row]
+        if len(neighbours) > budget - 1:
+            strongest = np.argpartition(-weights, budget - 2)[:budget - 1]
+            neighbours = neighbours[strongest]
+        return np.r_[code, neighbours]
+
+    def core_nodes(self, budget=NODE_BUDGET):
+        # Sem autor selecionado: os autores com mais coautores
+        if self.n_nodes <= budget:
+            return np.arange(self.n_nodes)
+        return np.argpartition(-self.degree, budget - 1)[:budget]
+
+    def subgraph(self, nodes):
+        # Arestas (i < j, peso) entre os nós dados, em posições de 'nodes'
+        sub = self.adjacency[nodes][:, nodes].tocoo()
+        upper = sub.row < sub.col
+        return sub.row[upper], sub.col[upper], sub.data[upper]
+
+
+def spring_layout(n, rows, cols, weights, iterations=60, seed=42):
+    # Layout por forças (Fruchterman-Reingold) para poucas centenas de nós
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1, 1, (n, 2))
+    if n <= 1:
+        return np.zeros((n, 2))
+    k = 1.0 / np.sqrt(n)
+    temperature = 0.1
+    w = np.log1p(weights)
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist = np.maximum(np.linalg.norm(delta, axis=-1), 1e-3)
+        disp = (delta * (k * k / dist ** 2)[..., None]).sum(axis=1)       # repulsão entre todos
+        d = pos[rows] - pos[cols]
+        dd = np.maximum(np.linalg.norm(d, axis=1), 1e-3)
+        pull = d * (dd * w / k)[:, None]                                   # atração nas arestas
+        np.add.at(disp, rows, -pull)
+        np.add.at(disp, cols, pull)
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.95
+    return pos
+
+
+class CoauthorCache:
+    # Rede por filtro (LRU com orçamento em bytes) e, dentro de cada rede, os seus layouts
+    def __init__(self, max_bytes=COAUTHOR_CACHE_BYTES, max_layouts=LAYOUTS_PER_GRAPH):
+        self.max_bytes = max_bytes
+        self.max_layouts = max_layouts
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # filtro -> (rede, OrderedDict ego -> layout)
+        self._lock = threading.Lock()
+
+    def graph(self, key, compute):
+        with span('coauthor:graph'):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+            graph = compute()
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (graph, OrderedDict())
+                    self.total_bytes += graph.nbytes
+                # A rede acabada de calcular fica sempre, mesmo acima do orçamento
+                while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                    _, (old, _) = self._entries.popitem(last=False)
+                    self.total_bytes -= old.nbytes
+            return graph
+
+    def layout(self, key, ego, compute):
+        # Layout (nós, arestas, posições) da rede do filtro 'key' centrado em 'ego' (None: vista geral)
+        with span('coauthor:layout'):
+            with self._lock:
+                layouts = self._entries[key][1] if key in self._entries else None
+                if layouts is not None and ego in layouts:
+                    layouts.move_to_end(ego)
+                    return layouts[ego]
+            value = compute()
+            if layouts is not None:
+                with self._lock:
+                    layouts[ego] = value
+                    while len(layouts) > self.max_layouts:
+                        layouts.popitem(last=False)
+            return value
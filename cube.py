@@ -0,0 +1,88 @@
+# Cubo de agregados (Year x Topic_ID x Source title) com contagens e citações
+#
+# Os painéis 1 a 3 respondem aos filtros de período/tópico somando fatias
+# deste cubo em vez de reagrupar todos os artigos em cada rerun.
+# Como o cubo está ordenado por ano, um intervalo de anos é uma fatia contígua.
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, TABLES, store_dir, is_fresh
+
+CUBE_NAME = 'Agg_Cube'
+CUBE_KEYS = ['Year', 'Topic_ID', 'Source title']
+
+
+def build_cube(articles):
+    cube = (articles.assign(Cited=articles['Cited by'].fillna(0))
+            .groupby(CUBE_KEYS, observed=True, sort=True)
+            .agg(n_docs=('Article_ID', 'size'), cited_sum=('Cited', 'sum'))
+            .reset_index())
+    cube['Source title'] = cube['Source title'].astype('category')
+    cube['n_docs'] = cube['n_docs'].astype('int32')
+    cube['cited_sum'] = cube['cited_sum'].astype('int64')
+    return cube
+
+
+def write_cube(articles, data_dir=DATA_DIR):
+    out_path = os.path.join(store_dir(data_dir), CUBE_NAME + '.parquet')
+    build_cube(articles).to_parquet(out_path + '.tmp', index=False, compression='zstd')
+    os.replace(out_path + '.tmp', out_path)
+    return out_path
+
+
+def load_cube(articles, data_dir=DATA_DIR):
+    # Usa o cubo do build se estiver em dia com o Fact_Articles; senão recalcula
+    path = os.path.join(store_dir(data_dir), CUBE_NAME + '.parquet')
+    csv_path = os.path.join(data_dir, TABLES['Fact_Articles']['csv'])
+    if is_fresh(path, csv_path):
+        try:
+            return pd.read_parquet(path)
+        except ImportError:
+            pass
+    return build_cube(articles)
+
+
+# --- CONSULTAS ---
+def cube_slice(cube, ano_range, topic_ids=None):
+    years = cube['Year'].to_numpy()
+    lo = np.searchsorted(years, ano_range[0], side='left')
+    hi = np.searchsorted(years, ano_range[1], side='right')
+    sl = cube.iloc[lo:hi]
+    if topic_ids is not None:
+        sl = sl[np.isin(sl['Topic_ID'].to_numpy(), topic_ids)]
+    return sl
+
+
+def panel_metrics(sl):
+    n_docs = int(sl['n_docs'].sum())
+    cited = int(sl['cited_sum'].sum())
+    mean = round(cited / n_docs, 2) if n_docs else float('nan')
+    return n_docs, cited, mean, sl['Topic_ID'].nunique()
+
+
+def yearly_counts(sl):
+    return sl.groupby('Year', sort=True)['n_docs'].sum().reset_index(name='Artigos')
+
+
+def top_journals(sl, n=10):
+    counts = sl.groupby('Source title', observed=True)['n_docs'].sum()
+    top = counts.sort_values(ascending=False, kind='stable').head(n)
+    return pd.DataFrame({'Source title': top.index.astype(str), 'count': top.to_numpy()})
+
+
+def topic_counts(sl):
+    counts = sl.groupby('Topic_ID')['n_docs'].sum()
+    return counts.sort_values(ascending=False, kind='stable').reset_index(name='Quantidade')
+
+
+def journal_topic_counts(sl, journals):
+    sl = sl[sl['Source title'].isin(journals)]
+    dist = sl.groupby(['Source title', 'Topic_ID'], observed=True)['n_docs'].sum().reset_index(name='Artigos')
+    dist['Source title'] = dist['Source title'].astype(str)
+    return dist
+
+
+def year_topic_counts(sl):
+    return sl.groupby(['Year', 'Topic_ID'])['n_docs'].sum().reset_index(name='Volume')
@@ -0,0 +1,214 @@
+# Armazenamento colunar do esquema em estrela (Fact_Articles, Dim_*, Bridge_*)
+#
+# Uso:  python data_store.py [pasta_dos_csv]
+# Converte os CSV em ficheiros Parquet tipados e comprimidos (pasta store/).
+# O dashboard lê estes ficheiros com memory mapping e só as colunas de que
+# precisa; se não existirem (ou estiverem desatualizados) volta aos CSV.
+# Depois de um ingest.py, os dados ativos passam a ser o snapshot indicado em
+# snapshots/CURRENT (ver current_data_dir).
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional: sem ele usamos sempre os CSV
+    pq = None
+
+
+DATA_DIR = os.environ.get('OBSERVATORIO_DATA_DIR', '.')
+STORE_DIRNAME = 'store'
+SNAPSHOTS_DIRNAME = 'snapshots'
+CURRENT_FILENAME = 'CURRENT'
+# Modelo de tópicos congelado (topic_pipeline.py): o model_id identifica o espaço de Topic_ID
+TOPIC_MODEL_DIRNAME = 'topic_model'
+TOPIC_MODEL_ARRAYS = 'model.npz'
+TOPIC_MODEL_MANIFEST = 'model.json'
+
+# --- ESQUEMA DAS TABELAS ---
+# IDs inteiros e colunas de texto repetitivas como categóricas.
+# Author_ID fica como texto: o Dim_Authors tem IDs não numéricos (ex.: 'Jack').
+# sort_by: ordem das linhas no Parquet (o Fact_Articles fica ordenado por ano,
+# para que um período seja um intervalo contíguo de linhas).
+# counts: colunas inteiras que são contagens (um valor em falta vale 0); nas
+# restantes (chaves, anos) um valor em falta ou não numérico é um erro nos dados.
+TABLES = {
+    'Fact_Articles': {
+        'csv': 'Fact_Articles.csv',
+        'dtypes': {'Article_ID': 'int32', 'Topic_ID': 'int16', 'Year': 'int16',
+                   'Cited by': 'int32', 'Source title': 'category'},
+        'counts': ['Cited by'],
+        'sort_by': ['Year', 'Article_ID'],
+    },
+    'Dim_Topics': {
+        'csv': 'Dim_Topics.csv',
+        'dtypes': {'Topic_ID': 'int16', 'Trend_Status': 'category'},
+    },
+    'Dim_Authors': {
+        'csv': 'Dim_Authors.csv',
+        'dtypes': {'Author_ID': 'str'},
+    },
+    'Bridge_Article_Authors': {
+        'csv': 'Bridge_Article_Authors.csv',
+        'dtypes': {'Article_ID': 'int32', 'Author_ID': 'category'},
+    },
+    'Bridge_Geography': {
+        'csv': 'Bridge_Geography.csv',
+        'dtypes': {'Article_ID': 'int32', 'Country_Region': 'category'},
+    },
+    # Gazetteer offline ISO-3166 e aliases usados na normalização geográfica.
+    # keep_default_na=False: o código ISO da Namíbia é 'NA'.
+    'Dim_Countries': {
+        'csv': 'Dim_Countries.csv',
+        'dtypes': {'Country_Code': 'int16'},
+        'keep_default_na': False,
+    },
+    'Geo_Aliases': {
+        'csv': 'Geo_Aliases.csv',
+        'dtypes': {},
+        'keep_default_na': False,
+    },
+    # Macro-área de cada tópico (ver macro_areas.py); opcional
+    'Topic_Macro_Areas': {
+        'csv': 'Topic_Macro_Areas.csv',
+        'dtypes': {'Topic_ID': 'int16', 'Macro_Area': 'category'},
+    },
+    'Agg_Timeline': {
+
+        'csv': 'Agg_Timeline.csv',
+        'dtypes': {'Year': 'int16', 'Topic_ID': 'int16', 'Article_Count': 'int32'},
+        'counts': ['Article_Count'],
+    },
+    'top_terms_per_topic': {
+        'csv': 'top_terms_per_topic.csv',
+        'dtypes': {'Topic_ID': 'int16', 'rank': 'int16', 'weight': 'float32'},
+    },
+}
+
+
+def store_dir(data_dir=DATA_DIR):
+    return os.path.join(data_dir, STORE_DIRNAME)
+
+
+def current_data_dir(data_dir=DATA_DIR):
+    # Pasta do snapshot ativo publicado pelo ingest.py; sem snapshots, a própria pasta dos CSV
+    try:
+        with open(os.path.join(data_dir, SNAPSHOTS_DIRNAME, CURRENT_FILENAME), encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return data_dir
+    return os.path.join(data_dir, SNAPSHOTS_DIRNAME, version)
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def topic_model_id(data_dir=DATA_DIR):
+    # model_id do modelo em topic_model/ (hash do model.npz); None se ainda não houve fit
+    path = os.path.join(data_dir, TOPIC_MODEL_DIRNAME)
+    try:
+        with open(os.path.join(path, TOPIC_MODEL_MANIFEST), encoding='utf-8') as f:
+            model_id = json.load(f).get('model_id')
+    except (FileNotFoundError, ValueError):
+        model_id = None
+    if model_id is None and os.path.exists(os.path.join(path, TOPIC_MODEL_ARRAYS)):
+        model_id = file_digest(os.path.join(path, TOPIC_MODEL_ARRAYS))  # modelo gravado antes do model_id
+    return model_id
+
+
+def _apply_dtypes(df, name):
+    counts = TABLES[name].get('counts', [])
+    for col, dtype in TABLES[name]['dtypes'].items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith('int'):
+            values = pd.to_numeric(df[col], errors='coerce')
+            if col in counts:
+                # Contagens em falta (ex.: 'Cited by' vazio no Scopus) passam a 0
+                values = values.fillna(0)
+            elif values.isna().any():
+                bad = df.loc[values.isna(), col].head(3).tolist()
+                raise ValueError(f"{name}.{col}: {values.isna().sum()} valor(es) em falta ou não numéricos "
+                                 f"(ex.: {bad})")
+            df[col] = values.astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_csv_table(name, columns=None, data_dir=DATA_DIR):
+    path = os.path.join(data_dir, TABLES[name]['csv'])
+    # Colunas de texto lidas como texto (evita IDs convertidos em números)
+    text_cols = {col: str for col, dtype in TABLES[name]['dtypes'].items() if not dtype.startswith('int')}
+    df = pd.read_csv(path, usecols=columns, dtype=text_cols, encoding='utf-8-sig',
+                     keep_default_na=TABLES[name].get('keep_default_na', True))
+    return _apply_dtypes(df, name)
+
+
+def is_fresh(parquet_path, csv_path):
+    if not os.path.exists(parquet_path):
+        return False
+    # Um CSV mais recente que o Parquet significa que o build não foi refeito
+    return not os.path.exists(csv_path) or os.path.getmtime(csv_path) <= os.path.getmtime(parquet_path)
+
+
+def read_table(name, columns=None, data_dir=DATA_DIR):
+    parquet_path = os.path.join(store_dir(data_dir), name + '.parquet')
+    csv_path = os.path.join(data_dir, TABLES[name]['csv'])
+    if pq is not None and is_fresh(parquet_path, csv_path):
+        return pq.read_table(parquet_path, columns=columns, memory_map=True).to_pandas()
+    return read_csv_table(name, columns, data_dir)
+
+
+def data_fingerprint(data_dir=DATA_DIR):
+    # Muda sempre que um CSV de origem ou o Parquet de uma tabela é reescrito (invalida as caches).
+    # Só olha para as tabelas: índices guardados em store/ não contam.
+    paths = [os.path.join(data_dir, spec['csv']) for spec in TABLES.values()]
+    paths += [os.path.join(store_dir(data_dir), name + '.parquet') for name in TABLES]
+    return tuple((os.path.basename(p), os.stat(p).st_mtime_ns, os.stat(p).st_size)
+                 for p in paths if os.path.isfile(p))
+
+
+# --- BUILD ---
+def build_store(data_dir=DATA_DIR):
+    if pq is None:
+        raise RuntimeError("O build do armazenamento colunar requer o pacote 'pyarrow'.")
+    out_dir = store_dir(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, spec in TABLES.items():
+        csv_path = os.path.join(data_dir, spec['csv'])
+        if not os.path.exists(csv_path):
+            print(f"[ignorado] {spec['csv']} não encontrado")
+            continue
+        df = read_csv_table(name, data_dir=data_dir)
+        if 'sort_by' in spec:
+            df = df.sort_values(spec['sort_by'], kind='stable', ignore_index=True)
+        out_path = os.path.join(out_dir, name + '.parquet')
+        # Escrita num ficheiro temporário para nunca deixar um Parquet meio escrito
+        df.to_parquet(out_path + '.tmp', index=False, compression='zstd')
+        os.replace(out_path + '.tmp', out_path)
+        print(f"{spec['csv']} -> {out_path} ({len(df)} linhas, "
+              f"{os.path.getsize(csv_path) / 1e6:.1f} MB -> {os.path.getsize(out_path) / 1e6:.1f} MB)")
+
+    # Tabelas derivadas, refeitas sempre que o build corre
+    if os.path.exists(os.path.join(out_dir, 'Fact_Articles.parquet')):
+        from cube import write_cube
+        print(f"cubo de agregados -> {write_cube(read_table('Fact_Articles', data_dir=data_dir), data_dir)}")
+    if os.path.exists(os.path.join(out_dir, 'Bridge_Geography.parquet')):
+        from geography import write_article_countries
+        write_article_countries(data_dir)
+    if os.path.exists(os.path.join(out_dir, 'top_terms_per_topic.parquet')):
+        from wordclouds import build_wordclouds
+        build_wordclouds(data_dir)
+
+
+if __name__ == '__main__':
+    build_store(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
@@ -0,0 +1,97 @@
+# Carregamento dos dados e índices do dashboard, sem dependência do Streamlit
+#
+# O app.py envolve estas funções em st.cache_data / st.cache_resource; o
+# benchmark.py e os scripts offline chamam-nas diretamente.
+import numpy as np
+import pandas as pd
+
+from author_index import AuthorIndex
+from citation_stats import CitationIndex, normalized_citations
+from cube import load_cube
+from data_store import DATA_DIR, read_table
+from filters import RowIndex
+from geography import country_index, load_article_countries
+from macro_areas import topic_macro_areas
+from related import RelatedIndex, load_doc_topics
+
+
+# Colunas do Fact_Articles efetivamente usadas pelo dashboard
+ARTICLE_COLUMNS = ['Article_ID', 'Title', 'Year', 'Source title', 'Cited by', 'Link', 'Topic_ID']
+
+
+def load_dataset(data_dir=DATA_DIR):
+    # Lê o armazenamento colunar (store/) quando existe; caso contrário os CSV
+    articles = read_table('Fact_Articles', columns=ARTICLE_COLUMNS, data_dir=data_dir)
+    # Artigos ordenados por ano (o store já vem assim; os CSV podem não vir):
+    # cada período passa a ser um intervalo contíguo de linhas do df_full
+    if not articles['Year'].is_monotonic_increasing:
+        articles = articles.sort_values(['Year', 'Article_ID'], kind='stable', ignore_index=True)
+    topics = read_table('Dim_Topics', data_dir=data_dir)
+    try:
+        macro_map = read_table('Topic_Macro_Areas', data_dir=data_dir)
+    except FileNotFoundError:
+        macro_map = None
+    topics['Macro_Area'] = topic_macro_areas(topics, macro_map)
+    geo = read_table('Bridge_Geography', data_dir=data_dir)
+    authors = read_table('Dim_Authors', data_dir=data_dir)
+    bridge_authors = read_table('Bridge_Article_Authors', data_dir=data_dir)
+    timeline = read_table('Agg_Timeline', data_dir=data_dir)
+    df_terms = read_table('top_terms_per_topic', data_dir=data_dir)
+
+    df_full = articles.merge(topics, on='Topic_ID', how='left')
+
+    # Primeiro autor e lista de autores de cada artigo, pela ordem da ponte
+    author_names = bridge_authors.merge(authors, on='Author_ID', how='left')['Author_Name']
+    named = bridge_authors[['Article_ID']].assign(Author_Name=author_names.to_numpy()).dropna()
+    by_article = named.groupby('Article_ID', sort=False)['Author_Name']
+    author_cols = pd.DataFrame({'First_Author': by_article.first(), 'Authors': by_article.agg('; '.join)})
+    df_full = df_full.merge(author_cols, left_on='Article_ID', right_index=True, how='left')
+
+    # Cubo Year x Topic_ID x Source title usado pelos painéis 1 a 3
+    cube = load_cube(articles, data_dir)
+    return df_full, topics, geo, authors, bridge_authors, timeline, df_terms, cube
+
+
+def build_author_index(df_full, topics, bridge_authors, authors):
+    article_topics = pd.Index(topics['Topic_ID']).get_indexer(df_full['Topic_ID'])
+    return AuthorIndex(df_full['Article_ID'], article_topics, len(topics), bridge_authors, authors)
+
+
+def build_citation_indexes(df_full, topics, author_index):
+    # Índices de citações para o conjunto filtrado ('Todos'), por tópico, revista e autor
+    rows = np.arange(len(df_full))
+    cited = df_full['Cited by'].fillna(0).to_numpy()
+    years = df_full['Year'].to_numpy()
+    topic_codes = author_index.article_topics
+    fields = np.where(topic_codes >= 0, topics['Macro_Area'].cat.codes.to_numpy()[topic_codes], -1)
+    normalized = normalized_citations(cited, years, fields)
+    journals = pd.Categorical(df_full['Source title'])
+    pairs = author_index.pair_article
+    return {
+        'Todos': CitationIndex(np.zeros(len(rows)), rows, cited, years, normalized, ['Todos']),
+        'Tópico': CitationIndex(topic_codes, rows, cited, years, normalized, topics['Topic_Label']),
+        'Revista': CitationIndex(journals.codes, rows, cited, years, normalized, journals.categories.astype(str)),
+        'Autor': CitationIndex(author_index.pair_author, pairs, cited[pairs], years[pairs], normalized[pairs],
+                               author_index.author_names),
+    }
+
+
+def build_related_index(df_full, data_dir=DATA_DIR):
+    # Vizinhos por vetores documento-tópico; None sem doc_topics.npz (topic_pipeline.py fit)
+    doc_topics = load_doc_topics(data_dir)
+    if doc_topics is None:
+        return None
+    return RelatedIndex(df_full['Article_ID'], *doc_topics)
+
+
+def build_row_index(df_full, topics):
+    return RowIndex(df_full['Year'], df_full['Topic_ID'], topics['Topic_ID'])
+
+
+def build_country_index(df_full, geo, data_dir=DATA_DIR):
+    # Pares (linha do artigo, país ISO) a partir da geografia normalizada
+    countries = read_table('Dim_Countries', data_dir=data_dir)
+    aliases = read_table('Geo_Aliases', data_dir=data_dir)
+    article_countries = load_article_countries(geo, countries, aliases, data_dir)
+    rows, pos = country_index(df_full['Article_ID'], article_countries, countries)
+    return rows, pos, countries
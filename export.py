@@ -0,0 +1,114 @@
+# Exportação da lista do explorador (PESQUISAR) em CSV, Parquet ou XLSX
+#
+# O ficheiro só é gerado quando o utilizador carrega no botão (o
+# st.download_button recebe uma função) e é escrito por blocos de linhas num
+# ficheiro temporário em disco, sem montar a tabela inteira nem a string do CSV
+# em memória; em memória fica só o resultado final, que o Streamlit serve.
+# Opcionalmente inclui a lista completa de autores e os países (normalizados) de
+# cada artigo.
+import io
+import tempfile
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow não há exportação em Parquet
+    pa = pq = None
+
+try:
+    import xlsxwriter
+except ImportError:  # sem xlsxwriter não há exportação em XLSX
+    xlsxwriter = None
+
+EXPORT_CHUNK_ROWS = 50000
+XLSX_MAX_ROWS = 1048575  # limite de linhas de uma folha Excel (sem o cabeçalho)
+
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def available_formats(n_rows):
+    formats = ['CSV']
+    if pq is not None:
+        formats.append('Parquet')
+    if xlsxwriter is not None and n_rows <= XLSX_MAX_ROWS:
+        formats.append('XLSX')
+    return formats
+
+
+def _countries_by_row(country_rows, country_pos, countries, n_rows):
+    # CSR linha do df_full -> nomes dos países, para juntar por bloco
+    order = np.argsort(country_rows, kind='stable')
+    ptr = np.searchsorted(country_rows[order], np.arange(n_rows + 1))
+    return ptr, countries['Country_Name'].to_numpy()[country_pos[order]]
+
+
+def export_chunks(df_full, rows, columns, country_idx=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # columns: coluna do df_full -> nome na exportação.
+    # Com country_idx (rows, pos, countries) junta a coluna 'Países'.
+    rows = np.arange(len(df_full))[rows]
+    if country_idx is not None:
+        ptr, names = _countries_by_row(*country_idx, len(df_full))
+    # Sem linhas, um bloco vazio (para o ficheiro ter pelo menos o cabeçalho/esquema)
+    for start in range(0, max(len(rows), 1), chunk_rows):
+
+        sel = rows[start:start + chunk_rows]
+        chunk = df_full.iloc[sel][list(columns)].rename(columns=columns)
+        if country_idx is not None:
+            chunk['Países'] = ['; '.join(names[ptr[r]:ptr[r + 1]]) for r in sel]
+        yield chunk.reset_index(drop=True)
+
+
+def _write_csv(chunks, f):
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(f, index=False, header=i == 0, encoding='utf-8')
+
+
+def _write_parquet(chunks, f):
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(f, table.schema, compression='zstd')
+        writer.write_table(table.cast(writer.schema))
+    if writer is not None:
+        writer.close()
+
+
+def _write_xlsx(chunks, f):
+    # constant_memory: cada linha é escrita no disco assim que a seguinte começa
+    workbook = xlsxwriter.Workbook(f, {'constant_memory': True, 'strings_to_urls': False,
+                                       'nan_inf_to_errors': True})
+    sheet = workbook.add_worksheet('Artigos')
+    r = 0
+    for chunk in chunks:
+        if r == 0:
+            sheet.write_row(0, 0, [str(c) for c in chunk.columns])
+            r = 1
+        values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        for values_row in values:
+            sheet.write_row(r, 0, values_row)
+            r += 1
+    workbook.close()
+
+
+def export_bytes(chunks, fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+    with tempfile.TemporaryFile() as f:
+        if fmt == 'CSV':
+            text = io.TextIOWrapper(f, encoding='utf-8', newline='', write_through=True)
+            _write_csv(chunks, text)
+            text.detach()
+        elif fmt == 'Parquet':
+            _write_parquet(chunks, f)
+        else:
+            _write_xlsx(chunks, f)
+        f.seek(0)
+        return f.read()
+
@@ -0,0 +1,79 @@
+# Cache de figuras Plotly do dashboard, partilhada entre sessões
+#
+# Cada figura é identificada pelo nome, pelo código da função que a constrói,
+# por um hash do agregado de entrada e pelos parâmetros de layout. Uma figura
+# cujo agregado não mudou é devolvida já construída (sem plotly.express nem
+# validação). O orçamento de memória é contado pelo tamanho do JSON serializado
+# de cada figura (o que o Streamlit envia ao browser); as menos usadas saem primeiro.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from tracing import span
+
+# Orçamento total da cache (bytes de JSON serializado)
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def frame_digest(df):
+    # Hash do conteúdo (valores, índice, colunas e tipos) de um DataFrame
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode('utf-8'))
+    return h.hexdigest()
+
+
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.timings = {}  # nome -> última construção: build_ms, serialize_ms, bytes, hits
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, build, data, **params):
+        # build(data, **params) -> go.Figure; a figura devolvida é só de leitura
+        with span(f'figure:{name}'):
+            return self._get(name, build, data, params)
+
+    def _get(self, name, build, data, params):
+        key = (name, build.__code__, frame_digest(data), tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self.timings[name]['hits'] += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+
+        import plotly.io
+
+        t0 = time.perf_counter()
+        with span(f'figure:{name}:build'):
+            fig = build(data, **params)
+        t1 = time.perf_counter()
+        with span(f'figure:{name}:to_json'):
+            nbytes = len(plotly.io.to_json(fig, validate=False))
+        t2 = time.perf_counter()
+
+        with self._lock:
+            hits = self.timings.get(name, {}).get('hits', 0)
+            self.timings[name] = {'build_ms': (t1 - t0) * 1e3, 'serialize_ms': (t2 - t1) * 1e3,
+                                  'bytes': nbytes, 'hits': hits}
+            if key not in self._entries:
+                self._entries[key] = (fig, nbytes)
+                self.total_bytes += nbytes
+            # A figura acabada de construir fica sempre, mesmo acima do orçamento
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self.total_bytes -= old_bytes
+        return fig
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'bytes': self.total_bytes, 'figures': {k: dict(v) for k, v in self.timings.items()}}
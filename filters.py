@@ -0,0 +1,172 @@
+# Contexto de filtro partilhado pelos painéis
+#
+# Calculado a partir dos controlos do sidebar (período e tópico) e passado a
+# cada painel, que só é executado quando a sua aba está ativa.
+# O FilterCache guarda, por (período, tópico), o contexto e os agregados
+# derivados; é partilhado por todas as sessões, por isso os valores em cache
+# são só de leitura. O orçamento é em bytes (tamanho de cada valor guardado);
+# do contexto só ficam as linhas e a fatia do cubo: os artigos filtrados (df)
+# e a máscara são materializados em cada rerun, numa cópia rasa do contexto.
+#
+# O df_full vem ordenado por ano (dataset.load_dataset): com o RowIndex um
+# período é um intervalo de linhas (procura binária, sem cópia) e um tópico é a
+# sua lista ordenada de linhas, recortada ao mesmo intervalo.
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from cube import cube_slice
+from tracing import span
+
+# Orçamento da cache de filtros (bytes dos contextos + agregados guardados)
+FILTER_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def value_nbytes(value):
+    # Tamanho aproximado de um valor da cache (arrays, tabelas, contextos e tuplos deles)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, FilterContext):
+        return value_nbytes(value.rows) + value_nbytes(value.cube)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(value_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class FilterCache:
+    def __init__(self, max_bytes=FILTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # chave -> (valor, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+        # Calculado fora do lock: sessões com filtros diferentes não esperam umas pelas outras
+        value = compute()
+        nbytes = value_nbytes(value)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self.total_bytes += nbytes
+            # O valor acabado de calcular fica sempre, mesmo acima do orçamento
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self.total_bytes -= old_bytes
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self.total_bytes,
+                    'hit_rate': self.hits / total if total else 0.0}
+
+
+class RowIndex:
+    def __init__(self, years, topic_ids, topics):
+        # years: Year de cada linha do df_full, por ordem crescente
+        years = np.asarray(years)
+        self.n_rows = len(years)
+        self.years, starts = np.unique(years, return_index=True)
+        self.year_offsets = np.append(starts, self.n_rows)
+        # Linhas de cada Topic_ID (ordenadas, logo também por ano)
+        topic_ids = np.asarray(topic_ids)
+        order = np.argsort(topic_ids, kind='stable').astype(np.int32)
+        bounds = np.searchsorted(topic_ids[order], np.asarray(topics), side='left')
+        ends = np.searchsorted(topic_ids[order], np.asarray(topics), side='right')
+        self.topic_rows = {t: order[lo:hi] for t, lo, hi in zip(topics, bounds, ends)}
+
+    def year_bounds(self, ano_range):
+        # Intervalo [lo, hi) de linhas com ano_range[0] <= Year <= ano_range[1]
+        lo = self.year_offsets[np.searchsorted(self.years, ano_range[0], side='left')]
+        hi = self.year_offsets[np.searchsorted(self.years, ano_range[1], side='right')]
+        return int(lo), int(hi)
+
+    def rows(self, ano_range, topic_ids=None):
+        # slice (só período) ou array ordenado de linhas (período + tópicos); topic_ids: Topic_IDs
+        # do tópico escolhido (vários quando há tópicos com o mesmo Topic_Label)
+        lo, hi = self.year_bounds(ano_range)
+        if topic_ids is None:
+            return slice(lo, hi)
+        parts = [self.topic_rows.get(t, np.empty(0, np.int32)) for t in topic_ids]
+        parts = [r[np.searchsorted(r, lo):np.searchsorted(r, hi)] for r in parts]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, np.int32)
+
+
+@dataclass
+class FilterContext:
+    ano_range: tuple
+    topico: str            # "Todos" ou Topic_Label
+    topic_ids: tuple       # Topic_IDs com o Topic_Label selecionado (None para "Todos")
+    rows: object           # linhas do df_full: slice (período) ou array ordenado (período + tópico)
+    n_rows: int
+    cube: pd.DataFrame     # fatia do cubo de agregados para o mesmo filtro
+    df_full: pd.DataFrame = field(default=None, repr=False)
+    cache: FilterCache = None
+
+    @cached_property
+    def df(self):
+        # Artigos filtrados (antigo df_filtered); só materializado quando um painel o usa
+        return self.df_full.iloc[self.rows]
+
+    @cached_property
+    def article_mask(self):
+        # Máscara booleana sobre as linhas do df_full
+        mask = np.zeros(len(self.df_full), dtype=bool)
+        mask[self.rows] = True
+        return mask
+
+    def memo(self, name, compute, topic_scoped=True):
+        # Agregado derivado deste filtro, calculado uma vez e partilhado entre sessões.
+        # topic_scoped=False para agregados que só dependem do período.
+        with span(f'memo:{name}'):
+            if self.cache is None:
+                return compute(self)
+            key = (self.ano_range, self.topico if topic_scoped else None, name)
+            return self.cache.get(key, lambda: compute(self))
+
+
+def filter_context(cache, df_full, row_index, df_topics, df_cube, ano_range, topico):
+    key = (tuple(ano_range), topico, 'ctx')
+    shared = cache.get(key, lambda: build_filter_context(df_full, row_index, df_topics, df_cube,
+                                                         ano_range, topico, cache))
+    # Cópia rasa por rerun: o df e a máscara materializados não ficam no contexto partilhado
+    return replace(shared)
+
+
+def build_filter_context(df_full, row_index, df_topics, df_cube, ano_range, topico, cache=None):
+    topic_ids = None
+    if topico != "Todos":
+        # Rótulos repetidos (ex.: do LLM) juntam todos os tópicos com esse rótulo
+        topic_ids = tuple(df_topics.loc[df_topics['Topic_Label'] == topico, 'Topic_ID'].tolist())
+    rows = row_index.rows(ano_range, topic_ids)
+    return FilterContext(
+        ano_range=tuple(ano_range),
+        topico=topico,
+        topic_ids=topic_ids,
+        rows=rows,
+        n_rows=rows.stop - rows.start if isinstance(rows, slice) else len(rows),
+        cube=cube_slice(df_cube, ano_range, topic_ids),
+        df_full=df_full,
+        cache=cache,
+    )
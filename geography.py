@@ -0,0 +1,94 @@
+# Normalização geográfica: Bridge_Geography -> artigo x país (ISO-3166)
+#
+# O Country_Region do Scopus mistura países, cidades e ruído ("Schwann", "Kif4a").
+# Cada texto distinto é resolvido uma única vez contra o gazetteer offline
+# (Dim_Countries.csv, nomes EN/PT) e a tabela de aliases (Geo_Aliases.csv);
+# o que não é um país é descartado. O resultado fica em
+# store/Bridge_Article_Country.parquet com o código numérico ISO de cada país.
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR, TABLES, is_fresh, read_table, store_dir
+from search_index import fold
+
+ARTICLE_COUNTRY_NAME = 'Bridge_Article_Country'
+
+
+def _key(text):
+    key = ' '.join(fold(text).replace('.', ' ').split())
+    return key[4:] if key.startswith('the ') else key
+
+
+def country_lookup(countries, aliases):
+    # Texto normalizado -> Country_Code (código numérico ISO-3166)
+    lookup = {}
+    for col in ['Country_Name', 'Country_Name_PT', 'Official_Name']:
+        for name, code in zip(countries[col], countries['Country_Code']):
+            if name:
+                lookup.setdefault(_key(name), code)
+                # "Bolívia, Estado Plurinacional da" também vale como "Bolívia"
+                lookup.setdefault(_key(name.split(',')[0]), code)
+    by_iso3 = dict(zip(countries['ISO_A3'], countries['Country_Code']))
+    for alias, iso3 in zip(aliases['Alias'], aliases['ISO_A3']):
+        lookup[_key(alias)] = by_iso3[iso3]
+    return lookup
+
+
+def normalize_geography(geo, countries, aliases):
+    lookup = country_lookup(countries, aliases)
+    raw = geo['Country_Region'].astype('category')
+    # Só os valores distintos passam pelo dicionário
+    codes = np.array([lookup.get(_key(v), -1) for v in raw.cat.categories], dtype=np.int32)
+    country = np.where(raw.cat.codes.to_numpy() >= 0, codes[raw.cat.codes.to_numpy()], -1)
+    out = pd.DataFrame({'Article_ID': geo['Article_ID'].to_numpy(), 'Country_Code': country})
+    out = out[out['Country_Code'] >= 0].drop_duplicates()
+    return out.astype({'Article_ID': 'int32', 'Country_Code': 'int16'}).reset_index(drop=True)
+
+
+def write_article_countries(data_dir=DATA_DIR):
+    geo = read_table('Bridge_Geography', data_dir=data_dir)
+    table = normalize_geography(geo, read_table('Dim_Countries', data_dir=data_dir),
+                                read_table('Geo_Aliases', data_dir=data_dir))
+    out_path = os.path.join(store_dir(data_dir), ARTICLE_COUNTRY_NAME + '.parquet')
+    table.to_parquet(out_path + '.tmp', index=False, compression='zstd')
+    os.replace(out_path + '.tmp', out_path)
+    print(f"{len(geo)} linhas de Bridge_Geography -> {len(table)} pares artigo x país "
+          f"({table['Country_Code'].nunique()} países) -> {out_path}")
+    return out_path
+
+
+def load_article_countries(geo, countries, aliases, data_dir=DATA_DIR):
+    path = os.path.join(store_dir(data_dir), ARTICLE_COUNTRY_NAME + '.parquet')
+    sources = [os.path.join(data_dir, TABLES[name]['csv'])
+               for name in ('Bridge_Geography', 'Dim_Countries', 'Geo_Aliases')]
+    if all(is_fresh(path, src) for src in sources):
+        try:
+            return pd.read_parquet(path)
+        except ImportError:
+            pass
+    return normalize_geography(geo, countries, aliases)
+
+
+# --- CONTAGENS ---
+def country_index(article_ids, article_countries, countries):
+    # Pares (linha do df_full, posição do país no Dim_Countries)
+    rows = pd.Index(article_ids).get_indexer(article_countries['Article_ID'])
+    pos = pd.Index(countries['Country_Code']).get_indexer(article_countries['Country_Code'])
+    ok = (rows >= 0) & (pos >= 0)
+    return rows[ok].astype(np.int32), pos[ok].astype(np.int32)
+
+
+def country_counts(rows, country_pos, article_mask, countries):
+    freq = np.bincount(country_pos[article_mask[rows]], minlength=len(countries))
+    nz = np.flatnonzero(freq)
+    counts = pd.DataFrame({'ISO_A3': countries['ISO_A3'].to_numpy()[nz],
+                           'Local': countries['Country_Name'].to_numpy()[nz],
+                           'Frequência': freq[nz]})
+    return counts.sort_values('Frequência', ascending=False, kind='stable').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    write_article_countries(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
@@ -0,0 +1,349 @@
+# Ingestão incremental de novas exportações do Scopus
+#
+# Uso:  python ingest.py pasta_do_delta [--data-dir pasta_dos_dados]
+#       python ingest.py --rollback v0002 [--data-dir pasta_dos_dados]
+#
+# O delta tem o mesmo formato do esquema em estrela (Fact_Articles.csv e,
+# opcionalmente, Bridge_Article_Authors.csv, Dim_Authors.csv e
+# Bridge_Geography.csv), já com o Topic_ID atribuído pelo pipeline de tópicos;
+# sem a coluna Topic_ID, os artigos do delta são projetados no modelo de
+# tópicos congelado (topic_pipeline.py assign), sem refazer o NMF.
+# Um artigo do delta substitui a versão anterior (dedupe por Article_ID); nas
+# pontes, as linhas de um artigo presente no ficheiro do delta substituem as
+# anteriores (sem linhas no delta, mantêm-se). Os autores são deduplicados
+# por Author_ID. Os agregados (cubo, Agg_Timeline, topics_over_time,
+# topic_counts, journals_per_topic) e a geografia normalizada são atualizados
+# só com as linhas que mudaram.
+#
+# Cada ingest escreve um snapshot novo e completo em snapshots/vNNNN/ e só
+# depois aponta snapshots/CURRENT para ele (troca atómica). O dashboard lê o
+# CURRENT a cada rerun e passa para a nova versão sem reiniciar nem perder sessões.
+# Um ingest (ou rollback) de cada vez: o processo fica com um lock exclusivo em
+# snapshots/.lock (fcntl.flock) do início ao fim, e um segundo espera por ele;
+# sem isso, dois ingests partiriam do mesmo snapshot e o último a publicar
+# perdia os artigos do outro.
+#
+# Os índices por posição de linha (RowIndex, AuthorIndex e o do SearchIndex)
+# são reconstruídos de raiz para cada snapshot, de propósito: o Fact_Articles
+# é reordenado por (Year, Article_ID), por isso os artigos do delta entram a
+# meio e mudam a posição de todas as linhas seguintes. Atualizá-los no lugar
+# obrigaria a remapear todas as posições, o que custa tanto como reconstruí-los
+# (≈0,5 s para o AuthorIndex com 50 mil artigos).
+#
+# Cada snapshot guarda no manifest o model_id do modelo de tópicos com que os
+# seus Topic_ID foram atribuídos. Depois de um refit (topic_pipeline.py fit)
+# o ingest recusa juntar deltas ao snapshot ativo, que ficou com os Topic_ID
+# do modelo anterior: misturá-los daria tópicos com dois significados.
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from cube import CUBE_KEYS, CUBE_NAME, build_cube, load_cube
+from data_store import (CURRENT_FILENAME, DATA_DIR, SNAPSHOTS_DIRNAME, TABLES, TOPIC_MODEL_DIRNAME,
+                        TOPIC_MODEL_MANIFEST, current_data_dir, data_fingerprint, is_fresh, read_csv_table,
+                        read_table, store_dir, topic_model_id)
+from geography import ARTICLE_COUNTRY_NAME, load_article_countries, normalize_geography
+from related import doc_topics_path, load_doc_topics, merge_doc_topics, save_doc_topics
+from wordclouds import WORDCLOUD_DIRNAME
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, os ingests não podem correr em paralelo
+    fcntl = None
+
+# Nº de snapshots mantidos em disco (o ativo nunca é apagado)
+SNAPSHOT_KEEP = 3
+MANIFEST_FILENAME = 'manifest.json'
+LOCK_FILENAME = '.lock'
+
+# Tabelas agregadas do pipeline (fora do store): ficheiro -> (chaves, coluna de contagem)
+AGGREGATES = {
+    'topics_over_time.csv': (['Year', 'Topic_ID'], 'n_docs'),
+    'topic_counts.csv': (['Topic_ID'], 'n_docs'),
+    'journals_per_topic.csv': (['Topic_ID', 'Source title'], 'n_docs'),
+}
+
+
+def _write_parquet(df, path):
+    df.to_parquet(path + '.tmp', index=False, compression='zstd')
+    os.replace(path + '.tmp', path)
+
+
+def _link_or_copy(src, dst):
+    # Ficheiros que não mudam são partilhados entre snapshots (hard link quando possível)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _read_delta(name, delta_dir):
+    if not os.path.exists(os.path.join(delta_dir, TABLES[name]['csv'])):
+        return None
+    return read_csv_table(name, data_dir=delta_dir)
+
+
+def merge_counts(table, keys, removed, added):
+    # Soma às contagens existentes as dos artigos novos e subtrai as das versões substituídas.
+    # table/removed/added: agregados com as mesmas chaves e colunas numéricas
+    value_cols = [c for c in table.columns if c not in keys]
+    removed = removed.copy()
+    removed[value_cols] = -removed[value_cols]
+    parts = [t.astype({k: 'object' for k in keys if t[k].dtype == 'category'})
+             for t in (table, removed, added)]
+    merged = pd.concat(parts, ignore_index=True).groupby(keys, sort=True)[value_cols].sum().reset_index()
+    merged = merged[merged[value_cols[0]] > 0].reset_index(drop=True)
+    return merged.astype(table.dtypes.to_dict())
+
+
+def _count(articles, keys, count_col):
+    return articles.groupby(keys, sort=True).size().rename(count_col).reset_index()
+
+
+# --- SNAPSHOTS ---
+def snapshots_root(data_dir=DATA_DIR):
+    return os.path.join(data_dir, SNAPSHOTS_DIRNAME)
+
+
+def list_versions(data_dir=DATA_DIR):
+    root = snapshots_root(data_dir)
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if re.fullmatch(r'v\d+', d))
+
+
+def current_version(data_dir=DATA_DIR):
+    path = current_data_dir(data_dir)
+    return os.path.basename(path) if path != data_dir else None
+
+
+def snapshot_model_id(path, data_dir=DATA_DIR):
+    # model_id com que foram atribuídos os Topic_ID da pasta; os CSV da raiz são reescritos a cada fit
+    model_id = topic_model_id(data_dir)
+    if path == data_dir:
+        return model_id
+    manifest = os.path.join(path, MANIFEST_FILENAME)
+    with open(manifest, encoding='utf-8') as f:
+        recorded = json.load(f)
+    if 'model_id' in recorded:
+        return recorded['model_id']
+    # Snapshot anterior ao model_id: é do modelo atual se o fit não for mais recente que ele
+    model_manifest = os.path.join(data_dir, TOPIC_MODEL_DIRNAME, TOPIC_MODEL_MANIFEST)
+    if os.path.exists(model_manifest) and os.path.getmtime(model_manifest) > os.path.getmtime(manifest):
+        return 'desconhecido'
+    return model_id
+
+
+def publish(version, data_dir=DATA_DIR):
+    # Troca atómica do snapshot ativo
+    pointer = os.path.join(snapshots_root(data_dir), CURRENT_FILENAME)
+    with open(pointer + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer + '.tmp', pointer)
+
+
+@contextmanager
+def ingest_lock(data_dir=DATA_DIR):
+    # Lock exclusivo sobre os snapshots; libertado pelo sistema se o processo terminar a meio
+    os.makedirs(snapshots_root(data_dir), exist_ok=True)
+    with open(os.path.join(snapshots_root(data_dir), LOCK_FILENAME), 'a') as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print("outro ingest em curso: à espera que termine ...", flush=True)
+                fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def prune_snapshots(data_dir=DATA_DIR, keep=SNAPSHOT_KEEP):
+    # Sessões que ainda usam uma versão antiga já a têm em memória
+    active = current_version(data_dir)
+    for version in list_versions(data_dir)[:-keep]:
+        if version != active:
+            shutil.rmtree(os.path.join(snapshots_root(data_dir), version), ignore_errors=True)
+
+
+# --- INGEST ---
+def ingest(delta_dir, data_dir=DATA_DIR):
+    with ingest_lock(data_dir):
+        return _ingest(delta_dir, data_dir)
+
+
+def _ingest(delta_dir, data_dir):
+    t0 = time.perf_counter()
+    base = current_data_dir(data_dir)
+    delta_csv = os.path.join(delta_dir, TABLES['Fact_Articles']['csv'])
+    if not os.path.exists(delta_csv):
+        raise FileNotFoundError(f"{TABLES['Fact_Articles']['csv']} não encontrado em {delta_dir}")
+    model_id = topic_model_id(data_dir)
+    base_model_id = snapshot_model_id(base, data_dir)
+    if base_model_id != model_id:
+        raise RuntimeError(f"O snapshot ativo ({current_version(data_dir)}) foi feito com o modelo de tópicos "
+                           f"{base_model_id} e o topic_model/ tem o {model_id or 'nenhum'}: os Topic_ID não são "
+                           f"compatíveis. Reponha o modelo anterior, ou apague {SNAPSHOTS_DIRNAME}/{CURRENT_FILENAME} "
+                           f"e volte a ingerir os deltas sobre os dados reclassificados pelo fit.")
+    if 'Topic_ID' not in pd.read_csv(delta_csv, nrows=0, encoding='utf-8-sig').columns:
+        from topic_pipeline import assign
+        assign(delta_dir, data_dir)
+    delta_articles = _read_delta('Fact_Articles', delta_dir)
+    articles = read_table('Fact_Articles', data_dir=base)
+    delta_articles = (delta_articles.reindex(columns=articles.columns)
+                      .drop_duplicates('Article_ID', keep='last').reset_index(drop=True))
+    delta_ids = delta_articles['Article_ID']
+    replaced = articles['Article_ID'].isin(delta_ids)
+    removed = articles[replaced]
+    new_articles = (pd.concat([articles[~replaced], delta_articles], ignore_index=True)
+                    .astype(articles.dtypes.to_dict())
+                    .sort_values(TABLES['Fact_Articles']['sort_by'], kind='stable', ignore_index=True))
+
+    versions = list_versions(data_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    tmp_dir = os.path.join(snapshots_root(data_dir), f'.{version}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    out_store = store_dir(tmp_dir)
+    os.makedirs(out_store)
+
+    def out(name):
+        return os.path.join(out_store, name + '.parquet')
+
+    _write_parquet(new_articles, out('Fact_Articles'))
+
+    # Pontes: as linhas de um artigo do delta vêm do delta (a ordem dos autores é preservada)
+    for name in ('Bridge_Article_Authors', 'Bridge_Geography'):
+        table = read_table(name, data_dir=base)
+        delta = _read_delta(name, delta_dir)
+        if delta is not None:
+            delta = delta[delta['Article_ID'].isin(delta_ids)]
+            table = table[~table['Article_ID'].isin(delta['Article_ID'])]
+            table = pd.concat([table, delta], ignore_index=True).drop_duplicates()
+            table = table.astype({c: TABLES[name]['dtypes'].get(c, 'object') for c in table.columns})
+        _write_parquet(table.reset_index(drop=True), out(name))
+
+    # Autores: dedupe por Author_ID, o nome mais recente prevalece
+    authors = read_table('Dim_Authors', data_dir=base)
+    delta_authors = _read_delta('Dim_Authors', delta_dir)
+    if delta_authors is not None:
+        authors = (pd.concat([authors, delta_authors.reindex(columns=authors.columns)], ignore_index=True)
+                   .drop_duplicates('Author_ID', keep='last').reset_index(drop=True))
+    _write_parquet(authors, out('Dim_Authors'))
+
+    # Tabelas que o delta não altera: partilhadas com o snapshot anterior
+    for name in ('Dim_Topics', 'Topic_Macro_Areas', 'Dim_Countries', 'Geo_Aliases', 'top_terms_per_topic'):
+        src = os.path.join(store_dir(base), name + '.parquet')
+        if is_fresh(src, os.path.join(base, TABLES[name]['csv'])):
+            _link_or_copy(src, out(name))
+        elif os.path.exists(os.path.join(base, TABLES[name]['csv'])):
+            _write_parquet(read_table(name, data_dir=base), out(name))
+
+    # Agregados: só as contribuições dos artigos substituídos e dos novos
+    cube = merge_counts(load_cube(articles, base), CUBE_KEYS, build_cube(removed), build_cube(delta_articles))
+    _write_parquet(cube, out(CUBE_NAME))
+    timeline = read_table('Agg_Timeline', data_dir=base)
+    timeline = merge_counts(timeline, ['Year', 'Topic_ID'], _count(removed, ['Year', 'Topic_ID'], 'Article_Count'),
+                            _count(delta_articles, ['Year', 'Topic_ID'], 'Article_Count'))
+    _write_parquet(timeline, out('Agg_Timeline'))
+    for filename, (keys, count_col) in AGGREGATES.items():
+        path = os.path.join(base, filename)
+        if not os.path.exists(path):
+            continue
+        table = merge_counts(pd.read_csv(path, encoding='utf-8-sig'), keys,
+                             _count(removed, keys, count_col), _count(delta_articles, keys, count_col))
+        if filename == 'topic_counts.csv':
+            table = table.sort_values(count_col, ascending=False, kind='stable')
+        table.to_csv(os.path.join(tmp_dir, filename), index=False)
+
+    # Geografia normalizada: só os textos do delta passam pelo gazetteer
+    countries = read_table('Dim_Countries', data_dir=base)
+    aliases = read_table('Geo_Aliases', data_dir=base)
+    article_countries = load_article_countries(read_table('Bridge_Geography', data_dir=base),
+                                               countries, aliases, base)
+    delta_geo = _read_delta('Bridge_Geography', delta_dir)
+    if delta_geo is not None:
+        delta_geo = delta_geo[delta_geo['Article_ID'].isin(delta_ids)]
+        article_countries = article_countries[~article_countries['Article_ID'].isin(delta_geo['Article_ID'])]
+        article_countries = pd.concat([article_countries, normalize_geography(delta_geo, countries, aliases)],
+                                      ignore_index=True).drop_duplicates()
+
+    _write_parquet(article_countries.astype({'Article_ID': 'int32', 'Country_Code': 'int16'}),
+                   out(ARTICLE_COUNTRY_NAME))
+
+    # Vetores documento-tópico (artigos relacionados): os do delta substituem/acrescentam
+    doc_topics = merge_doc_topics(load_doc_topics(base), load_doc_topics(delta_dir))
+    if doc_topics is not None:
+        save_doc_topics(doc_topics_path(tmp_dir), *doc_topics)
+
+    # Nuvens de palavras: os termos não mudam, os PNG são partilhados
+    src_clouds = os.path.join(store_dir(base), WORDCLOUD_DIRNAME)
+    if os.path.isdir(src_clouds):
+        os.makedirs(os.path.join(out_store, WORDCLOUD_DIRNAME))
+        for filename in os.listdir(src_clouds):
+            if filename.endswith('.png'):
+                _link_or_copy(os.path.join(src_clouds, filename), os.path.join(out_store, WORDCLOUD_DIRNAME, filename))
+
+    # Índice de pesquisa construído antes da troca, para que a nova versão abra já pronta
+    from dataset import build_author_index, load_dataset
+    from search_index import SearchIndex
+    from shared_store import shared_dir, write_shared
+
+    fingerprint = data_fingerprint(tmp_dir)
+    data = load_dataset(tmp_dir)
+    df_full, topics, _, authors_df, bridge, *_ = data
+    SearchIndex.build(df_full, build_author_index(df_full, topics, bridge, authors_df)).save(fingerprint, tmp_dir)
+    # Em modo multi-processo (a versão ativa tem segmento partilhado) o da nova versão também
+    if os.path.isdir(shared_dir(base)):
+        write_shared(tmp_dir, data, fingerprint)
+
+    manifest = {'version': version, 'parent': current_version(data_dir), 'delta_dir': os.path.abspath(delta_dir),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'articles': len(new_articles),
+                'delta_articles': len(delta_articles), 'replaced_articles': int(replaced.sum()),
+                'model_id': model_id}
+    with open(os.path.join(tmp_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    final_dir = os.path.join(snapshots_root(data_dir), version)
+    # O rename mantém nomes, tamanhos e mtimes: o índice guardado continua válido na pasta final
+    os.rename(tmp_dir, final_dir)
+    publish(version, data_dir)
+    prune_snapshots(data_dir)
+    print(f"{version}: +{len(delta_articles) - manifest['replaced_articles']} artigos novos, "
+          f"{manifest['replaced_articles']} atualizados, {len(new_articles)} no total "
+          f"({time.perf_counter() - t0:.1f}s) -> {final_dir}")
+    return final_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão incremental de exportações do Scopus")
+    parser.add_argument('delta_dir', nargs='?', help="pasta com os CSV do delta")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--rollback', metavar='VERSAO', help="volta a ativar um snapshot anterior")
+    args = parser.parse_args()
+
+    if args.rollback:
+        if args.rollback not in list_versions(args.data_dir):
+            sys.exit(f"Snapshot {args.rollback} não existe ({', '.join(list_versions(args.data_dir)) or 'nenhum'})")
+        with ingest_lock(args.data_dir):
+            publish(args.rollback, args.data_dir)
+        print(f"snapshot ativo: {args.rollback}")
+    elif args.delta_dir:
+        try:
+            ingest(args.delta_dir, args.data_dir)
+        except RuntimeError as e:
+            sys.exit(str(e))
+    else:
+        parser.error("indique a pasta do delta ou --rollback")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# Leaderboard de autores (Painel 4) sem ordenações completas
+#
+# Para os artigos filtrados, calcula por autor: nº de artigos, citações, índice h
+# (do índice de citações dos autores, citation_stats.py) e o tópico principal
+# (argmax agrupado sobre os pares autor x tópico, com desempate pelas citações
+# no tópico). O top-k de cada grupo (ex.: macro-área do tópico principal) sai de
+# uma seleção parcial (np.partition) e só os k candidatos (mais empates na
+# fronteira) são ordenados.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+LEADERBOARD_K = 5
+# Métrica -> (valor principal, desempate); os empates restantes vão pelo código do autor
+METRICS = {
+    'topic_articles': ('main_qtd', 'citations'),   # artigos no tópico principal
+    'citations': ('citations', 'n_docs'),
+    'h_index': ('h_index', 'citations'),
+}
+
+
+@dataclass
+class AuthorStats:
+    n_docs: np.ndarray      # artigos filtrados de cada autor (posição no Dim_Authors)
+    citations: np.ndarray
+    main_topic: np.ndarray  # código do tópico principal, -1 sem artigos com tópico
+    main_qtd: np.ndarray    # artigos no tópico principal
+    h_index: np.ndarray = None
+
+
+def _group_starts(sorted_keys):
+    return np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+
+
+def _score(primary, tiebreak):
+    # Um único inteiro ordena por (principal, desempate)
+    return (primary.astype(np.int64) << 32) | np.clip(tiebreak, 0, 2 ** 32 - 1).astype(np.int64)
+
+
+def top_k(score, candidates, k):
+    # Os k candidatos com maior score, por ordem (empates pelo menor código)
+    if len(candidates) == 0:
+        return candidates
+    s = score[candidates]
+    if len(candidates) > k:
+        kth = np.partition(s, len(s) - k)[len(s) - k]
+        keep = s >= kth
+        candidates, s = candidates[keep], s[keep]
+    return candidates[np.lexsort((candidates, -s))][:k]
+
+
+class Leaderboard:
+    def __init__(self, author_index, article_cited, author_citations):
+        self.index = author_index
+        self.pair_cited = np.asarray(article_cited, dtype=np.int64)[author_index.pair_article]
+        self.author_citations = author_citations
+
+    def author_stats(self, article_mask, with_h_index=False):
+        idx = self.index
+        n, n_topics = idx.n_authors, idx.n_topics
+        sel = article_mask[idx.pair_article]
+        authors = idx.pair_author[sel]
+        cited = self.pair_cited[sel]
+        n_docs = np.bincount(authors, minlength=n)
+        citations = np.bincount(authors, weights=cited, minlength=n).astype(np.int64)
+
+        # Tópico principal: argmax por autor sobre os pares (autor, tópico) presentes no filtro.
+        # Só os pares não nulos são contados (np.unique): a memória cresce com os pares, não
+        # com autores x tópicos
+        topics = idx.article_topics[idx.pair_article[sel]]
+        known = topics >= 0
+        keys = authors[known].astype(np.int64) * n_topics + topics[known]
+        pairs, pair_codes, qtd = np.unique(keys, return_inverse=True, return_counts=True)  # ordenados por autor
+        topic_cited = np.bincount(pair_codes, weights=cited[known], minlength=len(pairs))
+        pair_author = pairs // n_topics
+        score = _score(qtd, topic_cited)
+        starts = _group_starts(pair_author)
+        best = np.maximum.reduceat(score, starts) if len(pairs) else score
+        is_best = score == np.repeat(best, np.diff(np.r_[starts, len(pairs)]))
+        # Empate total: fica o tópico de menor código (o primeiro do grupo)
+        first = np.flatnonzero(is_best)
+        winners = first[_group_starts(pair_author[first])] if len(first) else first
+        main_topic = np.full(n, -1, dtype=np.int32)
+        main_qtd = np.zeros(n, dtype=np.int64)
+        main_topic[pair_author[winners]] = pairs[winners] % n_topics
+        main_qtd[pair_author[winners]] = qtd[winners]
+
+        stats = AuthorStats(n_docs, citations, main_topic, main_qtd)
+        if with_h_index:
+            stats.h_index = self.author_citations.h_index(article_mask)
+        return stats
+
+    def top_authors(self, article_mask, topic_labels, topic_groups, metric='topic_articles', k=LEADERBOARD_K):
+        # Top-k por grupo do tópico principal (topic_groups: categórica alinhada com os tópicos,
+        # ex.: Dim_Topics.Macro_Area). Devolve uma tabela pequena, ordenada por grupo e posição.
+        primary, tiebreak = METRICS[metric]
+        stats = self.author_stats(article_mask, with_h_index=metric == 'h_index')
+        groups = pd.Categorical(topic_groups)
+        group_codes = groups.codes[stats.main_topic]
+        group_codes[stats.main_topic < 0] = -1
+        score = _score(getattr(stats, primary), getattr(stats, tiebreak))
+
+        winners = np.concatenate([top_k(score, np.flatnonzero(group_codes == g), k)
+                                  for g in range(len(groups.categories))]).astype(np.int64)
+        idx = self.index
+        out = pd.DataFrame({
+            'Author_ID': idx.author_ids[winners],
+            'Author_Name': idx.author_names[winners],
+            'Topic_Label': np.asarray(topic_labels)[stats.main_topic[winners]],
+            'Macro_Area': pd.Categorical.from_codes(group_codes[winners], groups.categories),
+            'Qtd': stats.main_qtd[winners],
+            'Artigos': stats.n_docs[winners],
+            'Citações': stats.citations[winners],
+        })
+        if stats.h_index is not None:
+            out['Índice h'] = stats.h_index[winners]
+        return out
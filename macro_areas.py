@@ -0,0 +1,59 @@
+# Grande área científica (macro-área) de cada tópico
+#
+# A macro-área é um atributo do tópico: vem do ficheiro Topic_Macro_Areas.csv
+# (Topic_ID -> Macro_Area, editável à mão) e, para tópicos que não estejam lá
+# (ex.: depois de refazer o modelo de tópicos), das regras por palavra-chave
+# sobre o Topic_Label. É calculada uma vez no carregamento e fica como coluna
+# categórica do Dim_Topics, pela ordem de MACRO_AREAS. Um valor do ficheiro que
+# não seja uma das MACRO_AREAS (ex.: um erro ao editar) é avisado no log e o
+# tópico fica com a macro-área das regras.
+import logging
+import sys
+
+import pandas as pd
+
+MACRO_AREAS = ["Engenharias & Tec.", "Ciências Exatas & Nat.", "Sociais & Humanas"]
+DEFAULT_MACRO_AREA = "Ciências Exatas & Nat."
+# Regras por ordem de prioridade: a primeira com uma palavra contida no rótulo ganha
+MACRO_AREA_KEYWORDS = [
+    ("Engenharias & Tec.", ['material', 'engineer', 'tech', 'comput', 'mechanic', 'electric', 'civil',
+                            'nano', 'robot', 'data']),
+    ("Sociais & Humanas", ['educa', 'social', 'teach', 'econom', 'manage', 'art', 'histor', 'psycholog',
+                           'lang']),
+]
+
+
+def classify_topic(label):
+    label = str(label).lower()
+    for area, keywords in MACRO_AREA_KEYWORDS:
+        if any(k in label for k in keywords):
+            return area
+    return DEFAULT_MACRO_AREA
+
+
+def topic_macro_areas(topics, mapping=None):
+    # Categórica alinhada com as linhas de 'topics' (Dim_Topics)
+    areas = topics['Topic_Label'].map(classify_topic)
+    if mapping is not None:
+        explicit = topics['Topic_ID'].map(mapping.dropna(subset=['Macro_Area'])
+                                          .set_index('Topic_ID')['Macro_Area'].astype(str).str.strip())
+        unknown = explicit.notna() & ~explicit.isin(MACRO_AREAS)
+        if unknown.any():
+            logging.getLogger(__name__).warning(
+                "Macro_Area desconhecida no Topic_Macro_Areas (tópicos %s: %s); usadas as regras por palavra-chave. "
+                "Valores válidos: %s", topics.loc[unknown, 'Topic_ID'].tolist(),
+                sorted(explicit[unknown].unique()), MACRO_AREAS)
+        areas = explicit.where(explicit.notna() & ~unknown, areas)
+    return pd.Categorical(areas, categories=MACRO_AREAS)
+
+
+if __name__ == '__main__':
+    # Gera o Topic_Macro_Areas.csv a partir das regras (ponto de partida para editar à mão)
+    from data_store import DATA_DIR, read_table
+
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else DATA_DIR
+    topics = read_table('Dim_Topics', data_dir=data_dir)
+    out = pd.DataFrame({'Topic_ID': topics['Topic_ID'], 'Topic_Label': topics['Topic_Label'],
+                        'Macro_Area': topic_macro_areas(topics)})
+    out.to_csv(f'{data_dir}/Topic_Macro_Areas.csv', index=False)
+    print(out.to_string(index=False))
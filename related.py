@@ -0,0 +1,85 @@
+# Artigos relacionados: vizinhos mais próximos nos vetores documento-tópico do NMF
+#
+# O topic_pipeline.py guarda a matriz W do NMF (peso de cada tópico em cada
+# artigo) em doc_topics.npz, em float32, ao lado dos dados; o ingest.py junta-lhe
+# a dos artigos de cada delta. Aqui os vetores ficam com norma 1 e alinhados com
+# as linhas do df_full, numa única matriz contígua. A semelhança de cosseno de um
+# artigo com todos os outros é um produto matriz-vetor feito por blocos de
+# linhas (memória temporária limitada), com os k melhores de cada bloco por
+# argpartition, sem ordenar a coleção inteira.
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_DIR
+
+DOC_TOPICS_FILENAME = 'doc_topics.npz'
+# Nº de artigos relacionados mostrados
+RELATED_K = 10
+# Linhas da matriz multiplicadas de cada vez
+RELATED_BLOCK_ROWS = 65536
+
+
+def doc_topics_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, DOC_TOPICS_FILENAME)
+
+
+def save_doc_topics(path, article_ids, weights):
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, article_ids=np.asarray(article_ids, dtype=np.int32),
+             weights=np.asarray(weights, dtype=np.float32))
+    os.replace(tmp, path)
+
+
+def load_doc_topics(data_dir=DATA_DIR):
+    # (Article_ID, W) ou None se o pipeline de tópicos ainda não gravou a matriz
+    path = doc_topics_path(data_dir)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as arrays:
+        return arrays['article_ids'], arrays['weights']
+
+
+def merge_doc_topics(base, delta):
+    # Vetores do delta substituem os dos mesmos artigos; (ids, W) ou None em cada lado
+    if delta is None:
+        return base
+    if base is None:
+        return delta
+    keep = ~np.isin(base[0], delta[0])
+    return np.concatenate([base[0][keep], delta[0]]), np.concatenate([base[1][keep], delta[1]])
+
+
+class RelatedIndex:
+    # row_article_ids: Article_ID de cada linha do df_full; article_ids / weights: doc_topics.npz
+    def __init__(self, row_article_ids, article_ids, weights):
+        pos = pd.Index(article_ids).get_indexer(np.asarray(row_article_ids))
+        vectors = np.zeros((len(pos), weights.shape[1]), dtype=np.float32)
+        vectors[pos >= 0] = weights[pos[pos >= 0]]
+        norms = np.linalg.norm(vectors, axis=1)
+        self.valid = norms > 0
+        vectors[self.valid] /= norms[self.valid, None]
+        self.vectors = np.ascontiguousarray(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def similar(self, row, k=RELATED_K):
+        # (linhas do df_full, semelhança) dos k artigos mais próximos, por ordem decrescente
+        if not self.valid[row]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = self.vectors[row]
+        cand_rows, cand_scores = [], []
+        for start in range(0, len(self.vectors), RELATED_BLOCK_ROWS):
+            scores = self.vectors[start:start + RELATED_BLOCK_ROWS] @ query
+            if start <= row < start + len(scores):
+                scores[row - start] = -np.inf  # o próprio artigo fica de fora
+            top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+            cand_rows.append(top + start)
+            cand_scores.append(scores[top])
+        rows, scores = np.concatenate(cand_rows), np.concatenate(cand_scores)
+        # Artigos sem vetor (ou sem nenhum tópico em comum) têm semelhança 0 e ficam de fora
+        order = np.argsort(-scores, kind='stable')[:k]
+        order = order[np.isfinite(scores[order]) & (scores[order] > 0)]
+        return rows[order], scores[order]
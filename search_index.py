@@ -0,0 +1,134 @@
+# Índice invertido para a pesquisa do explorador (PESQUISAR)
+#
+# Cada token (minúsculas, sem acentos) aponta para a lista ordenada das linhas
+# do df_full onde aparece: no título, na revista ou no nome de qualquer autor.
+# Uma pesquisa é a interseção (AND) das listas de cada termo, em que cada termo
+# vale como prefixo ("educ" encontra "educação" e "education").
+# O índice é guardado em store/search_index.npz e reaproveitado enquanto os
+# dados não mudarem.
+import hashlib
+import os
+import re
+import secrets
+import unicodedata
+import zipfile
+
+import numpy as np
+
+from data_store import DATA_DIR, store_dir
+
+INDEX_FILENAME = 'search_index.npz'
+# Sobe quando muda o formato ou a ordem das linhas do df_full (invalida os índices guardados)
+INDEX_VERSION = 2
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    # Remove acentos e passa a minúsculas ("Educação" -> "educacao")
+    text = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+class SearchIndex:
+    def __init__(self, vocab, offsets, postings):
+        self.vocab = vocab  # array de tokens ordenado alfabeticamente
+        self.offsets = offsets
+        self.postings = postings
+
+    @classmethod
+    def build(cls, df_full, author_index):
+        token_ids = {}
+        pair_tokens, pair_rows = [], []
+
+        def add(tokens, rows):
+            for tok in tokens:
+                pair_tokens.append(token_ids.setdefault(tok, len(token_ids)))
+                pair_rows.append(rows)
+
+        # Títulos e revistas: tokenizados linha a linha
+        for row, (title, source) in enumerate(zip(df_full['Title'], df_full['Source title'])):
+            add(set(tokenize(title)) | set(tokenize(source)), row)
+
+        # Autores: cada nome é tokenizado uma vez e ligado a todos os seus artigos
+        ptr, articles = author_index.author_ptr, author_index.author_articles
+        for code, name in enumerate(author_index.author_names):
+            rows = articles[ptr[code]:ptr[code + 1]]
+            if len(rows):
+                add(set(tokenize(name)), rows)
+
+        sizes = np.array([np.size(r) for r in pair_rows], dtype=np.int64)
+        tok = np.repeat(np.array(pair_tokens, dtype=np.int64), sizes)
+        rows = np.concatenate([np.atleast_1d(r) for r in pair_rows]).astype(np.int64) if pair_rows else np.empty(0, np.int64)
+
+        # Renumera os tokens por ordem alfabética para permitir pesquisa por prefixo
+        words = np.array(list(token_ids), dtype=object)
+        order = np.argsort(words.astype(str))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        keys = np.unique(rank[tok] * df_full.shape[0] + rows)  # ordena e remove repetidos
+
+        tok_sorted = keys // df_full.shape[0]
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tok_sorted, minlength=len(words)), out=offsets[1:])
+        return cls(words[order].astype(str), offsets, (keys % df_full.shape[0]).astype(np.int32))
+
+    # --- PERSISTÊNCIA ---
+    @staticmethod
+    def _key(fingerprint):
+        return hashlib.sha1(repr((INDEX_VERSION, fingerprint)).encode('utf-8')).hexdigest()
+
+    def save(self, fingerprint, data_dir=DATA_DIR):
+        os.makedirs(store_dir(data_dir), exist_ok=True)
+        path = os.path.join(store_dir(data_dir), INDEX_FILENAME)
+        # Ficheiro temporário próprio: os workers do serve.py podem gravar o índice ao mesmo tempo
+        tmp = f'{path}.tmp-{os.getpid()}-{secrets.token_hex(4)}'
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez(f, vocab=self.vocab, offsets=self.offsets, postings=self.postings,
+                         key=np.array(self._key(fingerprint)))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @classmethod
+    def load_or_build(cls, fingerprint, df_full, author_index, data_dir=DATA_DIR):
+        path = os.path.join(store_dir(data_dir), INDEX_FILENAME)
+        try:
+            with np.load(path) as data:
+                if str(data['key']) == cls._key(fingerprint):
+                    return cls(data['vocab'], data['offsets'], data['postings'])
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            pass  # em falta, truncado ou corrompido: é reconstruído e regravado como um desatualizado
+        index = cls.build(df_full, author_index)
+        try:
+            index.save(fingerprint, data_dir)
+        except OSError:
+            pass  # sem permissão de escrita: o índice fica só em memória
+        return index
+
+    # --- PESQUISA ---
+    def prefix_rows(self, prefix):
+        lo = np.searchsorted(self.vocab, prefix, side='left')
+        hi = np.searchsorted(self.vocab, prefix + '\uffff', side='left')
+        if hi - lo == 1:
+            return self.postings[self.offsets[lo]:self.offsets[hi]]
+        return np.unique(self.postings[self.offsets[lo]:self.offsets[hi]])
+
+    def search(self, query, article_mask=None):
+        # Linhas do df_full que contêm todos os termos da pesquisa (AND)
+        rows = None
+        for term in sorted(set(tokenize(query)), key=len, reverse=True):
+            found = self.prefix_rows(term)
+            rows = found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+            if len(rows) == 0:
+                break
+        if rows is None:
+            rows = np.arange(len(article_mask)) if article_mask is not None else np.empty(0, np.int32)
+        if article_mask is not None:
+            rows = rows[article_mask[rows]]
+        return rows
@@ -0,0 +1,81 @@
+# Arranque do dashboard em modo multi-processo (vários workers por máquina)
+#
+# Uso:  python serve.py --workers 4 [--port 8501] [--data-dir pasta_dos_dados]
+#
+# O processo carregador (este) escreve o segmento partilhado do snapshot ativo
+# (shared_store.py) e arranca N processos `streamlit run app.py` nas portas
+# port, port+1, ..., que mapeiam esse segmento em vez de carregarem cada um a
+# sua cópia dos dados; o balanceador de carga (nginx, HAProxy, ...) distribui as
+# sessões por essas portas (com afinidade de sessão, por causa dos websockets).
+# Depois vigia o snapshots/CURRENT: quando o ingest.py publica uma versão sem
+# segmento, escreve-o (os workers passam a usá-lo no rerun seguinte), e volta a
+# arrancar os workers que terminem.
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from data_store import DATA_DIR, current_data_dir
+from shared_store import SHARED_ENV, ensure_shared
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+# Intervalo (s) entre verificações do snapshot ativo e dos workers
+POLL_SECONDS = 5
+
+
+def start_worker(port, data_dir, streamlit_args):
+    env = dict(os.environ, **{SHARED_ENV: '1', 'OBSERVATORIO_DATA_DIR': data_dir})
+    cmd = [sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.port', str(port),
+           '--server.headless', 'true', *streamlit_args]
+    return subprocess.Popen(cmd, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard com vários workers e dados partilhados")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--port', type=int, default=8501, help="porta do primeiro worker")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('streamlit_args', nargs=argparse.REMAINDER,
+                        help="opções passadas a cada `streamlit run` (depois de --)")
+    args = parser.parse_args()
+    data_dir = os.path.abspath(args.data_dir)
+    streamlit_args = [a for a in args.streamlit_args if a != '--']
+
+    ensure_shared(current_data_dir(data_dir))
+    ports = [args.port + i for i in range(args.workers)]
+    workers = {port: start_worker(port, data_dir, streamlit_args) for port in ports}
+    print(f"{len(workers)} workers nas portas {ports[0]}-{ports[-1]}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while not stopping:
+            time.sleep(POLL_SECONDS)
+            try:
+                ensure_shared(current_data_dir(data_dir))
+            except Exception as e:  # um snapshot com problemas não deita abaixo os workers
+                print(f"erro ao escrever o segmento partilhado: {e}", file=sys.stderr)
+            for port, proc in workers.items():
+                if proc.poll() is not None and not stopping:
+                    print(f"worker da porta {port} terminou ({proc.returncode}); a reiniciar", file=sys.stderr)
+                    workers[port] = start_worker(port, data_dir, streamlit_args)
+    finally:
+        for proc in workers.values():
+            proc.terminate()
+        for proc in workers.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == '__main__':
+    main()
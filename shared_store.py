@@ -0,0 +1,148 @@
+# Segmento de dados partilhado entre processos (modo multi-processo, ver serve.py)
+#
+# Uso:  python shared_store.py [pasta_dos_dados]
+#
+# Cada processo do Streamlit que chama load_dataset() monta as suas próprias
+# cópias pandas das tabelas, e as colunas de texto (títulos, autores, revistas,
+# descrições) são a maior parte da memória. Aqui um processo carregador monta
+# as tabelas já derivadas (df_full com tópicos e autores, cubo, ...) uma única
+# vez e grava-as em ficheiros Arrow IPC sem compressão, em store/shared/.
+# Os workers abrem-nos com memory mapping: as colunas numéricas e de texto
+# apontam diretamente para as páginas do ficheiro, que o sistema operativo
+# partilha entre todos os processos (o texto fica como array Arrow, sem um
+# objeto Python por célula).
+#
+# Cada snapshot do ingest.py traz o seu segmento, escrito antes da troca do
+# snapshots/CURRENT; a troca de versão continua a ser essa. O manifest.json
+# guarda o data_fingerprint de origem: um segmento desatualizado é ignorado.
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+from data_store import DATA_DIR, current_data_dir, data_fingerprint, store_dir
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # sem pyarrow não há segmento partilhado (cada processo carrega os seus dados)
+    pa = ipc = None
+
+SHARED_DIRNAME = 'shared'
+SHARED_MANIFEST = 'manifest.json'
+# Sobe quando muda o conteúdo do segmento (invalida os segmentos escritos antes)
+SHARED_VERSION = 1
+# Variável de ambiente que liga o modo partilhado no app.py (o serve.py define-a)
+SHARED_ENV = 'OBSERVATORIO_SHARED_DATA'
+
+# Tabelas devolvidas pelo load_dataset(), pela mesma ordem
+DATASET_PARTS = ['df_full', 'topics', 'geo', 'authors', 'bridge_authors', 'timeline', 'terms', 'cube']
+
+
+def shared_dir(data_dir=DATA_DIR):
+    return os.path.join(store_dir(data_dir), SHARED_DIRNAME)
+
+
+def shared_enabled():
+    return os.environ.get(SHARED_ENV, '') not in ('', '0')
+
+
+def _types_mapper():
+    # Texto como ArrowStringArray sobre o próprio buffer mapeado: é o 'str' por omissão no
+    # pandas 3; no pandas 2 pede-se explicitamente (mesma semântica de NaN)
+    if isinstance(pd.Series(['']).dtype, pd.StringDtype):
+        return None
+    dtype = pd.StringDtype('pyarrow_numpy')
+    return {pa.string(): dtype, pa.large_string(): dtype}.get
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, SHARED_MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _fingerprint_json(fingerprint):
+    # Tuplos passam a listas no JSON: compara-se sempre a forma serializada
+    return json.loads(json.dumps(fingerprint))
+
+
+def is_current(data_dir=DATA_DIR, fingerprint=None):
+    manifest = _read_manifest(shared_dir(data_dir))
+    fingerprint = data_fingerprint(data_dir) if fingerprint is None else fingerprint
+    return (manifest is not None and manifest.get('version') == SHARED_VERSION
+            and manifest.get('fingerprint') == _fingerprint_json(fingerprint))
+
+
+# --- CARREGADOR ---
+def write_shared(data_dir=DATA_DIR, data=None, fingerprint=None):
+    # data/fingerprint: resultado do load_dataset() e data_fingerprint() já calculados (ingest.py)
+    if pa is None:
+        raise RuntimeError("O segmento partilhado requer o pacote 'pyarrow'.")
+    from dataset import load_dataset
+
+    t0 = time.perf_counter()
+    if data is None:
+        # Fingerprint lido antes dos dados: se mudarem entretanto, o segmento nasce já desatualizado
+        fingerprint = data_fingerprint(data_dir)
+        data = load_dataset(data_dir)
+    final_dir = shared_dir(data_dir)
+    tmp_dir = f'{final_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    rows = {}
+    for name, df in zip(DATASET_PARTS, data):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(os.path.join(tmp_dir, name + '.arrow'), 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        rows[name] = table.num_rows
+    with open(os.path.join(tmp_dir, SHARED_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({'version': SHARED_VERSION, 'fingerprint': _fingerprint_json(fingerprint),
+                   'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'rows': rows}, f, indent=2)
+
+    # Troca da pasta: os workers que ainda tenham o segmento antigo mapeado continuam
+    # a lê-lo (os ficheiros apagados só desaparecem quando deixam de estar abertos)
+    old_dir = f'{final_dir}.old-{os.getpid()}'
+    if os.path.isdir(final_dir):
+        os.rename(final_dir, old_dir)
+    os.rename(tmp_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    size = sum(os.path.getsize(os.path.join(final_dir, n + '.arrow')) for n in DATASET_PARTS)
+    print(f"segmento partilhado -> {final_dir} ({size / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+    return final_dir
+
+
+def ensure_shared(data_dir=DATA_DIR):
+    # Escreve o segmento só se faltar ou estiver desatualizado; devolve True se o escreveu
+    if is_current(data_dir):
+        return False
+    write_shared(data_dir)
+    return True
+
+
+# --- WORKERS ---
+def attach_shared(data_dir=DATA_DIR, fingerprint=None):
+    # Mesmas tabelas do load_dataset(), mapeadas do segmento sem cópia (só de leitura).
+    # FileNotFoundError se não houver um segmento em dia para estes dados.
+    if pa is None:
+        raise FileNotFoundError("pyarrow não está instalado")
+    path = shared_dir(data_dir)
+    if not is_current(data_dir, fingerprint):
+        raise FileNotFoundError(f"Segmento partilhado em falta ou desatualizado em {path}")
+    mapper = _types_mapper()
+    frames = []
+    for name in DATASET_PARTS:
+        table = ipc.open_file(pa.memory_map(os.path.join(path, name + '.arrow'))).read_all()
+        # split_blocks: cada coluna numérica sem nulos fica a apontar para o buffer (sem consolidação)
+        frames.append(table.to_pandas(split_blocks=True, types_mapper=mapper))
+    return tuple(frames)
+
+
+if __name__ == '__main__':
+    write_shared(current_data_dir(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR))
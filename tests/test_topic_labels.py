@@ -0,0 +1,122 @@
+# Rótulos dos tópicos contra o servidor de teste (topic_labels.stub_server)
+import asyncio
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import topic_labels
+from topic_labels import LabelError, StubOllamaHandler, label_topics, request_label, stub_server
+
+TERMS = {
+    0: ['ocean', 'wave', 'coastal', 'sediment'],
+    1: ['protein', 'cell', 'expression', 'gene'],
+    2: ['graphene', 'film', 'thermal', 'oxide'],
+}
+
+
+class CountingHandler(StubOllamaHandler):
+    # Conta os pedidos; os primeiros `fail` respondem 503 e os primeiros `slow` demoram `delay` s
+    requests = 0
+    fail = 0
+    slow = 0
+    delay = 0.0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests += 1
+            n = cls.requests
+        if n <= cls.slow:
+            time.sleep(cls.delay)
+        if n <= cls.fail:
+            self.send_error(503)
+            return
+        super().do_POST()
+
+
+@pytest.fixture
+def handler():
+    class Handler(CountingHandler):
+        pass
+    return Handler
+
+
+@pytest.fixture
+def endpoint(handler):
+    server = stub_server(port=0)
+    server.RequestHandlerClass = handler
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    rows = [(t, rank, term, 1.0 / rank) for t, terms in TERMS.items() for rank, term in enumerate(terms, 1)]
+    pd.DataFrame(rows, columns=['Topic_ID', 'rank', 'term', 'weight']).to_csv(
+        tmp_path / 'top_terms_per_topic.csv', index=False)
+    pd.DataFrame({'Topic_ID': list(TERMS), 'Topic_Label': ['Antigo'] * len(TERMS),
+                  'Description': [''] * len(TERMS), 'Top_Terms': [', '.join(t) for t in TERMS.values()],
+                  'Trend_Status': ['⚖️ Stable'] * len(TERMS)}).to_csv(tmp_path / 'Dim_Topics.csv', index=False)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(topic_labels, 'LABEL_BACKOFF', 0.01)
+
+
+def read_labels(data_dir):
+    table = pd.read_csv(os.path.join(data_dir, 'Dim_Topics.csv'), keep_default_na=False)
+    return dict(zip(table['Topic_ID'], table['Topic_Label'])), dict(zip(table['Topic_ID'], table['Description']))
+
+
+def test_labels_written_to_dim_topics(data_dir, endpoint, handler):
+    labels = label_topics(str(data_dir), endpoint=endpoint, rebuild=False)
+
+    assert set(labels) == set(TERMS)
+    written, descriptions = read_labels(data_dir)
+    assert written == {0: 'Ocean Wave Coastal', 1: 'Protein Cell Expression', 2: 'Graphene Film Thermal'}
+    assert all(d.startswith('Research on ') for d in descriptions.values())
+    assert handler.requests == len(TERMS)
+
+
+def test_second_run_hits_cache(data_dir, endpoint, handler):
+    label_topics(str(data_dir), endpoint=endpoint, rebuild=False)
+    assert handler.requests == len(TERMS)
+    assert len(os.listdir(data_dir / topic_labels.LABEL_CACHE_DIRNAME)) == len(TERMS)
+
+    handler.requests = 0
+    labels = label_topics(str(data_dir), endpoint=endpoint, rebuild=False)
+
+    assert handler.requests == 0
+    assert set(labels) == set(TERMS)
+
+
+def test_transient_5xx_is_retried(data_dir, endpoint, handler):
+    handler.fail = 1
+    labels = label_topics(str(data_dir), endpoint=endpoint, concurrency=1, rebuild=False)
+
+    assert set(labels) == set(TERMS)
+    assert handler.requests == len(TERMS) + 1
+
+
+def test_timeout_is_retried(endpoint, handler):
+    handler.slow, handler.delay = 1, 1.0
+    label = asyncio.run(request_label(endpoint, 'stub', TERMS[0], timeout=0.2))
+
+    assert label['label'] == 'Ocean Wave Coastal'
+    assert handler.requests == 2
+
+
+def test_gives_up_after_retries(endpoint, handler):
+    handler.fail = 10
+    with pytest.raises(LabelError):
+        asyncio.run(request_label(endpoint, 'stub', TERMS[0], retries=2))
+    assert handler.requests == 2
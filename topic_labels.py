@@ -0,0 +1,238 @@
+# Rótulos e descrições dos tópicos (Dim_Topics) gerados por um LLM via Ollama
+#
+# Uso:  python topic_labels.py [--data-dir pasta_dos_csv] [--endpoint http://localhost:11434]
+#                              [--model llama3] [--concurrency 4] [--force]
+#       python topic_labels.py --stub-server [--port 11435]
+#
+# Os termos principais de cada tópico (top_terms_per_topic.csv) vão para o
+# endpoint /api/generate de um servidor compatível com o Ollama, com um número
+# limitado de pedidos em simultâneo (asyncio), timeout e novas tentativas com
+# espera crescente. Cada resposta fica numa cache endereçada pelo conteúdo
+# (label_cache/<hash>.json, com o hash do modelo, do prompt e dos termos): um
+# tópico cujos termos não mudaram nunca volta a ser pedido, mesmo depois de um
+# refit que lhe mude o Topic_ID. No fim, o Topic_Label e o Description do
+# Dim_Topics.csv (e o Topic_Label do Topic_Macro_Areas.csv) são atualizados.
+#
+# --stub-server arranca um servidor local com a mesma API e respostas
+# determinísticas (a partir dos termos), para testar o pipeline sem o Ollama.
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from data_store import DATA_DIR, TABLES, build_store, read_csv_table
+
+OLLAMA_ENDPOINT = 'http://localhost:11434'
+LABEL_MODEL = 'llama3'
+LABEL_CACHE_DIRNAME = 'label_cache'
+# Pedidos em simultâneo ao servidor, timeout de cada pedido (s) e nº de tentativas
+LABEL_CONCURRENCY = 4
+LABEL_TIMEOUT = 120
+LABEL_RETRIES = 3
+# Espera antes da tentativa n (s): LABEL_BACKOFF * 2 ** n
+LABEL_BACKOFF = 1.0
+# Termos de cada tópico enviados no prompt
+PROMPT_TERMS = 15
+STUB_PORT = 11435
+
+PROMPT_TEMPLATE = (
+    "You are labelling the topics of a topic model built from the titles and abstracts of "
+    "scientific articles from the University of Aveiro.\n"
+    "Top terms of the topic, most important first: {terms}\n"
+    "Reply only with a JSON object with two keys: \"label\", a short title for the research "
+    "topic (2 to 5 words), and \"description\", one or two sentences describing it."
+)
+
+
+class LabelError(Exception):
+    pass
+
+
+def topic_terms(df_terms, n=PROMPT_TERMS):
+    # Topic_ID -> lista dos n primeiros termos, por rank
+    ordered = df_terms.sort_values(['Topic_ID', 'rank'], kind='stable')
+    return {int(t): list(g['term'].head(n)) for t, g in ordered.groupby('Topic_ID', sort=True)}
+
+
+def cache_key(model, terms):
+    payload = json.dumps({'model': model, 'prompt': PROMPT_TEMPLATE, 'terms': terms}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LabelCache:
+    # Um ficheiro JSON por resposta, com o hash no nome (escrita atómica)
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._file(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, value):
+        tmp = self._file(key) + f'.tmp-{os.getpid()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(value, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self._file(key))
+
+
+# --- CLIENTE ---
+def parse_label(text):
+    # Resposta do modelo -> {'label', 'description'}; LabelError se não vier no formato pedido
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # Alguns modelos embrulham o JSON em texto: fica o primeiro objeto {...}
+        start, end = text.find('{'), text.rfind('}')
+        try:
+            data = json.loads(text[start:end + 1]) if start >= 0 else None
+        except ValueError:
+            data = None
+    if not isinstance(data, dict) or not str(data.get('label', '')).strip():
+        raise LabelError(f"resposta sem rótulo: {text[:200]!r}")
+    return {'label': str(data['label']).strip(), 'description': str(data.get('description', '')).strip()}
+
+
+def _post(url, body, timeout):
+    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+async def request_label(endpoint, model, terms, timeout=LABEL_TIMEOUT, retries=LABEL_RETRIES):
+    body = {'model': model, 'prompt': PROMPT_TEMPLATE.format(terms=', '.join(terms)),
+            'format': 'json', 'stream': False, 'options': {'temperature': 0}}
+    url = endpoint.rstrip('/') + '/api/generate'
+    for attempt in range(retries):
+        try:
+            # urllib é bloqueante: cada pedido corre numa thread, com o timeout também do lado do asyncio
+            reply = await asyncio.wait_for(asyncio.to_thread(_post, url, body, timeout), timeout + 5)
+            return parse_label(reply.get('response', ''))
+        except urllib.error.HTTPError as e:
+            error = e
+            if e.code < 500 and e.code != 429:  # erro do pedido (ex.: modelo inexistente): não se repete
+                break
+        except (urllib.error.URLError, OSError, asyncio.TimeoutError, ValueError, LabelError) as e:
+            error = e
+        if attempt + 1 < retries:
+            await asyncio.sleep(LABEL_BACKOFF * 2 ** attempt)
+    raise LabelError(f"{url}: {error}")
+
+
+async def label_all(terms_by_topic, endpoint, model, cache, concurrency=LABEL_CONCURRENCY, force=False):
+    # Topic_ID -> rótulo; pede só o que não está na cache (tópicos com os mesmos termos partilham o pedido)
+    keys = {t: cache_key(model, terms) for t, terms in terms_by_topic.items()}
+    results = {} if force else {k: cache.get(k) for k in set(keys.values())}
+    missing = {k: terms_by_topic[t] for t, k in keys.items() if results.get(k) is None}
+    semaphore = asyncio.Semaphore(concurrency)
+    # Uma thread por pedido em curso (o executor por omissão pode ter menos)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(concurrency))
+
+    async def one(key, terms):
+        async with semaphore:
+            label = await request_label(endpoint, model, terms)
+        cache.put(key, {**label, 'model': model, 'terms': terms, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')})
+        results[key] = label
+
+    outcomes = await asyncio.gather(*(one(k, terms) for k, terms in missing.items()), return_exceptions=True)
+    failed = [o for o in outcomes if isinstance(o, Exception)]
+    return {t: results[k] for t, k in keys.items() if results.get(k) is not None}, len(missing), failed
+
+
+def label_topics(data_dir=DATA_DIR, endpoint=OLLAMA_ENDPOINT, model=LABEL_MODEL, concurrency=LABEL_CONCURRENCY,
+                 force=False, rebuild=True):
+    t0 = time.perf_counter()
+    terms_by_topic = topic_terms(read_csv_table('top_terms_per_topic', data_dir=data_dir))
+    cache = LabelCache(os.path.join(data_dir, LABEL_CACHE_DIRNAME))
+    labels, requested, failed = asyncio.run(label_all(terms_by_topic, endpoint, model, cache, concurrency, force))
+    print(f"{len(labels)}/{len(terms_by_topic)} tópicos com rótulo ({requested} pedidos ao modelo, "
+          f"{len(failed)} falhados, {time.perf_counter() - t0:.1f}s)")
+    for e in failed[:5]:
+        print(f"  {e}")
+    if not labels:
+        return labels
+
+    # Dim_Topics e Topic_Macro_Areas: só as colunas de texto dos tópicos com rótulo mudam
+    for name, columns in (('Dim_Topics', {'label': 'Topic_Label', 'description': 'Description'}),
+                          ('Topic_Macro_Areas', {'label': 'Topic_Label'})):
+        path = os.path.join(data_dir, TABLES[name]['csv'])
+        if not os.path.exists(path):
+            continue
+        table = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        topic_ids = pd.to_numeric(table['Topic_ID'])
+        for key, col in columns.items():
+            new = topic_ids.map({t: v[key] for t, v in labels.items()})
+            table[col] = new.where(new.notna(), table[col])
+        table.to_csv(path + '.tmp', index=False, encoding='utf-8')
+        os.replace(path + '.tmp', path)
+    if rebuild:
+        try:
+            build_store(data_dir)
+        except RuntimeError as e:  # sem pyarrow o dashboard lê os CSV
+            print(e)
+    return labels
+
+
+# --- SERVIDOR DE TESTE ---
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    # /api/generate com o rótulo feito dos três primeiros termos do prompt (sem LLM)
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        line = next((l for l in body.get('prompt', '').splitlines() if l.startswith('Top terms')), '')
+        terms = [t.strip() for t in line.split(':', 1)[-1].split(',') if t.strip()]
+        answer = {'label': ' '.join(t.title() for t in terms[:3]) or 'Unknown Topic',
+                  'description': f"Research on {', '.join(terms[:5])}."}
+        reply = json.dumps({'model': body.get('model'), 'response': json.dumps(answer), 'done': True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def stub_server(port=STUB_PORT):
+    # Servidor de teste (ThreadingHTTPServer): serve_forever() numa thread ou no processo
+    return ThreadingHTTPServer(('127.0.0.1', port), StubOllamaHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rótulos dos tópicos por um LLM (API do Ollama)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--endpoint', default=OLLAMA_ENDPOINT)
+    parser.add_argument('--model', default=LABEL_MODEL)
+    parser.add_argument('--concurrency', type=int, default=LABEL_CONCURRENCY)
+    parser.add_argument('--force', action='store_true', help="ignora a cache e volta a pedir todos os rótulos")
+    parser.add_argument('--stub-server', action='store_true', help="arranca o servidor de teste")
+    parser.add_argument('--port', type=int, default=STUB_PORT)
+    args = parser.parse_args()
+
+    if args.stub_server:
+        print(f"servidor de teste em http://127.0.0.1:{args.port}")
+        stub_server(args.port).serve_forever()
+    else:
+        label_topics(args.data_dir, args.endpoint, args.model, args.concurrency, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+# Pipeline de tópicos: TF-IDF + NMF sobre títulos e resumos (offline, fora do dashboard)
+#
+# Uso:  python topic_pipeline.py fit [--data-dir pasta_dos_csv] [--topics 10] [--seed 42] [--jobs 4] [--label]
+#                                    [--overwrite-labels]
+#       python topic_pipeline.py assign pasta_do_delta [--data-dir pasta_dos_csv]
+#
+# fit: lê o Fact_Articles.csv em blocos e monta a matriz TF-IDF esparsa em duas
+# passagens (vocabulário e frequências de documento; depois as contagens de cada
+# bloco com o vocabulário já fixo), sem ter o texto todo em memória. O NMF é
+# ajustado com várias inicializações em paralelo (uma por processo) e fica a de
+# menor erro de reconstrução; com a mesma semente e o mesmo nº de inicializações
+# o resultado é o mesmo, seja qual for o nº de processos. Escreve o Topic_ID no
+# Fact_Articles.csv, o Dim_Topics.csv (rótulos provisórios a partir dos termos,
+# ou do LLM com --label, ver topic_labels.py),
+# o top_terms_per_topic.csv, o Topic_Macro_Areas.csv, os agregados por tópico
+# e o modelo congelado em topic_model/, e refaz o store/ (data_store.build_store).
+# Um tópico do refit cujos termos principais coincidem com os de um tópico do
+# Dim_Topics.csv anterior (emparelhamento um-para-um pelo Jaccard) herda o seu
+# Topic_Label, Description e Macro_Area, mesmo com outro Topic_ID; só com
+# --overwrite-labels todos os tópicos voltam aos rótulos provisórios.
+# A matriz documento-tópico (W) fica em doc_topics.npz, para os artigos relacionados.
+#
+# assign: projeta os artigos novos de um delta do ingest.py no modelo
+# congelado (só o TF-IDF com o vocabulário e idf guardados e a resolução de W
+# com H fixo), e escreve o Topic_ID no Fact_Articles.csv do delta (e W no seu
+# doc_topics.npz). O ingest.py faz isto sozinho quando o delta não traz
+# Topic_ID. Um refit muda o significado dos Topic_ID: os snapshots do
+# ingest.py anteriores ficam com os antigos, e o ingest.py recusa juntar um
+# delta a um snapshot de outro modelo (model_id no topic_model/model.json e no
+# manifest de cada snapshot).
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.decomposition import NMF, non_negative_factorization
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+from sklearn.preprocessing import normalize
+from threadpoolctl import threadpool_limits
+
+from data_store import (DATA_DIR, SNAPSHOTS_DIRNAME, TABLES, TOPIC_MODEL_ARRAYS, TOPIC_MODEL_DIRNAME,
+                        TOPIC_MODEL_MANIFEST, build_store, file_digest, read_csv_table)
+from related import doc_topics_path, save_doc_topics
+
+MODEL_DIRNAME = TOPIC_MODEL_DIRNAME
+MODEL_ARRAYS = TOPIC_MODEL_ARRAYS
+MODEL_MANIFEST = TOPIC_MODEL_MANIFEST
+
+# Colunas de texto do export do Scopus usadas (as que existirem no Fact_Articles)
+TEXT_COLUMNS = ['Title', 'Abstract', 'Author Keywords', 'Index Keywords']
+# Linhas do CSV lidas de cada vez
+CHUNK_ROWS = 20000
+
+PORTUGUESE_STOP_WORDS = frozenset("""
+a ao aos as até com como da das de dela dele do dos e em entre era essa esse esta este foi for
+foram há isso isto já la lhe mais mas me mesmo muito na nas nem no nos num numa o os ou para
+pela pelas pelo pelos por qual quando que se sem ser seu seus sua suas são também te tem um
+uma umas uns à às é estudo estudos resultados análise
+""".split())
+# Vocabulário: unigramas e bigramas só com letras; termos em menos de MIN_DF
+# documentos ou em mais de MAX_DF da coleção ficam de fora
+VECTORIZER_PARAMS = dict(lowercase=True, ngram_range=(1, 2), token_pattern=r'(?u)\b[^\W\d_]{2,}\b',
+                         stop_words=sorted(ENGLISH_STOP_WORDS | PORTUGUESE_STOP_WORDS))
+MIN_DF = 2
+MAX_DF = 0.95
+MAX_FEATURES = 20000
+
+N_TOPICS = 10
+# Inicializações do NMF (nndsvdar com sementes seed, seed+1, ...), ajustadas em paralelo
+N_RESTARTS = 4
+NMF_PARAMS = dict(solver='cd', beta_loss='frobenius', tol=1e-4, max_iter=400)
+# Termos guardados por tópico (top_terms_per_topic) e mostrados no Dim_Topics
+TOP_TERMS = 20
+LABEL_TERMS = 15
+# Semelhança mínima (Jaccard dos termos do Dim_Topics) para um tópico do refit herdar o rótulo anterior
+LABEL_MATCH_MIN = 0.5
+
+# Trend_Status do Dim_Topics a partir da classificação do trends.py (no período todo)
+TREND_STATUS = {'Emergente': '🔥 Hot / Emerging', 'Em alta': '🔥 Hot / Emerging',
+                'Estável': '⚖️ Stable', 'Em declínio': '📉 Declining'}
+
+
+def model_dir(data_dir=DATA_DIR):
+    return os.path.join(data_dir, MODEL_DIRNAME)
+
+
+def _articles_path(data_dir):
+    return os.path.join(data_dir, TABLES['Fact_Articles']['csv'])
+
+
+def _text_chunks(path, chunk_rows=CHUNK_ROWS):
+    # Texto de cada artigo (colunas de TEXT_COLUMNS juntas), bloco a bloco
+    header = pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns
+    columns = [c for c in TEXT_COLUMNS if c in header]
+    if not columns:
+        raise ValueError(f"{path} não tem nenhuma das colunas de texto {TEXT_COLUMNS}")
+    for chunk in pd.read_csv(path, usecols=columns, dtype=str, keep_default_na=False,
+                             encoding='utf-8-sig', chunksize=chunk_rows):
+        yield chunk[columns].agg('. '.join, axis=1).tolist()
+
+
+# --- TF-IDF ---
+def document_frequencies(path):
+    # 1.ª passagem: nº de documentos com cada termo
+    df, n_docs = Counter(), 0
+    for texts in _text_chunks(path):
+        vectorizer = CountVectorizer(binary=True, **VECTORIZER_PARAMS)
+        n_docs += len(texts)
+        try:
+            counts = vectorizer.fit_transform(texts)
+        except ValueError:  # bloco sem nenhum termo
+            continue
+        df.update(dict(zip(vectorizer.get_feature_names_out(), counts.sum(axis=0).A1.tolist())))
+    return df, n_docs
+
+
+def select_vocabulary(df, n_docs):
+    # Os MAX_FEATURES termos mais frequentes dentro dos limites (empates pelo termo); ordem alfabética
+    kept = [(-n, term) for term, n in df.items() if MIN_DF <= n <= MAX_DF * n_docs]
+    kept = sorted(kept)[:MAX_FEATURES]
+    vocabulary = np.array(sorted(term for _, term in kept))
+    # idf suavizado, como o TfidfTransformer do scikit-learn
+    idf = np.log((1 + n_docs) / (1 + np.array([df[t] for t in vocabulary], dtype=np.float64))) + 1
+    return vocabulary, idf
+
+
+def tfidf(texts, vocabulary, idf):
+    # TF-IDF normalizado (L2) com vocabulário e idf fixos
+    vectorizer = CountVectorizer(vocabulary=vocabulary, **VECTORIZER_PARAMS)
+    counts = vectorizer.transform(texts).astype(np.float64)
+    return normalize(counts @ sp.diags(idf), norm='l2', copy=False).tocsr()
+
+
+def tfidf_matrix(path, vocabulary, idf):
+    # 2.ª passagem: blocos já no vocabulário final, empilhados numa matriz esparsa
+    return sp.vstack([tfidf(texts, vocabulary, idf) for texts in _text_chunks(path)], format='csr')
+
+
+# --- NMF ---
+def _fit_once(X, n_topics, seed):
+    # Um processo por inicialização: o BLAS fica com uma thread para não disputar os núcleos
+    with threadpool_limits(1):
+        model = NMF(n_components=n_topics, init='nndsvdar', random_state=seed, **NMF_PARAMS)
+        W = model.fit_transform(X)
+    return model.reconstruction_err_, seed, W, model.components_
+
+
+def fit_nmf(X, n_topics=N_TOPICS, seed=42, restarts=N_RESTARTS, jobs=None):
+    jobs = jobs or min(restarts, os.cpu_count() or 1)
+    fits = Parallel(n_jobs=jobs)(delayed(_fit_once)(X, n_topics, seed + i) for i in range(restarts))
+    # Menor erro; empates pela semente, para não depender da ordem de chegada
+    err, best_seed, W, H = min(fits, key=lambda f: (f[0], f[1]))
+    return W, H, err, best_seed
+
+
+def assign_rows(W):
+    # Tópico de maior peso; artigos sem nenhum termo do vocabulário vão para o tópico mais frequente
+    topic_ids = W.argmax(axis=1)
+    empty = W.max(axis=1) <= 0
+    if empty.any() and (~empty).any():
+        topic_ids[empty] = np.bincount(topic_ids[~empty], minlength=W.shape[1]).argmax()
+    return topic_ids.astype(np.int16), int(empty.sum())
+
+
+# --- MODELO CONGELADO ---
+def save_model(data_dir, vocabulary, idf, H, manifest):
+    path = model_dir(data_dir)
+    os.makedirs(path, exist_ok=True)
+    np.savez(os.path.join(path, MODEL_ARRAYS + '.tmp.npz'), vocabulary=vocabulary, idf=idf, components=H)
+    os.replace(os.path.join(path, MODEL_ARRAYS + '.tmp.npz'), os.path.join(path, MODEL_ARRAYS))
+    # model_id: muda a cada fit; o ingest.py recusa juntar deltas a snapshots de outro modelo
+    manifest = {'model_id': file_digest(os.path.join(path, MODEL_ARRAYS)), **manifest}
+    with open(os.path.join(path, MODEL_MANIFEST) + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(os.path.join(path, MODEL_MANIFEST) + '.tmp', os.path.join(path, MODEL_MANIFEST))
+
+
+def load_model(data_dir=DATA_DIR):
+    path = os.path.join(model_dir(data_dir), MODEL_ARRAYS)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Modelo de tópicos não encontrado em {model_dir(data_dir)} "
+                                f"(corra primeiro: python topic_pipeline.py fit)")
+    with np.load(path, allow_pickle=False) as arrays:
+        return arrays['vocabulary'], arrays['idf'], arrays['components']
+
+
+def project(texts, vocabulary, idf, H):
+    # W dos documentos novos com H congelado (o mesmo problema do fit, só nas linhas novas)
+    X = tfidf(texts, vocabulary, idf)
+    W, _, _ = non_negative_factorization(X, H=H, n_components=H.shape[0], init='custom', update_H=False,
+                                         **NMF_PARAMS)
+    return W
+
+
+# --- ARTEFACTOS DO DASHBOARD ---
+def top_terms(H, vocabulary, n=TOP_TERMS):
+    order = np.argsort(-H, axis=1, kind='stable')[:, :n]
+    return pd.DataFrame({
+        'Topic_ID': np.repeat(np.arange(H.shape[0]), n),
+        'rank': np.tile(np.arange(1, n + 1), H.shape[0]),
+        'term': vocabulary[order].ravel(),
+        'weight': np.take_along_axis(H, order, axis=1).ravel(),
+    })
+
+
+def previous_topics(data_dir):
+    # (Dim_Topics, Topic_Macro_Areas) em vigor antes do refit, como texto; None se ainda não existem
+    tables = []
+    for name in ('Dim_Topics', 'Topic_Macro_Areas'):
+        path = os.path.join(data_dir, TABLES[name]['csv'])
+        if not os.path.exists(path):
+            tables.append(None)
+            continue
+        table = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        table['Topic_ID'] = pd.to_numeric(table['Topic_ID'])
+        tables.append(table)
+    return tuple(tables) if tables[0] is not None and 'Top_Terms' in tables[0] else None
+
+
+def match_topics(new_terms, old_terms, min_similarity=LABEL_MATCH_MIN):
+    # {Topic_ID novo: Topic_ID anterior}: emparelhamento um-para-um de maior Jaccard entre os termos
+    from scipy.optimize import linear_sum_assignment
+
+    if not new_terms or not old_terms:
+        return {}
+    new_ids, old_ids = list(new_terms), list(old_terms)
+    sim = np.array([[len(a & b) / len(a | b) if a | b else 0.0 for b in old_terms.values()]
+                    for a in new_terms.values()])
+    rows, cols = linear_sum_assignment(-sim)
+    return {new_ids[r]: old_ids[c] for r, c in zip(rows, cols) if sim[r, c] >= min_similarity}
+
+
+def topic_table(terms, articles, previous=None):
+    # Dim_Topics com rótulos provisórios (as três palavras principais) e Description vazio, salvo
+    # nos tópicos que correspondem a um dos anteriores (previous_topics), que mantêm os seus
+    from macro_areas import topic_macro_areas
+    from trends import detect_trends
+
+    by_topic = terms.groupby('Topic_ID', sort=True)['term']
+    topics = pd.DataFrame({
+        'Topic_ID': by_topic.size().index,
+        'Topic_Label': by_topic.apply(lambda t: ' / '.join(t[~t.str.contains(' ')].head(3).str.title())).to_numpy(),
+        'Description': '',
+        'Top_Terms': by_topic.apply(lambda t: ', '.join(t.head(LABEL_TERMS))).to_numpy(),
+    })
+    mapping = None
+    if previous is not None:
+        old_topics, old_macro = previous
+        match = match_topics({t: set(s.split(', ')) for t, s in zip(topics['Topic_ID'], topics['Top_Terms'])},
+                             {t: set(s.split(', ')) for t, s in zip(old_topics['Topic_ID'], old_topics['Top_Terms'])})
+        old_ids = topics['Topic_ID'].map(match)
+        kept = old_ids.notna()
+        old = old_topics.set_index('Topic_ID')
+        for col in ('Topic_Label', 'Description'):
+            topics.loc[kept, col] = old.loc[old_ids[kept], col].to_numpy()
+        if old_macro is not None:
+            areas = old_ids.map(old_macro.set_index('Topic_ID')['Macro_Area'])
+            mapping = pd.DataFrame({'Topic_ID': topics['Topic_ID'], 'Macro_Area': areas}).dropna()
+        print(f"{int(kept.sum())}/{len(topics)} tópicos mantêm o rótulo e a descrição anteriores")
+    year_topic = articles.groupby(['Year', 'Topic_ID']).size().rename('Volume').reset_index()
+    report = detect_trends(year_topic, topics['Topic_ID'], (articles['Year'].min(), articles['Year'].max()))
+    status = report.table['Tendência'].astype(str).map(TREND_STATUS) if not report.table.empty else None
+    topics['Trend_Status'] = status.to_numpy() if status is not None else TREND_STATUS['Estável']
+    macro = pd.DataFrame({'Topic_ID': topics['Topic_ID'], 'Topic_Label': topics['Topic_Label'],
+                          'Macro_Area': topic_macro_areas(topics, mapping)})
+    return topics, macro
+
+
+def aggregate_tables(articles):
+    # Mesmos agregados que o ingest.py mantém: ficheiro -> tabela
+    from ingest import AGGREGATES
+
+    tables = {TABLES['Agg_Timeline']['csv']:
+              articles.groupby(['Year', 'Topic_ID'], sort=True).size().rename('Article_Count').reset_index()}
+    for filename, (keys, count_col) in AGGREGATES.items():
+        table = articles.groupby(keys, sort=True, observed=True).size().rename(count_col).reset_index()
+        if filename == 'topic_counts.csv':
+            table = table.sort_values(count_col, ascending=False, kind='stable')
+        tables[filename] = table
+    return tables
+
+
+def _write_csv(df, path):
+    df.to_csv(path + '.tmp', index=False, encoding='utf-8')
+    os.replace(path + '.tmp', path)
+
+
+def _article_ids(path):
+    return pd.read_csv(path, usecols=['Article_ID'], encoding='utf-8-sig')['Article_ID'].to_numpy()
+
+
+def _write_topic_ids(path, topic_ids):
+    # Reescreve o CSV com a coluna Topic_ID (as outras colunas passam tal como estão)
+    raw = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    raw['Topic_ID'] = topic_ids
+    _write_csv(raw, path)
+
+
+# --- FIT E ASSIGN ---
+def fit(data_dir=DATA_DIR, n_topics=N_TOPICS, seed=42, restarts=N_RESTARTS, jobs=None, label=False,
+        overwrite_labels=False):
+    t0 = time.perf_counter()
+    previous = None if overwrite_labels else previous_topics(data_dir)
+    path = _articles_path(data_dir)
+    df, n_docs = document_frequencies(path)
+    vocabulary, idf = select_vocabulary(df, n_docs)
+    X = tfidf_matrix(path, vocabulary, idf)
+    t1 = time.perf_counter()
+    print(f"TF-IDF: {X.shape[0]} artigos x {X.shape[1]} termos, {X.nnz} não nulos ({t1 - t0:.1f}s)")
+
+    W, H, err, best_seed = fit_nmf(X, n_topics, seed, restarts, jobs)
+    topic_ids, n_empty = assign_rows(W)
+    t2 = time.perf_counter()
+    print(f"NMF: {n_topics} tópicos, {restarts} inicializações, erro {err:.4f} "
+          f"(semente {best_seed}, {t2 - t1:.1f}s)")
+    if n_empty:
+        print(f"{n_empty} artigos sem termos do vocabulário -> tópico mais frequente")
+
+    _write_topic_ids(path, topic_ids)
+    save_doc_topics(doc_topics_path(data_dir), _article_ids(path), W)
+    articles = read_csv_table('Fact_Articles', columns=['Year', 'Source title', 'Topic_ID'], data_dir=data_dir)
+    terms = top_terms(H, vocabulary)
+    topics, macro = topic_table(terms, articles, previous)
+    outputs = {TABLES['top_terms_per_topic']['csv']: terms, TABLES['Dim_Topics']['csv']: topics,
+               TABLES['Topic_Macro_Areas']['csv']: macro, **aggregate_tables(articles)}
+    for filename, table in outputs.items():
+        _write_csv(table, os.path.join(data_dir, filename))
+    save_model(data_dir, vocabulary, idf, H, {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'articles': int(n_docs), 'terms': len(vocabulary),
+        'topics': n_topics, 'seed': seed, 'restarts': restarts, 'best_seed': int(best_seed),
+        'reconstruction_err': float(err), 'vectorizer': {k: v for k, v in VECTORIZER_PARAMS.items()
+                                                        if k != 'stop_words'},
+        'min_df': MIN_DF, 'max_df': MAX_DF, 'max_features': MAX_FEATURES, 'nmf': NMF_PARAMS,
+    })
+    print(f"artefactos -> {data_dir} ({', '.join(outputs)}), modelo -> {model_dir(data_dir)}")
+    if label:
+        # Rótulos e descrições pelo LLM (só os tópicos cujos termos não estão na cache)
+        from topic_labels import label_topics
+        label_topics(data_dir, rebuild=False)
+
+    try:
+        build_store(data_dir)
+    except RuntimeError as e:  # sem pyarrow o dashboard lê os CSV
+        print(e)
+    if os.path.isdir(os.path.join(data_dir, SNAPSHOTS_DIRNAME)):
+        print("Atenção: há snapshots do ingest.py; o snapshot ativo continua com os tópicos anteriores "
+              "e o ingest.py recusa juntar-lhe deltas com este modelo (outro model_id).")
+    print(f"fit concluído em {time.perf_counter() - t0:.1f}s")
+    return W, H
+
+
+def assign(delta_dir, data_dir=DATA_DIR):
+    # Topic_ID dos artigos do delta pelo modelo congelado, sem refazer o NMF
+    t0 = time.perf_counter()
+    vocabulary, idf, H = load_model(data_dir)
+    path = _articles_path(delta_dir)
+    W = np.vstack([project(texts, vocabulary, idf, H) for texts in _text_chunks(path)])
+    topic_ids, n_empty = assign_rows(W)
+    _write_topic_ids(path, topic_ids)
+    save_doc_topics(doc_topics_path(delta_dir), _article_ids(path), W)
+    print(f"{len(topic_ids)} artigos do delta com Topic_ID ({n_empty} sem termos do vocabulário, "
+          f"{time.perf_counter() - t0:.2f}s)")
+    return topic_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline de tópicos (TF-IDF + NMF)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_fit = sub.add_parser('fit', help="ajusta o modelo e escreve os artefactos do dashboard")
+    p_fit.add_argument('--data-dir', default=DATA_DIR)
+    p_fit.add_argument('--topics', type=int, default=N_TOPICS)
+    p_fit.add_argument('--seed', type=int, default=42)
+    p_fit.add_argument('--restarts', type=int, default=N_RESTARTS)
+    p_fit.add_argument('--jobs', type=int, default=None, help="processos (por omissão, um por inicialização)")
+    p_fit.add_argument('--label', action='store_true', help="rotula os tópicos pelo LLM (topic_labels.py)")
+    p_fit.add_argument('--overwrite-labels', action='store_true',
+                       help="não mantém os rótulos e descrições dos tópicos anteriores")
+    p_assign = sub.add_parser('assign', help="atribui tópicos a um delta com o modelo congelado")
+    p_assign.add_argument('delta_dir')
+    p_assign.add_argument('--data-dir', default=DATA_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'fit':
+        fit(args.data_dir, args.topics, args.seed, args.restarts, args.jobs, args.label, args.overwrite_labels)
+    else:
+        assign(args.delta_dir, args.data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+# Instrumentação de cada rerun do app.py por etapas (spans)
+#
+# Com OBSERVATORIO_TRACE=1, cada etapa do rerun (carregamento dos dados, filtro,
+# cada painel, agregados memorizados, figuras, nuvens de palavras e envio de
+# tabelas/figuras ao browser) corre dentro de um span com nome, que regista o
+# tempo de parede e o tempo de CPU da thread da sessão. Com
+# OBSERVATORIO_TRACE=alloc regista também o pico de memória alocada em cada
+# span (tracemalloc: mais lento, e conta alocações de outras sessões em paralelo).
+#
+# No fim do rerun os spans aparecem no sidebar e são escritos em
+# OBSERVATORIO_TRACE_FILE (por omissão traces/spans.jsonl, com rotação por
+# tamanho): uma linha JSON por span ou, se o ficheiro terminar em .prom, um
+# ficheiro de texto Prometheus (para o textfile collector do node_exporter)
+# com os totais acumulados por span. '{pid}' no nome separa os workers do serve.py.
+#
+# Com OBSERVATORIO_PROFILE=cprofile (ou pyinstrument, se instalado), um botão no
+# sidebar grava o perfil completo do rerun seguinte em traces/.
+import cProfile
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+TRACE_ENV = 'OBSERVATORIO_TRACE'
+TRACE_FILE_ENV = 'OBSERVATORIO_TRACE_FILE'
+PROFILE_ENV = 'OBSERVATORIO_PROFILE'
+TRACE_DIR = 'traces'
+DEFAULT_TRACE_FILE = os.path.join(TRACE_DIR, 'spans.jsonl')
+# Rotação do JSONL: tamanho máximo de cada ficheiro e nº de ficheiros antigos mantidos
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUPS = 5
+# Nº de funções mostradas no resumo de um perfil cProfile
+PROFILE_TOP = 30
+
+# Rerun em curso de cada sessão (o Streamlit corre cada sessão na sua thread)
+_local = threading.local()
+_sink_lock = threading.Lock()
+_jsonl_logger = None
+_prometheus_totals = {}  # span -> [n, parede (s), CPU (s), bytes]
+
+
+def trace_mode():
+    # None (desligado), 'time' ou 'alloc'
+    value = os.environ.get(TRACE_ENV, '').strip().lower()
+    if value in ('', '0', 'false', 'off'):
+        return None
+    return 'alloc' if value == 'alloc' else 'time'
+
+
+def profile_mode():
+    value = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if value in ('', '0', 'false', 'off'):
+        return None
+    return 'pyinstrument' if value == 'pyinstrument' else 'cprofile'
+
+
+class _Frame:
+    __slots__ = ('record', 'wall0', 'cpu0', 'mem0', 'peak')
+
+    def __init__(self, record, mem0):
+        self.record = record
+        self.wall0 = time.perf_counter()
+        self.cpu0 = time.thread_time()
+        self.mem0 = mem0
+        self.peak = mem0
+
+
+class RerunTrace:
+    def __init__(self, label, alloc=False):
+        self.label = label
+        self.alloc = alloc
+        self.spans = []   # pela ordem de abertura (pré-ordem), com a profundidade de cada um
+        self.started = time.time()
+        self.finished = False
+        self._stack = []
+        self._t0 = time.perf_counter()
+        if alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _local.trace = self
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def _open(self, name):
+        record = {'name': name, 'depth': len(self._stack),
+                  'start_ms': (time.perf_counter() - self._t0) * 1e3}
+        self.spans.append(record)
+        mem0 = None
+        if self.alloc:
+            # O pico é global: guarda-se o do pai até aqui e recomeça-se a contar para o filho
+            mem0, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+        self._stack.append(_Frame(record, mem0))
+
+    def _close(self):
+        frame = self._stack.pop()
+        record = frame.record
+        record['wall_ms'] = (time.perf_counter() - frame.wall0) * 1e3
+        record['cpu_ms'] = (time.thread_time() - frame.cpu0) * 1e3
+        if self.alloc:
+            peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            record['alloc_bytes'] = peak - frame.mem0
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+
+    @property
+    def total_ms(self):
+        return sum(s.get('wall_ms', 0) for s in self.spans if s['depth'] == 0)
+
+    def finish(self):
+        # Fecha spans deixados abertos (ex.: st.stop a meio), escreve-os e devolve o rerun
+        if self.finished:
+            return self
+        self.finished = True
+        while self._stack:
+            self._close()
+        if getattr(_local, 'trace', None) is self:
+            _local.trace = None
+        try:
+            write_spans(self)
+        except OSError as e:  # o dashboard não falha por causa do ficheiro de traces
+            logging.getLogger(__name__).warning("não foi possível escrever os spans: %s", e)
+        return self
+
+
+class _Span:
+    __slots__ = ('trace', 'name')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.trace._open(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.trace._close()
+        return False
+
+
+def start_trace(label):
+    # Novo rerun instrumentado na thread desta sessão; None com o tracing desligado
+    mode = trace_mode()
+    if mode is None:
+        return None
+    return RerunTrace(label, alloc=mode == 'alloc')
+
+
+def span(name):
+    # Span no rerun em curso desta thread (sem custo com o tracing desligado)
+    trace = getattr(_local, 'trace', None)
+    return trace.span(name) if trace is not None else nullcontext()
+
+
+# --- SAÍDA ---
+def trace_file():
+    return os.environ.get(TRACE_FILE_ENV, DEFAULT_TRACE_FILE).replace('{pid}', str(os.getpid()))
+
+
+def _jsonl(path):
+    global _jsonl_logger
+    if _jsonl_logger is None or _jsonl_logger.path != path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        logger = logging.getLogger(f'{__name__}.spans')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS,
+                                                       encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.path = path
+        _jsonl_logger = logger
+    return _jsonl_logger
+
+
+def _prometheus_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_prometheus(path, trace):
+    for s in trace.spans:
+        totals = _prometheus_totals.setdefault(s['name'], [0, 0.0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += s['wall_ms'] / 1e3
+        totals[2] += s['cpu_ms'] / 1e3
+        totals[3] += s.get('alloc_bytes', 0)
+    lines = []
+    metrics = [('observatorio_span_seconds', 1, "Tempo de parede por etapa do rerun"),
+               ('observatorio_span_cpu_seconds', 2, "Tempo de CPU da sessão por etapa do rerun")]
+    if trace.alloc:
+        metrics.append(('observatorio_span_alloc_bytes', 3, "Pico de memória alocada por etapa do rerun"))
+    for metric, pos, help_text in metrics:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} summary']
+        for name, totals in sorted(_prometheus_totals.items()):
+            label = f'span="{_prometheus_label(name)}"'
+            lines.append(f'{metric}_sum{{{label}}} {totals[pos]:.6f}')
+            lines.append(f'{metric}_count{{{label}}} {totals[0]}')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Escrita atómica: o collector nunca lê um ficheiro a meio
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(path + '.tmp', path)
+
+
+def write_spans(trace):
+    path = trace_file()
+    with _sink_lock:
+        if path.endswith('.prom'):
+            _write_prometheus(path, trace)
+            return
+        logger = _jsonl(path)
+        rerun = {'ts': round(trace.started, 3), 'pid': os.getpid(), 'thread': threading.get_ident(),
+                 'label': trace.label}
+        for s in trace.spans:
+            logger.info(json.dumps({**rerun, **{k: round(v, 3) if isinstance(v, float) else v
+                                                for k, v in s.items()}}, ensure_ascii=False))
+
+
+# --- PERFIL DE UM RERUN ---
+class RerunProfile:
+    def __init__(self, mode=None):
+        self.mode = mode or profile_mode() or 'cprofile'
+        self._profiler = None
+        if self.mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+            except ImportError:  # sem pyinstrument fica o cProfile
+                self.mode = 'cprofile'
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        # Um rerun interrompido (st.stop, st.rerun) pode ter deixado um perfil ligado nesta thread
+        stale = getattr(_local, 'profile', None)
+        if stale is not None:
+            stale._disable()
+        if self.mode == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+        _local.profile = self
+        return self
+
+    def _disable(self):
+        if getattr(_local, 'profile', None) is self:
+            _local.profile = None
+        if self.mode == 'pyinstrument':
+            if self._profiler.is_running:
+                self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def stop(self):
+        # Grava o perfil em traces/ e devolve (caminho, resumo em texto)
+        self._disable()
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if self.mode == 'pyinstrument':
+            path = os.path.join(TRACE_DIR, f'profile-{stamp}-{os.getpid()}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+            return path, self._profiler.output_text(unicode=True, color=False)
+        path = os.path.join(TRACE_DIR, f'profile-{stamp}-{os.getpid()}.prof')
+        self._profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        return path, out.getvalue()
@@ -0,0 +1,105 @@
+# Deteção de tendências por tópico (Painel 3) a partir da matriz tópico x ano
+#
+# Substitui o Trend_Status fixo do Dim_Topics: para a janela de anos escolhida
+# no sidebar, a matriz de contagens (tópicos x anos, tirada do cubo) dá, para
+# todos os tópicos de uma vez:
+#  - declive: regressão linear dos artigos por ano, relativo à média do tópico (%/ano)
+#  - CAGR: crescimento anual composto entre o primeiro e o último ano
+#  - aceleração: curvatura (termo quadrático) da mesma série relativa, em
+#    z-score entre os tópicos (positivo = cresce mais depressa do que os outros)
+#  - variação da quota: quota do tópico no total do último ano menos no primeiro (p.p.)
+# e a classificação em emergente, em alta, estável ou em declínio.
+# Anos incompletos nas pontas da janela (ex.: o ano corrente de uma exportação
+# a meio do ano) ficam de fora, para não parecerem uma queda.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+TREND_CLASSES = ['Emergente', 'Em alta', 'Estável', 'Em declínio']
+MIN_TREND_YEARS = 3
+# Ano na ponta da janela com menos do que esta fração da mediana anual = incompleto
+PARTIAL_YEAR_RATIO = 0.25
+HOT_CAGR = 0.05
+DECLINE_CAGR = -0.05
+EMERGING_Z = 1.0
+
+
+@dataclass
+class TrendReport:
+    table: pd.DataFrame     # uma linha por tópico (ordem do Dim_Topics); vazia com poucos anos
+    years: list             # anos usados nas estatísticas
+    excluded_years: list    # anos incompletos retirados das pontas da janela
+
+
+def count_matrix(year_topic, topic_ids, years):
+    # year_topic: Year, Topic_ID, Volume (cube.year_topic_counts) -> matriz tópicos x anos, com zeros
+    rows = pd.Index(topic_ids).get_indexer(year_topic['Topic_ID'])
+    cols = pd.Index(years).get_indexer(year_topic['Year'])
+    ok = (rows >= 0) & (cols >= 0)
+    counts = np.zeros((len(topic_ids), len(years)))
+    np.add.at(counts, (rows[ok], cols[ok]), year_topic['Volume'].to_numpy()[ok])
+    return counts
+
+
+def complete_years(counts):
+    # Intervalo [lo, hi) de colunas sem os anos incompletos das pontas
+    totals = counts.sum(axis=0)
+    ref = PARTIAL_YEAR_RATIO * np.median(totals) if len(totals) else 0
+    lo, hi = 0, len(totals)
+    while lo < hi and totals[lo] < ref:
+        lo += 1
+    while hi > lo and totals[hi - 1] < ref:
+        hi -= 1
+    return lo, hi
+
+
+def trend_stats(counts, years):
+    # Estatísticas vetorizadas sobre a matriz tópicos x anos (anos já completos)
+    x = np.asarray(years, dtype=np.float64)
+    x = x - x.mean()
+    n_years = len(x)
+    mean = counts.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = counts / mean[:, None]             # série de cada tópico face à sua média
+        slope = relative @ x / (x @ x)
+        curvature = np.polyfit(x, np.nan_to_num(relative).T, 2)[0]
+        active = curvature[mean > 0]
+        spread = active.std() if len(active) > 1 else 0
+        acceleration = (curvature - active.mean()) / spread if spread > 0 else np.zeros(len(mean))
+        cagr = ((counts[:, -1] + 1) / (counts[:, 0] + 1)) ** (1 / (n_years - 1)) - 1
+        totals = counts.sum(axis=0)
+        share = np.where(totals > 0, counts / totals, 0)
+    return pd.DataFrame({
+        'Artigos': counts.sum(axis=1).astype(np.int64),
+        'Declive': np.where(mean > 0, slope, np.nan) * 100,
+        'CAGR': np.where(mean > 0, cagr, np.nan) * 100,
+        'Aceleração': np.where(mean > 0, acceleration, np.nan),
+        'Δ Quota': (share[:, -1] - share[:, 0]) * 100,
+    })
+
+
+def classify(stats):
+    # Emergente: a acelerar acima dos outros tópicos e a ganhar quota; depois por CAGR e quota
+    gaining = stats['Δ Quota'].to_numpy() > 0
+    cagr = stats['CAGR'].to_numpy() / 100
+    conditions = [
+        (stats['Aceleração'].to_numpy() >= EMERGING_Z) & (stats['Declive'].to_numpy() > 0) & gaining,
+        (cagr >= HOT_CAGR) & gaining,
+        (cagr <= DECLINE_CAGR) & ~gaining,
+    ]
+    labels = np.select(conditions, TREND_CLASSES[:2] + TREND_CLASSES[3:], TREND_CLASSES[2])
+    return pd.Categorical(labels, categories=TREND_CLASSES)
+
+
+def detect_trends(year_topic, topic_ids, ano_range):
+    years = np.arange(ano_range[0], ano_range[1] + 1)
+    counts = count_matrix(year_topic, topic_ids, years)
+    lo, hi = complete_years(counts)
+    excluded = [int(y) for y in np.r_[years[:lo], years[hi:]]]
+    if hi - lo < MIN_TREND_YEARS:
+        return TrendReport(pd.DataFrame(), [int(y) for y in years[lo:hi]], excluded)
+    stats = trend_stats(counts[:, lo:hi], years[lo:hi])
+    stats.insert(0, 'Topic_ID', np.asarray(topic_ids))
+    stats['Tendência'] = classify(stats)
+    return TrendReport(stats, [int(y) for y in years[lo:hi]], excluded)
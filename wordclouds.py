@@ -0,0 +1,59 @@
+# Nuvens de palavras dos tópicos como imagens PNG
+#
+# Os pesos dos termos (top_terms_per_topic) só mudam quando o modelo de tópicos
+# é refeito, por isso cada nuvem é desenhada uma vez: no build (store/wordclouds/)
+# ou no primeiro pedido, ficando depois em cache. O painel só recebe os bytes.
+import io
+import os
+import sys
+
+from data_store import DATA_DIR, TABLES, is_fresh, read_table, store_dir
+
+WORDCLOUD_DIRNAME = 'wordclouds'
+WORDCLOUD_OPTIONS = dict(width=1000, height=600, background_color='white',
+                         colormap='Blues', max_words=50, random_state=42)
+
+
+def render_wordcloud_png(weights):
+    # weights: dicionário termo -> peso
+    from wordcloud import WordCloud
+
+    image = WordCloud(**WORDCLOUD_OPTIONS).generate_from_frequencies(weights).to_image()
+    buf = io.BytesIO()
+    image.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+
+def topic_weights(df_terms, topic_id):
+    t_terms = df_terms[df_terms['Topic_ID'] == topic_id]
+    return dict(zip(t_terms['term'], t_terms['weight']))
+
+
+def _png_path(topic_id, data_dir):
+    return os.path.join(store_dir(data_dir), WORDCLOUD_DIRNAME, f'{topic_id}.png')
+
+
+def wordcloud_png(df_terms, topic_id, data_dir=DATA_DIR):
+    # PNG pré-desenhado no build, se estiver em dia; senão desenha agora (None sem termos)
+    path = _png_path(topic_id, data_dir)
+    terms_csv = os.path.join(data_dir, TABLES['top_terms_per_topic']['csv'])
+    if is_fresh(path, terms_csv):
+        with open(path, 'rb') as f:
+            return f.read()
+    weights = topic_weights(df_terms, topic_id)
+    return render_wordcloud_png(weights) if weights else None
+
+
+def build_wordclouds(data_dir=DATA_DIR):
+    df_terms = read_table('top_terms_per_topic', data_dir=data_dir)
+    os.makedirs(os.path.join(store_dir(data_dir), WORDCLOUD_DIRNAME), exist_ok=True)
+    for topic_id in sorted(df_terms['Topic_ID'].unique()):
+        path = _png_path(topic_id, data_dir)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(render_wordcloud_png(topic_weights(df_terms, topic_id)))
+        os.replace(path + '.tmp', path)
+        print(f"nuvem do tópico {topic_id} -> {path}")
+
+
+if __name__ == '__main__':
+    build_wordclouds(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)